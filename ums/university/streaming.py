@@ -0,0 +1,100 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+# ?format=ndjson / ?format=csv stream every row of a list or stats endpoint
+# from a server-side cursor instead of building the full result in memory.
+#
+# The same module is in ums_custom_user/university/streaming.py; keep the two in step.
+# Each project is deployed on its own, with its own settings and apps on the
+# path, and there is no package they both install to share it from.
+
+CHUNK_SIZE = 2000
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    fields = None
+    for row in rows:
+        if fields is None:
+            fields = list(row)
+            yield writer.writerow(fields)
+        yield writer.writerow([row.get(field) for field in fields])
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    # Streamed responses bypass the renderer; this only renders the
+    # non-streamed ones, such as errors.
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(ndjson_lines(rows)).encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(csv_lines(rows)).encode(self.charset)
+
+
+STREAMERS = {
+    NDJSONRenderer.format: (ndjson_lines, NDJSONRenderer.media_type),
+    CSVRenderer.format: (csv_lines, CSVRenderer.media_type),
+}
+
+
+class StreamingExportMixin:
+    stream_chunk_size = CHUNK_SIZE
+
+    def get_renderers(self):
+        return super().get_renderers() + [NDJSONRenderer(), CSVRenderer()]
+
+    def is_streaming(self, request):
+        renderer = getattr(request, 'accepted_renderer', None)
+        return renderer is not None and renderer.format in STREAMERS
+
+    def stream(self, request, rows):
+        lines, content_type = STREAMERS[request.accepted_renderer.format]
+        response = StreamingHttpResponse(lines(rows), content_type=f'{content_type}; charset=utf-8')
+        if request.accepted_renderer.format == CSVRenderer.format:
+            response['Content-Disposition'] = f'attachment; filename="{type(self).__name__}.csv"'
+        return response
+
+    def stream_queryset(self, request, queryset):
+        # For .values() querysets: every row is already a dict.
+        return self.stream(request, queryset.iterator(chunk_size=self.stream_chunk_size))
+
+    def list(self, request, *args, **kwargs):
+        if not self.is_streaming(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer()
+        rows = (
+            serializer.to_representation(instance)
+            for instance in queryset.iterator(chunk_size=self.stream_chunk_size)
+        )
+        return self.stream(request, rows)
@@ -1,3 +1,43 @@
+import csv
+import datetime
+import io
+import json
+
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Department, Program, Course, Student, Grade
+
+
+class StreamingTests(TestCase):
+    def setUp(self):
+        program = Program.objects.create(name='Physics', department=Department.objects.create(name='Science'))
+        course = Course.objects.create(name='Mechanics', code='PHY101', program=program)
+        for n, grade in enumerate([3.0, 4.0, 2.0]):
+            student = Student.objects.create(
+                user=User.objects.create_user(f's{n}'), program=program, enrollment_date=datetime.date(2024, 9, 1),
+            )
+            Grade.objects.create(student=student, course=course, grade=grade)
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', None))
+
+    def body(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_list_as_ndjson(self):
+        response = self.client.get('/departments/?format=ndjson')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in self.body(response).splitlines()]
+        self.assertEqual(rows, [{'id': Department.objects.get().pk, 'name': 'Science'}])
+
+    def test_stats_as_csv(self):
+        response = self.client.get('/stats/student-gpa/?format=csv')
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        rows = list(csv.reader(io.StringIO(self.body(response))))
+        self.assertEqual(rows, [['student__user__username', 'gpa'], ['s1', '4.0'], ['s0', '3.0'], ['s2', '2.0']])
+
+    def test_json_is_unchanged(self):
+        response = self.client.get('/stats/student-gpa/')
+        self.assertFalse(response.streaming)
+        self.assertEqual([row['student__user__username'] for row in response.json()], ['s1', 's0', 's2'])
@@ -6,19 +6,20 @@ from django.db.models import Avg, Count
 from .models import Department, Program, Course, Student, Faculty, Enrollment, Withdrawal, Grade, Attendance, Timetable
 from .serializers import DepartmentSerializer, ProgramSerializer, CourseSerializer, StudentSerializer, FacultySerializer, EnrollmentSerializer, WithdrawalSerializer, GradeSerializer, AttendanceSerializer, TimetableSerializer
 from rest_framework.permissions import DjangoModelPermissions
+from .streaming import StreamingExportMixin
 
 # ModelViewSets
-class DepartmentViewSet(viewsets.ModelViewSet):
+class DepartmentViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
     permission_classes = [DjangoModelPermissions, IsAuthenticated]
 
-class ProgramViewSet(viewsets.ModelViewSet):
+class ProgramViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Program.objects.all()
     serializer_class = ProgramSerializer
     permission_classes = [DjangoModelPermissions, IsAuthenticated]
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     permission_classes = [DjangoModelPermissions, IsAuthenticated]
@@ -41,7 +42,7 @@ class CourseViewSet(viewsets.ModelViewSet):
 
         # All others see nothing
         return Course.objects.all()
-class StudentViewSet(viewsets.ModelViewSet):
+class StudentViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
     permission_classes = [DjangoModelPermissions, IsAuthenticated]
@@ -61,7 +62,7 @@ class StudentViewSet(viewsets.ModelViewSet):
 
         # All others see nothing
         return Student.objects.all()
-class FacultyViewSet(viewsets.ModelViewSet):
+class FacultyViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Faculty.objects.all()
     serializer_class = FacultySerializer
     permission_classes = [DjangoModelPermissions, IsAuthenticated]
@@ -79,7 +80,7 @@ class FacultyViewSet(viewsets.ModelViewSet):
 
         # Others: no access
         return Faculty.objects.all()
-class EnrollmentViewSet(viewsets.ModelViewSet):
+class EnrollmentViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
     permission_classes = [DjangoModelPermissions, IsAuthenticated]
@@ -97,7 +98,7 @@ class EnrollmentViewSet(viewsets.ModelViewSet):
         # Others: nothing
         return Enrollment.objects.all()
 
-class WithdrawalViewSet(viewsets.ModelViewSet):
+class WithdrawalViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Withdrawal.objects.all()
     serializer_class = WithdrawalSerializer
     permission_classes = [DjangoModelPermissions, IsAuthenticated]
@@ -114,7 +115,7 @@ class WithdrawalViewSet(viewsets.ModelViewSet):
         # Default: no access
         return Withdrawal.objects.all()
     
-class GradeViewSet(viewsets.ModelViewSet):
+class GradeViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Grade.objects.all()
     serializer_class = GradeSerializer
     permission_classes = [DjangoModelPermissions, IsAuthenticated]
@@ -130,7 +131,7 @@ class GradeViewSet(viewsets.ModelViewSet):
 
         # Default: no access
         return Grade.objects.all()  
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
     permission_classes = [DjangoModelPermissions, IsAuthenticated]
@@ -145,7 +146,7 @@ class AttendanceViewSet(viewsets.ModelViewSet):
 
         return Attendance.objects.all()
 
-class TimetableViewSet(viewsets.ModelViewSet):
+class TimetableViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Timetable.objects.all()
     serializer_class = TimetableSerializer
     permission_classes = [DjangoModelPermissions, IsAuthenticated]
@@ -162,7 +163,7 @@ class TimetableViewSet(viewsets.ModelViewSet):
 
         # Default: no access
         return Timetable.objects.all()
-class StudentGPAView(APIView):
+class StudentGPAView(StreamingExportMixin, APIView):
     permission_classes = [ IsAdminUser]
 
     def get(self, request):
@@ -171,9 +172,11 @@ class StudentGPAView(APIView):
             .annotate(gpa=Avg('grade'))
             .order_by('-gpa')
         )
+        if self.is_streaming(request):
+            return self.stream_queryset(request, gpa_data)
         return Response(gpa_data)
 
-class CourseWithdrawalsView(APIView):
+class CourseWithdrawalsView(StreamingExportMixin, APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
@@ -182,9 +185,11 @@ class CourseWithdrawalsView(APIView):
             .annotate(total_withdrawals=Count('id'))
             .order_by('-total_withdrawals')
         )
+        if self.is_streaming(request):
+            return self.stream_queryset(request, data)
         return Response(data)
 
-class AttendanceSummaryView(APIView):
+class AttendanceSummaryView(StreamingExportMixin, APIView):
     permission_classes = [ IsAdminUser]
 
     def get(self, request):
@@ -194,4 +199,6 @@ class AttendanceSummaryView(APIView):
             .annotate(absences=Count('id'))
             .order_by('-absences')
         )
+        if self.is_streaming(request):
+            return self.stream_queryset(request, data)
         return Response(data)
@@ -1,8 +1,9 @@
 from django.contrib import admin
-from .models import Department, Program, Course, Timetable
+from .models import Department, Program, Course, Timetable, Term
 
 admin.site.register(Department)
 admin.site.register(Program)
 admin.site.register(Course)
 admin.site.register(Timetable)
+admin.site.register(Term)
 
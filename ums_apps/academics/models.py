@@ -18,6 +18,9 @@ class Course(models.Model):
     code = models.CharField(max_length=10)
     program = models.ForeignKey('academics.Program', on_delete=models.CASCADE)
     faculty = models.ForeignKey('faculty.Faculty', on_delete=models.SET_NULL, null=True, blank=True)
+    # Seats: no capacity is unlimited. enrolled_count is kept by students.seats.
+    capacity = models.PositiveIntegerField(null=True, blank=True)
+    enrolled_count = models.IntegerField(default=0, editable=False)
 
     def __str__(self):
         return f"{self.code} - {self.name}"
@@ -27,3 +30,11 @@ class Timetable(models.Model):
     day = models.CharField(max_length=10)
     start_time = models.TimeField()
     end_time = models.TimeField()
+
+class Term(models.Model):
+    name = models.CharField(max_length=50)
+    start_date = models.DateField()
+    end_date = models.DateField()
+
+    def __str__(self):
+        return self.name
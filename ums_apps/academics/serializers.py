@@ -1,22 +1,52 @@
 from rest_framework import serializers
-from .models import Department, Program, Course, Timetable
+from expansion import ExpandableSerializerMixin
+from .models import Department, Program, Course, Timetable, Term
+
+class DepartmentSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+    expandable = {
+        'programs': ('academics.serializers.ProgramSerializer', 'program_set'),
+    }
 
-class DepartmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Department
         fields = '__all__'
 
-class ProgramSerializer(serializers.ModelSerializer):
+class ProgramSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+    expandable = {
+        'department': 'academics.serializers.DepartmentSerializer',
+    }
+
     class Meta:
         model = Program
         fields = '__all__'
 
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+    expandable = {
+        'program': 'academics.serializers.ProgramSerializer',
+        'faculty': 'faculty.serializers.FacultySerializer',
+    }
+
     class Meta:
         model = Course
         fields = '__all__'
 
-class TimetableSerializer(serializers.ModelSerializer):
+class TimetableSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+    expandable = {
+        'course': 'academics.serializers.CourseSerializer',
+    }
+
     class Meta:
         model = Timetable
         fields = '__all__'
+
+class TermSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Term
+        fields = '__all__'
+
+    def validate(self, attrs):
+        start = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        if start and end and end < start:
+            raise serializers.ValidationError({'end_date': 'A term cannot end before it starts.'})
+        return attrs
@@ -1,3 +1,76 @@
+import datetime
+
+from django.contrib.auth.models import Permission
+from django.core.cache import caches
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+import principal
+from accounts import throttling
+from accounts.models import CustomUser
+from academics.models import Department, Program, Course
+from faculty.models import Faculty
+from students.models import Student, Enrollment
+
+
+def isolate(test):
+    caches['default'].clear()
+    principal.VERSIONS = principal.LocalVersions()
+    throttling.STORE = throttling.LocalStore()
+    test.addCleanup(setattr, principal, 'VERSIONS', None)
+    test.addCleanup(setattr, throttling, 'STORE', None)
+
+
+class CourseTests(TestCase):
+    def setUp(self):
+        isolate(self)
+        department = Department.objects.create(name='Science')
+        self.program = Program.objects.create(name='Physics', department=department)
+        self.lecturer = Faculty.objects.create(
+            user=CustomUser.objects.create_user('lecturer', user_type='faculty'), department=department,
+        )
+        self.courses = [
+            Course.objects.create(name=f'C{n}', code=f'C{n}', program=self.program, faculty=self.lecturer if n else None)
+            for n in range(3)
+        ]
+        self.student = Student.objects.create(
+            user=CustomUser.objects.create_user('student', user_type='student'),
+            department=department, program=self.program, enrollment_date=datetime.date(2024, 9, 1),
+        )
+        Enrollment.objects.create(student=self.student, course=self.courses[0])
+
+    def login(self, user):
+        user.user_permissions.add(Permission.objects.get(codename='view_course'))
+        self.client.force_login(user)
+
+    def codes(self):
+        return sorted(row['code'] for row in self.client.get('/api/academics/courses/').json()['results'])
+
+    def test_student_sees_enrolled_courses(self):
+        self.login(self.student.user)
+        self.assertEqual(self.codes(), ['C0'])
+
+    def test_faculty_sees_taught_courses(self):
+        self.login(self.lecturer.user)
+        self.assertEqual(self.codes(), ['C1', 'C2'])
+
+    def test_fields_and_expand(self):
+        self.client.force_login(CustomUser.objects.create_superuser('admin', 'admin@example.com', None, user_type='admin'))
+        response = self.client.get('/api/academics/courses/?fields=code,program.name&expand=program')
+        self.assertEqual(
+            sorted(response.json()['results'], key=lambda row: row['code']),
+            [{'code': f'C{n}', 'program': {'name': 'Physics'}} for n in range(3)],
+        )
 
-# Create your tests here.
+    def test_expanded_page_costs_the_same_queries(self):
+        self.client.force_login(CustomUser.objects.create_superuser('admin', 'admin@example.com', None, user_type='admin'))
+        url = '/api/academics/courses/?expand=program.department,faculty.user'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(url)
+        for n in range(3, 8):
+            Course.objects.create(name=f'C{n}', code=f'C{n}', program=self.program, faculty=self.lecturer)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url)
+        self.assertEqual(len(few), len(many))
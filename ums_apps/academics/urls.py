@@ -1,12 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DepartmentViewSet, ProgramViewSet, CourseViewSet, TimetableViewSet
+from .views import DepartmentViewSet, ProgramViewSet, CourseViewSet, TimetableViewSet, TermViewSet
 
 router = DefaultRouter()
 router.register(r'departments', DepartmentViewSet)
 router.register(r'programs', ProgramViewSet)
 router.register(r'courses', CourseViewSet)
 router.register(r'timetables', TimetableViewSet)
+router.register(r'terms', TermViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,55 +1,56 @@
 from rest_framework import viewsets
-from rest_framework.permissions import DjangoModelPermissions, IsAuthenticated
-from academics.models import Department, Program, Course, Timetable
-from academics.serializers import DepartmentSerializer, ProgramSerializer, CourseSerializer, TimetableSerializer
+from rest_framework.permissions import IsAuthenticated
+from academics.models import Department, Program, Course, Timetable, Term
+from academics.serializers import DepartmentSerializer, ProgramSerializer, CourseSerializer, TimetableSerializer, TermSerializer
 from utils import get_user_throttle
+from scoping import scope
+from principal import PrincipalModelPermissions
+from expansion import ExpandableViewSetMixin
 import pdb
 
-class DepartmentViewSet(viewsets.ModelViewSet):
+class DepartmentViewSet(ExpandableViewSetMixin, viewsets.ModelViewSet):
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
     def get_throttles(self):
         return get_user_throttle(self.request.user)
 
-class ProgramViewSet(viewsets.ModelViewSet):
+class ProgramViewSet(ExpandableViewSetMixin, viewsets.ModelViewSet):
 
     queryset = Program.objects.all()
     serializer_class = ProgramSerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
     def get_throttles(self):
         return get_user_throttle(self.request.user)
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(ExpandableViewSetMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'faculty':
-            return Course.objects.filter(faculty__user=user)
-        elif user.user_type == 'student':
-            return Course.objects.filter(enrollment__student__user=user).distinct()
-        return Course.objects.all()
+        return scope(Course.objects.all(), self.request.user)
 
     def get_throttles(self):
         return get_user_throttle(self.request.user)
 
-class TimetableViewSet(viewsets.ModelViewSet):
+class TimetableViewSet(ExpandableViewSetMixin, viewsets.ModelViewSet):
     queryset = Timetable.objects.all()
     serializer_class = TimetableSerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'faculty':
-            return Timetable.objects.filter(course__faculty__user=user)
-        elif user.user_type == 'student':
-            return Timetable.objects.filter(course__enrollment__student__user=user).distinct()
-        return Timetable.objects.all()
+        return scope(Timetable.objects.all(), self.request.user)
+
+    def get_throttles(self):
+        return get_user_throttle(self.request.user)
+
+class TermViewSet(viewsets.ModelViewSet):
+    queryset = Term.objects.order_by('start_date')
+    serializer_class = TermSerializer
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
     def get_throttles(self):
         return get_user_throttle(self.request.user)
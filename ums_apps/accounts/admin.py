@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CustomUser
+from .models import CustomUser, RefreshToken
 from django.contrib.auth.admin import UserAdmin
 
 @admin.register(CustomUser)
@@ -7,3 +7,8 @@ class CustomUserAdmin(UserAdmin):
     fieldsets = UserAdmin.fieldsets + (
         ('User Type', {'fields': ('user_type',)}),
     )
+
+@admin.register(RefreshToken)
+class RefreshTokenAdmin(admin.ModelAdmin):
+    list_display = ('user', 'family', 'created_at', 'expires_at', 'used_at', 'revoked_at')
+    readonly_fields = ('token_hash', 'family', 'fingerprint')
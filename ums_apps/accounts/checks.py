@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+PROCESS_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register()
+def check_token_revocation(app_configs, **kwargs):
+    # Access tokens are checked against the cached principal, so signing out
+    # or changing a password only reaches the workers that share its versions.
+    authentication = settings.REST_FRAMEWORK.get('DEFAULT_AUTHENTICATION_CLASSES', ())
+    if 'accounts.tokens.AccessTokenAuthentication' not in authentication:
+        return []
+    store = getattr(settings, 'PRINCIPAL_VERSION_STORE', 'cache')
+    cache = settings.CACHES[getattr(settings, 'PRINCIPAL_CACHE', 'default')]
+    if store == 'local' or (store == 'cache' and cache['BACKEND'] in PROCESS_CACHES):
+        return [Warning(
+            'Revoked access tokens and changed passwords are only noticed by the worker that made the change.',
+            hint="Set PRINCIPAL_VERSION_STORE to 'sqlite', or to 'cache' with a PRINCIPAL_CACHE every worker shares.",
+            id='accounts.W001',
+        )]
+    return []
@@ -0,0 +1,76 @@
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts import throttling
+
+
+def hammer(key, attempts, interval, limit, start_at):
+    # Runs in a worker process: waits for the common start, then takes from
+    # the shared bucket as fast as it can.
+    store = throttling.get_store()
+    time.sleep(max(0, start_at - time.time()))
+    started = time.perf_counter()
+    allowed = sum(store.take(key, interval, limit) <= 0 for _ in range(attempts))
+    return allowed, time.perf_counter() - started
+
+
+class LoadTestThrottle(throttling.GCRAThrottle):
+    def __init__(self, rate):
+        self.rate = rate
+        self.num_requests, self.duration = self.parse_rate(rate)
+
+
+class Command(BaseCommand):
+    help = (
+        'Have several processes draw from one rate limit at once and check that, together, they get '
+        'exactly the burst plus what refilled meanwhile. Exercises THROTTLE_STORE across processes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--attempts', type=int, default=2000, help='Requests per process.')
+        parser.add_argument('--rate', default='500/hour', help='As in DEFAULT_THROTTLE_RATES.')
+
+    def handle(self, *args, **options):
+        if options['processes'] < 1 or options['attempts'] < 1:
+            raise CommandError('--processes and --attempts must be at least 1.')
+        try:
+            throttle = LoadTestThrottle(options['rate'])
+        except (ValueError, KeyError):
+            raise CommandError(f"Can't parse rate {options['rate']!r}.")
+        burst = throttle.num_requests
+        interval = throttle.duration / burst
+        limit = throttle.duration + interval / 2
+        key = f'throttle_load_test_{uuid.uuid4().hex}'
+
+        with ProcessPoolExecutor(
+            max_workers=options['processes'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        ) as pool:
+            # Spawning takes a while; start everyone at the same moment.
+            start_at = time.time() + 2
+            futures = [
+                pool.submit(hammer, key, options['attempts'], interval, limit, start_at)
+                for _ in range(options['processes'])
+            ]
+            results = [future.result() for future in futures]
+
+        allowed = sum(count for count, elapsed in results)
+        elapsed = max(elapsed for count, elapsed in results)
+        attempts = options['processes'] * options['attempts']
+        refilled = int(elapsed / interval) + 1
+        self.stdout.write(
+            f"{getattr(settings, 'THROTTLE_STORE', 'local')} store: {options['processes']} processes, "
+            f'{attempts} requests in {elapsed:.2f}s ({attempts / elapsed:.0f}/s)'
+        )
+        self.stdout.write(f'Allowed {allowed}; the limit allows {burst} to {burst + refilled}.')
+        if not burst <= allowed <= burst + refilled:
+            raise CommandError('The processes did not share the limit.')
+        self.stdout.write(self.style.SUCCESS('The limit held across processes.'))
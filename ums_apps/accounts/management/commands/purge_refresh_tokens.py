@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from accounts import tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete expired refresh tokens, and revoked ones whose access tokens have expired. Run it daily.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f'Deleted {tokens.purge()} refresh tokens.'))
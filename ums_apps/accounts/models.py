@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser, Group, Permission
 from django.db import models
+from django.utils.crypto import salted_hmac
 
 class CustomUser(AbstractUser):
     USER_TYPES = (
@@ -26,3 +27,30 @@ class CustomUser(AbstractUser):
 
     def __str__(self):
         return self.username
+
+    def token_fingerprint(self):
+        # Changes with the password, so setting a new one signs every token out.
+        return salted_hmac('accounts.tokens', self.password).hexdigest()[:16]
+
+
+class RefreshToken(models.Model):
+    # Only the hash of the token is stored. Each refresh replaces the token
+    # with a new one of the same family; the family is one sign-in.
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='refresh_tokens')
+    token_hash = models.CharField(max_length=64, unique=True)
+    family = models.UUIDField()
+    fingerprint = models.CharField(max_length=16)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    used_at = models.DateTimeField(null=True, blank=True)
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['family'], name='refresh_token_family_idx'),
+            models.Index(fields=['user', 'revoked_at'], name='refresh_token_revoked_idx'),
+            models.Index(fields=['expires_at'], name='refresh_token_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} ({self.family})'
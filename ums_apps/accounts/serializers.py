@@ -1,7 +1,18 @@
 from rest_framework import serializers
+from expansion import ExpandableSerializerMixin
 from .models import CustomUser
 
-class CustomUserSerializer(serializers.ModelSerializer):
+class CustomUserSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = CustomUser
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'user_type']
+
+class TokenObtainSerializer(serializers.Serializer):
+    username = serializers.CharField()
+    password = serializers.CharField(style={'input_type': 'password'}, trim_whitespace=False)
+
+class RefreshTokenSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+class RevokeTokenSerializer(serializers.Serializer):
+    refresh = serializers.CharField(required=False)
@@ -1,3 +1,76 @@
+from django.conf import settings
+from django.core.cache import caches
 from django.test import TestCase
 
-# Create your tests here.
+import principal
+from accounts import throttling
+from accounts.models import CustomUser
+
+
+def isolate(test):
+    caches['default'].clear()
+    principal.VERSIONS = principal.LocalVersions()
+    throttling.STORE = throttling.LocalStore()
+    test.addCleanup(setattr, principal, 'VERSIONS', None)
+    test.addCleanup(setattr, throttling, 'STORE', None)
+
+
+class TokenTests(TestCase):
+    def setUp(self):
+        isolate(self)
+        self.user = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'pw', user_type='admin')
+
+    def sign_in(self):
+        response = self.client.post('/api/accounts/token/', {'username': 'admin', 'password': 'pw'})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def get(self, access):
+        return self.client.get('/api/academics/departments/', HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_access_token_authenticates(self):
+        self.assertEqual(self.get(self.sign_in()['access']).status_code, 200)
+        self.assertEqual(self.get('not-a-token').status_code, 401)
+
+    def test_revoked_sign_in_rejects_its_access_tokens(self):
+        tokens, other = self.sign_in(), self.sign_in()
+        self.assertEqual(self.get(tokens['access']).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/accounts/token/revoke/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.get(tokens['access']).status_code, 401)
+        self.assertEqual(self.get(other['access']).status_code, 200)
+
+    def test_password_change_rejects_access_tokens(self):
+        tokens = self.sign_in()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.set_password('new')
+            self.user.save()
+        self.assertEqual(self.get(tokens['access']).status_code, 401)
+
+    def test_refresh_token_works_once(self):
+        tokens = self.sign_in()
+        response = self.client.post('/api/accounts/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 200)
+        renewed = response.json()
+        self.assertEqual(self.get(renewed['access']).status_code, 200)
+        # Reusing the first token revokes the whole sign-in.
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/accounts/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.get(renewed['access']).status_code, 401)
+
+
+class ThrottleTests(TestCase):
+    def test_burst_then_one_request_per_interval(self):
+        store = throttling.LocalStore()
+        allowed = [store.take('user', 1.0, 3.5) <= 0 for _ in range(5)]
+        self.assertEqual(allowed, [True, True, True, False, False])
+
+    def test_student_rate_limit(self):
+        isolate(self)
+        self.client.force_login(CustomUser.objects.create_user('student', password='pw', user_type='student'))
+        rates = dict.fromkeys(settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], '2/minute')
+        with self.settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}):
+            codes = [self.client.get('/api/students/students/').status_code for _ in range(3)]
+        self.assertEqual(codes, [200, 200, 429])
@@ -1,10 +1,165 @@
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
 from rest_framework.throttling import UserRateThrottle
 
-class StudentThrottle(UserRateThrottle):
+import metrics
+
+# Rate limits as GCRA (generic cell rate algorithm): a rate of n per period
+# allows a burst of n, then one request every period / n, like a bucket of n
+# tokens refilled at that pace. A user's whole state is one number, the
+# theoretical arrival time of their next request, and a request is a single
+# atomic update of it in a store all workers share (THROTTLE_STORE):
+#   'local'  - this process only; every worker has its own limits.
+#   'sqlite' - the THROTTLE_STORE_PATH file, shared by the workers on one host.
+#   'redis'  - THROTTLE_REDIS_URL, shared by every host (needs the redis package).
+
+PURGE_EVERY = 10000
+
+
+class LocalStore:
+    def __init__(self):
+        self.tats = {}
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def take(self, key, interval, limit):
+        # Seconds to wait before the request would be allowed; 0 if it is.
+        now = time.time()
+        with self.lock:
+            tat = max(self.tats.get(key, now), now) + interval
+            if tat - now > limit:
+                return tat - limit - now
+            self.tats[key] = tat
+            self.calls += 1
+            if self.calls % PURGE_EVERY == 0:
+                # A time in the past is as good as no entry.
+                self.tats = {key: tat for key, tat in self.tats.items() if tat > now}
+            return 0
+
+
+class SQLiteStore:
+    # One row per key, updated by a single UPSERT so concurrent processes
+    # serialise on SQLite's write lock, which is held for that statement only.
+    TAKE = """
+        INSERT INTO throttle (key, tat) VALUES (:key, :now + :interval)
+        ON CONFLICT (key) DO UPDATE SET tat = max(tat, :now) + :interval
+        WHERE max(tat, :now) + :interval - :now <= :limit
+        RETURNING tat
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.local = threading.local()
+
+    def connection(self):
+        # Per thread, and reopened in a forked worker.
+        if getattr(self.local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute('CREATE TABLE IF NOT EXISTS throttle (key TEXT PRIMARY KEY, tat REAL NOT NULL) WITHOUT ROWID')
+            self.local.connection, self.local.pid, self.local.calls = connection, os.getpid(), 0
+        return self.local.connection
+
+    def take(self, key, interval, limit):
+        connection = self.connection()
+        now = time.time()
+        params = {'key': key, 'now': now, 'interval': interval, 'limit': limit}
+        if connection.execute(self.TAKE, params).fetchone() is not None:
+            self.local.calls += 1
+            if self.local.calls % PURGE_EVERY == 0:
+                connection.execute('DELETE FROM throttle WHERE tat < ?', [now])
+            return 0
+        row = connection.execute('SELECT tat FROM throttle WHERE key = ?', [key]).fetchone()
+        return max(row[0], now) + interval - limit - now if row else interval
+
+
+class RedisStore:
+    # The server's clock, so hosts with skewed clocks agree. Keys expire once
+    # their time has passed.
+    TAKE = """
+        local time = redis.call('TIME')
+        local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+        local interval, limit = tonumber(ARGV[1]), tonumber(ARGV[2])
+        local tat = math.max(tonumber(redis.call('GET', KEYS[1]) or 0), now) + interval
+        if tat - now > limit then
+            return tostring(tat - limit - now)
+        end
+        redis.call('SET', KEYS[1], tostring(tat), 'PX', math.ceil((tat - now) * 1000))
+        return '0'
+    """
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("THROTTLE_STORE = 'redis' needs the redis package.")
+        self.script = redis.Redis.from_url(url).register_script(self.TAKE)
+
+    def take(self, key, interval, limit):
+        return float(self.script(keys=[key], args=[interval, limit]))
+
+
+STORE = None
+
+
+def get_store():
+    global STORE
+    if STORE is None:
+        kind = getattr(settings, 'THROTTLE_STORE', 'local')
+        if kind == 'local':
+            STORE = LocalStore()
+        elif kind == 'sqlite':
+            STORE = SQLiteStore(settings.THROTTLE_STORE_PATH)
+        elif kind == 'redis':
+            STORE = RedisStore(settings.THROTTLE_REDIS_URL)
+        else:
+            raise ImproperlyConfigured(f'Unknown THROTTLE_STORE {kind!r}.')
+    return STORE
+
+
+class GCRAThrottle(UserRateThrottle):
+    # UserRateThrottle's rates, scopes and keys, with O(1) state per user.
+
+    def __init__(self):
+        # The rates as configured now rather than when DRF was imported, so
+        # override_settings(REST_FRAMEWORK=...) applies to them.
+        self.THROTTLE_RATES = api_settings.DEFAULT_THROTTLE_RATES
+        super().__init__()
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        interval = self.duration / self.num_requests
+        # Half an interval of slack absorbs float error in the burst's sum.
+        self.wait_seconds = get_store().take(self.key, interval, self.duration + interval / 2)
+        if self.wait_seconds > 0:
+            metrics.inc('throttled_requests_total', {'view': metrics.current_view(), 'scope': self.scope})
+            return False
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class StudentThrottle(GCRAThrottle):
     scope = 'student'
 
-class FacultyThrottle(UserRateThrottle):
+class FacultyThrottle(GCRAThrottle):
     scope = 'faculty'
 
-class AdminThrottle(UserRateThrottle):
-    scope = 'admin'
\ No newline at end of file
+class AdminThrottle(GCRAThrottle):
+    scope = 'admin'
+
+# Per client address, for signing in.
+class LoginThrottle(GCRAThrottle):
+    scope = 'login'
@@ -0,0 +1,131 @@
+import datetime
+import hashlib
+import secrets
+import uuid
+
+from django.conf import settings
+from django.core import signing
+from django.db import router
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+import principal
+from .models import CustomUser, RefreshToken
+
+# Access tokens are the signed claims of a user: id, type, student or faculty
+# id, department, the sign-in (refresh token family) they came from and the
+# user's password fingerprint. Checking one takes no query: the user is built
+# from the claims, and the cached principal (principal.py) says whether the
+# user is still active, still has that password and hasn't signed that
+# sign-in out. Its versions are shared by every worker (PRINCIPAL_VERSION_STORE),
+# so revoking a sign-in or changing the password rejects the access tokens on
+# the next request to any of them. The claims are readable by the client; the
+# principal, not the claims, is what requests are authorized against.
+#
+# Refresh tokens are random, stored hashed, and work once: refreshing gives a
+# new pair of the same family. Presenting a used one means the token was
+# copied, so the whole family is revoked.
+
+ACCESS_SALT = 'accounts.tokens.access'
+
+
+class InvalidToken(exceptions.AuthenticationFailed):
+    default_detail = 'The token is invalid, expired or revoked.'
+    default_code = 'invalid_token'
+
+
+def _hash(raw):
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def access_token(user, family):
+    p = principal.get_principal(user)
+    claims = {
+        'uid': user.pk, 'typ': p.role, 'sid': p.student_id, 'fid': p.faculty_id, 'did': p.department_id,
+        'fam': str(family), 'fp': p.fingerprint,
+    }
+    return signing.dumps(claims, salt=ACCESS_SALT, compress=True)
+
+
+def issue(user, family=None):
+    raw = secrets.token_urlsafe(32)
+    family = family or uuid.uuid4()
+    RefreshToken.objects.create(
+        user=user, token_hash=_hash(raw), family=family, fingerprint=user.token_fingerprint(),
+        expires_at=timezone.now() + datetime.timedelta(seconds=settings.REFRESH_TOKEN_LIFETIME),
+    )
+    return {
+        'access': access_token(user, family),
+        'refresh': raw,
+        'token_type': 'Bearer',
+        'expires_in': settings.ACCESS_TOKEN_LIFETIME,
+    }
+
+
+def revoke_family(user_id, family):
+    RefreshToken.objects.filter(family=family, revoked_at__isnull=True).update(revoked_at=timezone.now())
+    principal.invalidate([user_id])
+
+
+def revoke_user(user_id):
+    RefreshToken.objects.filter(user_id=user_id, revoked_at__isnull=True).update(revoked_at=timezone.now())
+    principal.invalidate([user_id])
+
+
+def refresh(raw):
+    now = timezone.now()
+    token = RefreshToken.objects.select_related('user').filter(token_hash=_hash(raw)).first()
+    if token is None or token.revoked_at is not None or token.expires_at <= now:
+        raise InvalidToken()
+    # Of two refreshes with the same token, only one marks it used.
+    if not RefreshToken.objects.filter(pk=token.pk, used_at__isnull=True).update(used_at=now):
+        revoke_family(token.user_id, token.family)
+        raise InvalidToken()
+    user = token.user
+    if not user.is_active or token.fingerprint != user.token_fingerprint():
+        revoke_family(token.user_id, token.family)
+        raise InvalidToken()
+    return issue(user, token.family)
+
+
+def revoke(raw):
+    token = RefreshToken.objects.filter(token_hash=_hash(raw)).first()
+    if token is not None:
+        revoke_family(token.user_id, token.family)
+
+
+def purge():
+    # Expired refresh tokens, and revoked ones past the lifetime of their
+    # access tokens. Returns how many were deleted.
+    now = timezone.now()
+    expired = RefreshToken.objects.filter(expires_at__lte=now)
+    revoked = RefreshToken.objects.filter(revoked_at__lte=now - datetime.timedelta(seconds=settings.ACCESS_TOKEN_LIFETIME))
+    return expired.delete()[0] + revoked.delete()[0]
+
+
+class AccessTokenAuthentication(BaseAuthentication):
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise InvalidToken('Invalid Authorization header.')
+        try:
+            claims = signing.loads(auth[1].decode(), salt=ACCESS_SALT, max_age=settings.ACCESS_TOKEN_LIFETIME)
+        except (signing.BadSignature, UnicodeError):
+            raise InvalidToken()
+        # The rest of the row loads if something reads it.
+        user = CustomUser.from_db(router.db_for_read(CustomUser), ['id', 'user_type'], [claims['uid'], claims['typ']])
+        try:
+            p = principal.get_principal(user)
+        except CustomUser.DoesNotExist:
+            raise InvalidToken()
+        if not p.is_active or p.fingerprint != claims['fp'] or claims['fam'] in p.revoked_families:
+            raise InvalidToken()
+        return user, claims
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CustomUserViewSet
+from .views import CustomUserViewSet, TokenViewSet
 
 router = DefaultRouter()
 router.register(r'users', CustomUserViewSet)
+router.register(r'token', TokenViewSet, basename='token')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,9 +1,52 @@
-from rest_framework import viewsets
+from django.contrib.auth import authenticate
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.response import Response
 from .models import CustomUser
-from .serializers import CustomUserSerializer
-from rest_framework.permissions import IsAdminUser 
+from .serializers import CustomUserSerializer, TokenObtainSerializer, RefreshTokenSerializer, RevokeTokenSerializer
+from .throttling import LoginThrottle
+from . import tokens
+from rest_framework.permissions import AllowAny, IsAdminUser 
 
 class CustomUserViewSet(viewsets.ModelViewSet):
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
-    permission_classes = [IsAdminUser]
\ No newline at end of file
+    permission_classes = [IsAdminUser]
+
+class TokenViewSet(viewsets.ViewSet):
+    # POST {"username", "password"} signs in and returns an access and a
+    # refresh token; POST {"refresh"} to refresh/ renews them. revoke/ signs
+    # that refresh token's sign-in out, or without one, every sign-in of the
+    # authenticated user.
+    permission_classes = [AllowAny]
+
+    # Only signing in guesses passwords.
+    def get_throttles(self):
+        return [LoginThrottle()] if self.action == 'create' else []
+
+    def create(self, request):
+        serializer = TokenObtainSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = authenticate(request, **serializer.validated_data)
+        if user is None:
+            raise AuthenticationFailed('Wrong username or password.')
+        return Response(tokens.issue(user))
+
+    @action(detail=False, methods=['post'])
+    def refresh(self, request):
+        serializer = RefreshTokenSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(tokens.refresh(serializer.validated_data['refresh']))
+
+    @action(detail=False, methods=['post'])
+    def revoke(self, request):
+        serializer = RevokeTokenSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if 'refresh' in serializer.validated_data:
+            tokens.revoke(serializer.validated_data['refresh'])
+        elif request.user.is_authenticated:
+            tokens.revoke_user(request.user.pk)
+        else:
+            raise AuthenticationFailed('Send the refresh token, or authenticate to sign out everywhere.')
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,3 +1,8 @@
 from django.contrib import admin
+from .models import DepartmentRollup, ProgramRollup, CourseRollup, GradeRollup, ReportJob
 
-# Register your models here.
+admin.site.register(DepartmentRollup)
+admin.site.register(ProgramRollup)
+admin.site.register(CourseRollup)
+admin.site.register(GradeRollup)
+admin.site.register(ReportJob)
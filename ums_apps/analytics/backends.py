@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Sum
+
+from students.models import AttendanceCounter, Student
+from .models import CourseRollup, GradeRollup
+
+# Grade and attendance aggregates behind the analytics views. ANALYTICS_BACKEND
+# picks 'orm' (SQL on every request) or 'columnar' (NumPy arrays held in the
+# process, see analytics.columnar). Student-level results are (student_id, value)
+# pairs; views resolve the names they show.
+
+
+def _percentile(values, p):
+    # Linear interpolation between closest ranks, as numpy.percentile does.
+    if not values:
+        return None
+    position = (len(values) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class ORMBackend:
+    name = 'orm'
+
+    def grades_distribution(self):
+        return list(GradeRollup.objects.filter(count__gt=0).values('grade', 'count').order_by('-grade'))
+
+    def attendance_distribution(self):
+        totals = CourseRollup.objects.aggregate(present=Sum('present_count'), absent=Sum('absent_count'))
+        return {status: count or 0 for status, count in totals.items()}
+
+    def top_gpa(self, n):
+        return list(Student.objects.exclude(gpa=None).order_by('-gpa', 'id').values_list('id', 'gpa')[:n])
+
+    def most_absences(self, n):
+        rows = (
+            AttendanceCounter.objects.filter(absent_count__gt=0)
+            .values('student_id')
+            .annotate(absences=Sum('absent_count'))
+            .order_by('-absences', 'student_id')[:n]
+        )
+        return [(row['student_id'], row['absences']) for row in rows]
+
+    def gpa_percentiles(self, percentiles):
+        gpas = list(Student.objects.exclude(gpa=None).order_by('gpa').values_list('gpa', flat=True))
+        return {p: _percentile(gpas, p) for p in percentiles}
+
+
+class ColumnarBackend:
+    name = 'columnar'
+
+    def __init__(self):
+        from . import columnar
+        self.columnar = columnar
+
+    def _store(self):
+        store = self.columnar.get_store()
+        store.sync()
+        return store
+
+    def grades_distribution(self):
+        values, counts = self._store().grades_distribution()
+        return [{'grade': value, 'count': count} for value, count in zip(values.tolist(), counts.tolist())]
+
+    def attendance_distribution(self):
+        present, absent = self._store().attendance_distribution()
+        return {'present': present, 'absent': absent}
+
+    def top_gpa(self, n):
+        students, gpas = self._store().gpa()
+        return self.columnar.top_n(students, gpas, n)
+
+    def most_absences(self, n):
+        students, absences = self._store().absences()
+        return self.columnar.top_n(students, absences, n)
+
+    def gpa_percentiles(self, percentiles):
+        students, gpas = self._store().gpa()
+        if not len(gpas):
+            return {p: None for p in percentiles}
+        values = self.columnar.np.percentile(gpas, percentiles)
+        return dict(zip(percentiles, values.tolist()))
+
+
+BACKENDS = {
+    ORMBackend.name: ORMBackend,
+    ColumnarBackend.name: ColumnarBackend,
+}
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    name = getattr(settings, 'ANALYTICS_BACKEND', 'orm')
+    if _backend is None or _backend.name != name:
+        if name not in BACKENDS:
+            raise ImproperlyConfigured(f"ANALYTICS_BACKEND must be one of: {', '.join(BACKENDS)}")
+        try:
+            _backend = BACKENDS[name]()
+        except ImportError as exc:
+            raise ImproperlyConfigured(f"The '{name}' analytics backend needs numpy installed.") from exc
+    return _backend
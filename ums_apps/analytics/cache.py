@@ -0,0 +1,108 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.query import QuerySet
+from rest_framework.response import Response
+
+import metrics
+
+# Analytics responses are cached under the data versions of the tables they
+# read. Every committed write bumps its table's version, so a response cached
+# before the write is simply never looked up again.
+
+TABLES = ('grade', 'attendance', 'enrollment', 'withdrawal', 'student', 'faculty', 'academics', 'user')
+
+
+def get_cache():
+    return caches[getattr(settings, 'ANALYTICS_CACHE', 'default')]
+
+
+def _version_key(table):
+    return f'analytics:version:{table}'
+
+
+def _initial_version():
+    # A fresh starting point for versions that were evicted, so keys written
+    # under an earlier counter can't be matched again.
+    return time.time_ns()
+
+
+def get_versions(tables):
+    cache = get_cache()
+    keys = [_version_key(table) for table in tables]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _initial_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def rewrites(table):
+    # Bumped only by updates and deletes, which the column store
+    # (analytics.columnar) can only follow by reloading.
+    return f'{table}_rewrites'
+
+
+def incr_version(table):
+    # The new version, or None if it had been evicted and started over.
+    cache = get_cache()
+    try:
+        return cache.incr(_version_key(table))
+    except ValueError:
+        cache.add(_version_key(table), _initial_version(), timeout=None)
+        return None
+
+
+def bump_version(*tables):
+    def bump():
+        for table in tables:
+            incr_version(table)
+    # Readers that see the new version must also see the new rows.
+    transaction.on_commit(bump)
+
+
+def _response_key(view, request, tables):
+    query = sorted((key, values) for key, values in request.query_params.lists())
+    request_hash = hashlib.md5(f'{request.path}?{query}'.encode()).hexdigest()
+    versions = '.'.join(str(version) for version in get_versions(tables))
+    return f'analytics:response:{type(view).__name__}:{request_hash}:{versions}'
+
+
+def _materialize(data):
+    if isinstance(data, QuerySet):
+        return list(data)
+    if isinstance(data, list):
+        return [_materialize(item) for item in data]
+    if isinstance(data, dict):
+        return {key: _materialize(value) for key, value in data.items()}
+    return data
+
+
+def cache_response(*tables):
+    # Decorates an APIView.get; `tables` lists every table the view reads.
+    unknown = set(tables) - set(TABLES)
+    if unknown:
+        raise ValueError(f"Unknown analytics cache tables: {', '.join(sorted(unknown))}")
+
+    def decorator(get):
+        @wraps(get)
+        def wrapper(view, request, *args, **kwargs):
+            cache = get_cache()
+            key = _response_key(view, request, tables)
+            data = cache.get(key)
+            metrics.cache_lookup('analytics', data is not None)
+            if data is not None:
+                return Response(data)
+
+            response = get(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                response.data = _materialize(response.data)
+                cache.set(key, response.data, getattr(settings, 'ANALYTICS_CACHE_TIMEOUT', 60 * 60))
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,239 @@
+import datetime
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+from django.db import transaction
+
+from students.models import Attendance, Grade
+from .cache import bump_version, get_cache, get_versions, incr_version, rewrites
+
+# In-memory column arrays for Grade and Attendance. Loaded once per process,
+# then kept current by appending new rows; an update or delete anywhere forces
+# a full reload on the next read.
+#
+# New rows are found through a journal in the analytics cache rather than by
+# id: every commit that creates rows bumps the table's appended version and
+# stores the created ids under the new version. sync() replays the versions
+# between the one it last saw and the current one, so rows are picked up
+# whatever order their ids committed in. A missing entry (evicted, expired, or
+# the version restarted) can't be replayed and forces a full reload instead.
+
+LOAD_CHUNK_SIZE = 50000
+# Beyond this many commits since the last sync a reload is cheaper.
+MAX_REPLAY = 1000
+JOURNAL_TIMEOUT = 60 * 60
+# Appended rows are checked for duplicates linearly; past this many they are
+# sorted into the rest.
+UNSORTED_LIMIT = 65536
+EPOCH_ORDINAL = 719163  # date(1970, 1, 1).toordinal()
+
+
+def appended(table):
+    return f'{table}_appended'
+
+
+def _journal_key(table, version):
+    return f'analytics:columnar:{table}:{version}'
+
+
+class Columns:
+    def __init__(self, **dtypes):
+        self.dtypes = dtypes
+        self.size = 0
+        # Rows up to here are in id order.
+        self.sorted_size = 0
+        self.data = {name: np.empty(1024, dtype=dtype) for name, dtype in dtypes.items()}
+
+    def __getattr__(self, name):
+        data = self.__dict__.get('data')
+        if data is None or name not in data:
+            raise AttributeError(name)
+        return data[name][:self.size]
+
+    def extend(self, rows):
+        # rows: list of tuples in the order of `dtypes`.
+        if not rows:
+            return
+        needed = self.size + len(rows)
+        capacity = len(next(iter(self.data.values())))
+        if needed > capacity:
+            capacity = max(needed, capacity * 2)
+            for name, array in self.data.items():
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[:self.size] = array[:self.size]
+                self.data[name] = grown
+        for name, column in zip(self.dtypes, zip(*rows)):
+            self.data[name][self.size:needed] = column
+        self.size = needed
+
+    def known_ids(self, ids):
+        ordered = self.id[:self.sorted_size]
+        positions = np.minimum(np.searchsorted(ordered, ids), max(len(ordered) - 1, 0))
+        known = ordered[positions] == ids if len(ordered) else np.zeros(len(ids), dtype=bool)
+        return known | np.isin(ids, self.id[self.sorted_size:])
+
+    def sort(self):
+        # Into new arrays, leaving snapshots of the old ones as they were.
+        order = np.argsort(self.id, kind='stable')
+        for name, array in self.data.items():
+            ordered = np.empty_like(array)
+            ordered[:self.size] = array[:self.size][order]
+            self.data[name] = ordered
+        self.sorted_size = self.size
+
+    def snapshot(self):
+        # Views of the columns at their current size. extend() only writes
+        # past that size or into grown copies and sort() into new arrays, so
+        # the views keep describing the same rows while the store syncs.
+        return SimpleNamespace(size=self.size, **{name: array[:self.size] for name, array in self.data.items()})
+
+
+def _grade_row(row):
+    return row
+
+
+def _attendance_row(row):
+    pk, student_id, course_id, date, status = row
+    if isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    return pk, student_id, course_id, date.toordinal() - EPOCH_ORDINAL, status == 'present'
+
+
+TABLES = {
+    'grade': (Grade, ('id', 'student_id', 'course_id', 'grade'), _grade_row),
+    'attendance': (Attendance, ('id', 'student_id', 'course_id', 'date', 'status'), _attendance_row),
+}
+
+
+class ColumnStore:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.versions = {}
+
+    def _empty(self, table):
+        if table == 'grade':
+            return Columns(id=np.int64, student=np.int32, course=np.int32, value=np.float64)
+        return Columns(id=np.int64, student=np.int32, course=np.int32, day=np.int32, present=np.bool_)
+
+    def _fetch(self, table, queryset, columns):
+        model, fields, convert = TABLES[table]
+        batch = []
+        for row in queryset.values_list(*fields).order_by('id').iterator(chunk_size=LOAD_CHUNK_SIZE):
+            batch.append(convert(row))
+            if len(batch) == LOAD_CHUNK_SIZE:
+                columns.extend(batch)
+                batch = []
+        columns.extend(batch)
+
+    def _load(self, table):
+        model = TABLES[table][0]
+        columns = self._empty(table)
+        self._fetch(table, model.objects.all(), columns)
+        columns.sorted_size = columns.size
+        setattr(self, table, columns)
+
+    def _replay(self, table, seen, current):
+        # Adds the rows journaled after version `seen`; False if they can't
+        # all be found.
+        if seen is None or not 0 < current - seen <= MAX_REPLAY:
+            return False
+        keys = [_journal_key(table, version) for version in range(seen + 1, current + 1)]
+        entries = get_cache().get_many(keys)
+        if len(entries) != len(keys):
+            return False
+        columns = getattr(self, table)
+        ids = np.unique(np.fromiter((pk for ids in entries.values() for pk in ids), dtype=np.int64))
+        # The versions are read before a load, so a load can already hold
+        # rows journaled after them.
+        ids = ids[~columns.known_ids(ids)]
+        model = TABLES[table][0]
+        for start in range(0, len(ids), 1000):
+            self._fetch(table, model.objects.filter(id__in=ids[start:start + 1000].tolist()), columns)
+        if columns.size - columns.sorted_size > UNSORTED_LIMIT:
+            columns.sort()
+        return True
+
+    def sync(self):
+        with self.lock:
+            keys = [name for table in TABLES for name in (rewrites(table), appended(table))]
+            versions = dict(zip(keys, get_versions(keys)))
+            for table in TABLES:
+                if not self.loaded or versions[rewrites(table)] != self.versions.get(rewrites(table)):
+                    self._load(table)
+                elif versions[appended(table)] != self.versions.get(appended(table)):
+                    if not self._replay(table, self.versions.get(appended(table)), versions[appended(table)]):
+                        self._load(table)
+            self.versions = versions
+            self.loaded = True
+
+    def append(self, table, ids):
+        # Journals rows created in this transaction for every process's sync().
+        ids = list(ids)
+
+        def journal():
+            version = incr_version(appended(table))
+            if version is not None:
+                get_cache().set(_journal_key(table, version), ids, JOURNAL_TIMEOUT)
+        transaction.on_commit(journal)
+
+    def rewritten(self, table):
+        bump_version(rewrites(table))
+
+    def snapshot(self, table):
+        with self.lock:
+            return getattr(self, table).snapshot()
+
+    # Aggregates, each over one snapshot. Student ids index bincount arrays
+    # directly.
+
+    def gpa(self):
+        grades = self.snapshot('grade')
+        if not grades.size:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        totals = np.bincount(grades.student, weights=grades.value)
+        counts = np.bincount(grades.student)
+        students = np.flatnonzero(counts)
+        return students, totals[students] / counts[students]
+
+    def grades_distribution(self):
+        values, counts = np.unique(self.snapshot('grade').value, return_counts=True)
+        return values[::-1], counts[::-1]
+
+    def attendance_distribution(self):
+        attendance = self.snapshot('attendance')
+        present = int(np.count_nonzero(attendance.present))
+        return present, attendance.size - present
+
+    def absences(self):
+        attendance = self.snapshot('attendance')
+        absent = attendance.student[~attendance.present]
+        if not absent.size:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        counts = np.bincount(absent)
+        students = np.flatnonzero(counts)
+        return students, counts[students]
+
+
+STORE = None
+
+
+def get_store():
+    global STORE
+    if STORE is None:
+        STORE = ColumnStore()
+    return STORE
+
+
+def top_n(keys, values, n, descending=True):
+    # Top n by value without sorting the whole array; ties broken by key.
+    if not len(values):
+        return []
+    order_values = -values if descending else values
+    if n < len(values):
+        candidates = np.argpartition(order_values, n - 1)[:n]
+    else:
+        candidates = np.arange(len(values))
+    ranked = candidates[np.lexsort((keys[candidates], order_values[candidates]))]
+    return [(int(keys[i]), values[i].item()) for i in ranked]
@@ -0,0 +1,408 @@
+from collections import defaultdict
+
+from django.db.models import Avg, Count, F, Sum
+from django.db.models.functions import ExtractYear
+
+from students.models import Enrollment, AttendanceCounter, Grade, Student
+from faculty.models import Faculty
+from academics.models import Course, Program
+from .models import DepartmentRollup, ProgramRollup, CourseRollup, GradeRollup
+from . import ranking
+
+# The admin dashboard renders every analytics metric at once. Each section is
+# built from one or more shared sources; a source is a single query over one
+# base table and is run at most once per dashboard request, no matter how many
+# sections read from it. Sources return rows per group (department, program,
+# course, grade value) or an already ranked and limited list, never a row per
+# student, so a dashboard's memory doesn't grow with the number of students.
+
+SOURCES = {}
+SECTIONS = {}
+
+
+def source(name):
+    def register(fn):
+        SOURCES[name] = fn
+        return fn
+    return register
+
+
+def section(name, *sources, scoped=False):
+    # `scoped` sections describe a single program and need ?program=<id>.
+    def register(fn):
+        SECTIONS[name] = (sources, scoped, fn)
+        return fn
+    return register
+
+
+def _round(value):
+    return round(value, 2) if value else None
+
+
+def _ranked(rows, key, reverse=True, limit=None):
+    rows = sorted(rows, key=lambda row: row[key], reverse=reverse)
+    return rows[:limit] if limit else rows
+
+
+def with_unassigned(rows, unassigned):
+    # The rollups are kept per department; people with none are counted from
+    # the raw table and reported last, as the GROUP BY over it reported them.
+    rows = list(rows)
+    if unassigned:
+        rows.append({'department__name': None, 'total': unassigned})
+    return rows
+
+
+def _grouped_sum(rows, group, *fields):
+    totals = defaultdict(lambda: dict.fromkeys(fields, 0))
+    for row in rows:
+        for field in fields:
+            totals[row[group]][field] += row[field]
+    return totals
+
+
+@source('departments')
+def _departments(program):
+    return list(DepartmentRollup.objects.values('department__name', 'student_count', 'faculty_count'))
+
+
+@source('unassigned_students')
+def _unassigned_students(program):
+    return Student.objects.filter(department=None).count()
+
+
+@source('unassigned_faculty')
+def _unassigned_faculty(program):
+    return Faculty.objects.filter(department=None).count()
+
+
+@source('programs')
+def _programs(program):
+    return list(ProgramRollup.objects.values(
+        'program__name', 'program__department__name',
+        'student_count', 'grade_sum', 'grade_count', 'withdrawal_count',
+    ))
+
+
+@source('courses')
+def _courses(program):
+    return list(CourseRollup.objects.values(
+        'course__name', 'course__program__name',
+        'enrollment_count', 'withdrawal_count', 'present_count', 'absent_count',
+    ))
+
+
+@source('grade_values')
+def _grade_values(program):
+    return list(GradeRollup.objects.filter(count__gt=0).values('grade', 'count').order_by('-grade'))
+
+
+@source('course_assignments')
+def _course_assignments(program):
+    return list(Course.objects.values('program__name', 'faculty_id', 'faculty__user__username'))
+
+
+@source('top_gpa')
+def _top_gpa(program):
+    # The stored Student.gpa, read through its index.
+    return list(
+        Student.objects.exclude(gpa=None).order_by('-gpa', 'id').values('user__username', 'gpa')[:10]
+    )
+
+
+@source('most_absences')
+def _most_absences(program):
+    return list(
+        AttendanceCounter.objects.values('student__user__username')
+        .annotate(absences=Sum('absent_count'))
+        .filter(absences__gt=0)
+        .order_by('-absences', 'student__user__username')[:10]
+    )
+
+
+@source('program_attendance')
+def _program_attendance(program):
+    # Per program, the sum and count of the (student, course) attendance
+    # percentages, so departments can be averaged from the programs.
+    return list(
+        AttendanceCounter.objects.filter(total_count__gt=0)
+        .values('student__program__name', 'student__program__department__name')
+        .annotate(percentage_sum=Sum('attendance_percentage'), n=Count('id'))
+        .order_by()
+    )
+
+
+@source('department_top_students')
+def _department_top_students(program):
+    if program['department_id'] is None:
+        return []
+    groups = ranking.top_students('department', 3, group_id=program['department_id'])
+    return groups[0]['top_students'] if groups else []
+
+
+@source('program_top_students')
+def _program_top_students(program):
+    groups = ranking.top_students('program', 3, group_id=program['id'])
+    return groups[0]['top_students'] if groups else []
+
+
+@source('program_low_performers')
+def _program_low_performers(program):
+    return list(
+        Student.objects.filter(program_id=program['id'], gpa__lt=50)
+        .order_by('gpa', 'id')
+        .values('id', 'user__first_name', 'user__last_name', 'gpa')
+    )
+
+
+@source('enrollment_years')
+def _enrollment_years(program):
+    return list(
+        Enrollment.objects.annotate(academic_year=ExtractYear('enrolled_on'))
+        .values('course__program__name', 'academic_year')
+        .annotate(total=Count('id'))
+        .order_by('course__program__name', 'academic_year')
+    )
+
+
+@source('program_course_grades')
+def _program_course_grades(program):
+    return list(
+        Grade.objects.filter(student__program_id=program['id'])
+        .values('course__name')
+        .annotate(avg_grade=Avg('grade'))
+        .order_by('-avg_grade')[:5]
+    )
+
+
+@section('students_per_department', 'departments', 'unassigned_students')
+def students_per_department(data, program):
+    rows = [
+        {'department__name': row['department__name'], 'total': row['student_count']}
+        for row in data['departments'] if row['student_count'] > 0
+    ]
+    return with_unassigned(rows, data['unassigned_students'])
+
+
+@section('faculty_per_department', 'departments', 'unassigned_faculty')
+def faculty_per_department(data, program):
+    rows = [
+        {'department__name': row['department__name'], 'total': row['faculty_count']}
+        for row in data['departments'] if row['faculty_count'] > 0
+    ]
+    return with_unassigned(rows, data['unassigned_faculty'])
+
+
+@section('enrollment_per_program', 'courses')
+def enrollment_per_program(data, program):
+    totals = _grouped_sum(data['courses'], 'course__program__name', 'enrollment_count')
+    return [
+        {'course__program__name': name, 'total': row['enrollment_count']}
+        for name, row in totals.items() if row['enrollment_count'] > 0
+    ]
+
+
+@section('attendance_distribution', 'courses')
+def attendance_distribution(data, program):
+    present = sum(row['present_count'] for row in data['courses'])
+    absent = sum(row['absent_count'] for row in data['courses'])
+    return [
+        {'status': status, 'count': count}
+        for status, count in (('present', present), ('absent', absent)) if count
+    ]
+
+
+@section('grades_distribution', 'grade_values')
+def grades_distribution(data, program):
+    return data['grade_values']
+
+
+@section('withdrawals_per_course', 'courses')
+def withdrawals_per_course(data, program):
+    totals = _grouped_sum(data['courses'], 'course__name', 'withdrawal_count')
+    rows = [
+        {'course__name': name, 'total': row['withdrawal_count']}
+        for name, row in totals.items() if row['withdrawal_count'] > 0
+    ]
+    return _ranked(rows, 'total')
+
+
+@section('top_performing_students', 'top_gpa')
+def top_performing_students(data, program):
+    return [{'student__user__username': row['user__username'], 'gpa': row['gpa']} for row in data['top_gpa']]
+
+
+@section('low_attendance_students', 'most_absences')
+def low_attendance_students(data, program):
+    return data['most_absences']
+
+
+@section('popular_courses', 'courses')
+def popular_courses(data, program):
+    totals = _grouped_sum(data['courses'], 'course__name', 'enrollment_count')
+    rows = [
+        {'course__name': name, 'total': row['enrollment_count']}
+        for name, row in totals.items() if row['enrollment_count'] > 0
+    ]
+    return _ranked(rows, 'total', limit=10)
+
+
+@section('faculty_teaching_load', 'course_assignments')
+def faculty_teaching_load(data, program):
+    totals = defaultdict(int)
+    for row in data['course_assignments']:
+        if row['faculty_id'] is not None:
+            totals[row['faculty__user__username']] += 1
+    rows = [{'faculty__user__username': name, 'total_courses': total} for name, total in totals.items()]
+    return _ranked(rows, 'total_courses')
+
+
+def _average_grades(rows, group, label):
+    totals = _grouped_sum(rows, group, 'grade_sum', 'grade_count')
+    response = [
+        {label: name, 'average_grade': round(row['grade_sum'] / row['grade_count'], 2)}
+        for name, row in totals.items() if row['grade_count'] > 0
+    ]
+    return _ranked(response, 'average_grade')
+
+
+def _withdrawals(rows, group, label):
+    totals = _grouped_sum(rows, group, 'withdrawal_count')
+    response = [
+        {label: name, 'withdrawals': row['withdrawal_count']}
+        for name, row in totals.items() if row['withdrawal_count'] > 0
+    ]
+    return _ranked(response, 'withdrawals')
+
+
+def _average_attendance(rows, group, label):
+    totals = _grouped_sum(rows, group, 'percentage_sum', 'n')
+    response = [
+        {label: name, 'average_attendance': round(row['percentage_sum'] / row['n'], 2)}
+        for name, row in totals.items()
+    ]
+    return _ranked(response, 'average_attendance')
+
+
+@section('average_grades_by_department', 'programs')
+def average_grades_by_department(data, program):
+    return _average_grades(data['programs'], 'program__department__name', 'department')
+
+
+@section('withdrawal_rate_by_department', 'programs')
+def withdrawal_rate_by_department(data, program):
+    return _withdrawals(data['programs'], 'program__department__name', 'department')
+
+
+@section('attendance_summary_by_department', 'program_attendance')
+def attendance_summary_by_department(data, program):
+    return _average_attendance(data['program_attendance'], 'student__program__department__name', 'department')
+
+
+@section('enrollment_trends_by_program', 'enrollment_years')
+def enrollment_trends_by_program(data, program):
+    return [
+        {
+            'program': row['course__program__name'],
+            'academic_year': row['academic_year'],
+            'total_enrolled': row['total'],
+        }
+        for row in data['enrollment_years']
+    ]
+
+
+@section('students_per_program', 'programs')
+def students_per_program(data, program):
+    rows = [
+        {'program__name': row['program__name'], 'total': row['student_count']}
+        for row in data['programs'] if row['student_count'] > 0
+    ]
+    return _ranked(rows, 'total')
+
+
+@section('faculty_per_program', 'course_assignments')
+def faculty_per_program(data, program):
+    # Faculty belong to a program through the courses they teach.
+    faculty = defaultdict(set)
+    for row in data['course_assignments']:
+        if row['faculty_id'] is not None:
+            faculty[row['program__name']].add(row['faculty_id'])
+    rows = [{'program__name': name, 'total': len(ids)} for name, ids in faculty.items()]
+    return _ranked(rows, 'total')
+
+
+@section('average_grades_by_program', 'programs')
+def average_grades_by_program(data, program):
+    return _average_grades(data['programs'], 'program__name', 'program')
+
+
+@section('withdrawal_rate_by_program', 'programs')
+def withdrawal_rate_by_program(data, program):
+    return _withdrawals(data['programs'], 'program__name', 'program')
+
+
+@section('attendance_summary_by_program', 'program_attendance')
+def attendance_summary_by_program(data, program):
+    return _average_attendance(data['program_attendance'], 'student__program__name', 'program')
+
+
+@section('top_students_by_department', 'department_top_students', scoped=True)
+def top_students_by_department(data, program):
+    rows = [
+        {
+            'student__user__id': row['student__user__id'],
+            'student__user__username': row['student__user__username'],
+            'gpa': row['gpa'],
+        }
+        for row in data['department_top_students']
+    ]
+    return [{'department': program['department__name'], 'top_students': rows}]
+
+
+@section('top_courses_by_program', 'program_course_grades', scoped=True)
+def top_courses_by_program(data, program):
+    return [
+        {'course': row['course__name'], 'average_grade': _round(row['avg_grade'])}
+        for row in data['program_course_grades']
+    ]
+
+
+@section('low_performing_students_by_program', 'program_low_performers', scoped=True)
+def low_performing_students_by_program(data, program):
+    return [
+        {
+            'student_id': row['id'],
+            'name': f"{row['user__first_name']} {row['user__last_name']}",
+            'average_grade': round(row['gpa'], 2),
+        }
+        for row in data['program_low_performers']
+    ]
+
+
+@section('top_students_by_program', 'program_top_students', scoped=True)
+def top_students_by_program(data, program):
+    return [
+        {
+            'student_id': row['student__user__id'],
+            'name': f"{row['student__user__first_name']} {row['student__user__last_name']}",
+            'gpa': round(row['gpa'], 2),
+        }
+        for row in data['program_top_students']
+    ]
+
+
+def get_program(program_id):
+    # The program a scoped section describes, or None if there is no such program.
+    if program_id is None or not str(program_id).isdigit():
+        return None
+    return Program.objects.filter(pk=program_id).values('id', 'department_id', 'department__name').first()
+
+
+def default_sections(program=None):
+    return [name for name, (sources, scoped, fn) in SECTIONS.items() if program or not scoped]
+
+
+def build(names, program=None):
+    needed = {src for name in names for src in SECTIONS[name][0]}
+    data = {src: SOURCES[src](program) for src in needed}
+    return {name: SECTIONS[name][2](data, program) for name in names}
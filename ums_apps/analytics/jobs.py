@@ -0,0 +1,105 @@
+import hashlib
+import json
+import multiprocessing
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from . import cache, dashboard
+from .models import ReportJob
+
+# Expensive analytics reports run outside the request: a POST creates a
+# ReportJob and hands its id to a local process pool, and the client polls the
+# job for the result. Report kinds are the dashboard sections.
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.ANALYTICS_REPORT_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            # Not a function from this module: unpickling that would import
+            # the models before the worker has set Django up.
+            initializer=django.setup,
+        )
+    return _executor
+
+
+def fingerprint(kind, params):
+    # Any write bumps a data version, so a finished job is reused only while
+    # its result is still current.
+    versions = cache.get_versions(cache.TABLES)
+    payload = json.dumps([kind, params, versions], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _reusable(key):
+    return ReportJob.objects.filter(fingerprint=key).exclude(status='failed').order_by('-created_at').first()
+
+
+def request_report(kind, params, user=None):
+    # Returns (job, created). Identical requests get the same job while it is
+    # in flight, and its result once it is done.
+    key = fingerprint(kind, params)
+    job = _reusable(key)
+    if job is not None:
+        return job, False
+    try:
+        with transaction.atomic():
+            job = ReportJob.objects.create(kind=kind, params=params, fingerprint=key, requested_by=user)
+    except IntegrityError:
+        return _reusable(key), False
+    transaction.on_commit(lambda: submit(job.pk))
+    return job, True
+
+
+def submit(job_id):
+    global _executor
+    if not settings.ANALYTICS_REPORT_WORKERS:
+        run_job(job_id)
+        return
+    try:
+        _get_executor().submit(_run_in_worker, job_id)
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool. The job is still pending.
+        _executor = None
+        _get_executor().submit(_run_in_worker, job_id)
+
+
+def build_report(kind, params):
+    program = dashboard.get_program(params.get('program'))
+    return dashboard.build([kind], program)[kind]
+
+
+def run_job(job_id):
+    claimed = ReportJob.objects.filter(pk=job_id, status='pending').update(
+        status='running', started_at=timezone.now()
+    )
+    if not claimed:
+        return
+    job = ReportJob.objects.get(pk=job_id)
+    try:
+        result = json.loads(json.dumps(build_report(job.kind, job.params), cls=DjangoJSONEncoder))
+    except Exception:
+        ReportJob.objects.filter(pk=job_id).update(
+            status='failed', error=traceback.format_exc(), finished_at=timezone.now()
+        )
+    else:
+        ReportJob.objects.filter(pk=job_id).update(status='done', result=result, finished_at=timezone.now())
+
+
+def _run_in_worker(job_id):
+    close_old_connections()
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
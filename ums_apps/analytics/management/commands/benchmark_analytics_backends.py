@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics.backends import ORMBackend, ColumnarBackend
+from analytics.columnar import ColumnStore
+
+OPERATIONS = {
+    'grades_distribution': lambda backend: backend.grades_distribution(),
+    'attendance_distribution': lambda backend: backend.attendance_distribution(),
+    'top_gpa': lambda backend: backend.top_gpa(10),
+    'most_absences': lambda backend: backend.most_absences(10),
+    'gpa_percentiles': lambda backend: backend.gpa_percentiles([10, 50, 90]),
+}
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, result
+
+
+class Command(BaseCommand):
+    help = 'Time the ORM and columnar analytics backends against the current database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        orm = ORMBackend()
+        columnar = ColumnarBackend()
+        store = columnar.columnar.STORE = ColumnStore()
+
+        start = time.perf_counter()
+        store.sync()
+        load_ms = (time.perf_counter() - start) * 1000
+        self.stdout.write(
+            f'columnar load: {load_ms:.1f} ms ({store.grade.size} grades, {store.attendance.size} attendance rows)'
+        )
+
+        self.stdout.write(f"{'operation':<26}{'orm ms':>12}{'columnar ms':>14}{'speedup':>10}  match")
+        for name, operation in OPERATIONS.items():
+            orm_ms, orm_result = best_of(repeat, lambda: operation(orm))
+            columnar_ms, columnar_result = best_of(repeat, lambda: operation(columnar))
+            speedup = orm_ms / columnar_ms if columnar_ms else float('inf')
+            match = _same(orm_result, columnar_result)
+            self.stdout.write(f'{name:<26}{orm_ms:>12.2f}{columnar_ms:>14.2f}{speedup:>9.1f}x  {match}')
+
+
+def _same(left, right):
+    # Top-n lists may order ties differently; compare the values only.
+    if isinstance(left, list) and left and isinstance(left[0], tuple):
+        return [round(value, 6) for _, value in left] == [round(value, 6) for _, value in right]
+    if isinstance(left, dict):
+        return all(
+            (left[key] is None and right[key] is None) or round(left[key], 6) == round(right[key], 6)
+            for key in left
+        )
+    return left == right
@@ -0,0 +1,196 @@
+import datetime
+import json
+import math
+import re
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment
+from django.urls import URLPattern, reverse
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser
+from academics.models import Department, Program
+from students.models import Student, Enrollment, Withdrawal, Grade, Attendance
+from faculty.models import Faculty
+from analytics import cache, urls as analytics_urls
+from analytics.models import ReportJob
+
+# ViewSet routers whose list endpoints are timed once per role.
+ROUTERS = ['accounts.urls', 'academics.urls', 'students.urls', 'faculty.urls']
+ROLES = ['admin', 'faculty', 'student']
+COUNTED_MODELS = [CustomUser, Department, Program, Student, Faculty, Enrollment, Withdrawal, Grade, Attendance]
+PARAMETER = re.compile(r'<(?:\w+:)?(\w+)>')
+
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile.
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(len(sorted_values) * p / 100) - 1)]
+
+
+def milliseconds(value):
+    return round(value, 3) if value is not None else None
+
+
+def column(value, width):
+    return f'{value:>{width}.1f}' if value is not None else f"{'-':>{width}}"
+
+
+def route_values():
+    # Existing rows to fill URL parameters with; a route whose parameter has
+    # no value here is not timed.
+    return {
+        'program_id': Program.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'job_id': ReportJob.objects.order_by('-created_at').values_list('pk', flat=True).first(),
+    }
+
+
+def analytics_endpoints():
+    values = route_values()
+    for pattern in analytics_urls.urlpatterns:
+        if not isinstance(pattern, URLPattern):
+            continue
+        view_class = pattern.callback.view_class
+        # Requests are GETs; views that only take POSTs are left out.
+        if not hasattr(view_class, 'get'):
+            continue
+        route = str(pattern.pattern)
+        if any(values.get(name) is None for name in PARAMETER.findall(route)):
+            continue
+        route = PARAMETER.sub(lambda match: str(values[match.group(1)]), route)
+        yield view_class.__name__, f'/api/analytics/{route}'
+
+
+def list_endpoints():
+    for module in ROUTERS:
+        router = __import__(module, fromlist=['router']).router
+        for prefix, viewset, basename in router.registry:
+            if hasattr(viewset, 'list'):
+                yield viewset.__name__, reverse(f'{basename}-list')
+
+
+class Command(BaseCommand):
+    help = 'Time every analytics endpoint and every ViewSet list per role; write a JSON report.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', default='benchmark-report.json')
+        parser.add_argument('--compare', help='An earlier report to compare p50 latencies against.')
+        parser.add_argument('--admin', help='Username of the admin user to run as.')
+        parser.add_argument('--faculty', help='Username of the faculty user to run as.')
+        parser.add_argument('--student', help='Username of the student user to run as.')
+        parser.add_argument('--cold', action='store_true', help='Invalidate cached analytics before every request.')
+        parser.add_argument('--filter', default='', help='Only run endpoints whose path contains this.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1.')
+        setup_test_environment()
+        users = {role: self.user(role, options[role]) for role in ROLES}
+        cases = [
+            ('analytics', name, 'admin', path)
+            for name, path in analytics_endpoints()
+        ] + [
+            ('list', name, role, path)
+            for name, path in list_endpoints()
+            for role in ROLES if users[role] is not None
+        ]
+        cases = [case for case in cases if options['filter'] in case[3]]
+
+        # The per-role rate limits would reject most repeats; measure the views.
+        rates = {scope: None for scope in settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']}
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}):
+            results = [self.run_case(users, *case, options['repeat'], options['cold']) for case in cases]
+
+        report = {
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'analytics_backend': getattr(settings, 'ANALYTICS_BACKEND', 'orm'),
+            'cold': options['cold'],
+            'repeat': options['repeat'],
+            'rows': {model._meta.label: model.objects.count() for model in COUNTED_MODELS},
+            'results': results,
+        }
+        with open(options['output'], 'w') as fh:
+            json.dump(report, fh, indent=2)
+
+        previous = {}
+        if options['compare']:
+            with open(options['compare']) as fh:
+                previous = {(r['role'], r['path']): r for r in json.load(fh)['results']}
+        self.print_table(results, previous)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}."))
+
+    def user(self, role, username):
+        users = CustomUser.objects.filter(is_active=True)
+        if username:
+            user = users.filter(username=username).first()
+            if user is None:
+                raise CommandError(f'No active user named {username!r}.')
+            return user
+        if role == 'admin':
+            user = users.filter(is_staff=True).order_by('pk').first()
+            if user is None:
+                raise CommandError('No staff user to run as; generate_university creates one, or pass --admin.')
+            return user
+        # The reverse one-to-one from CustomUser is named after the role.
+        return users.filter(user_type=role).exclude(**{role: None}).order_by('pk').first()
+
+    def run_case(self, users, kind, name, role, path, repeat, cold):
+        client = APIClient()
+        client.force_authenticate(users[role])
+        # Record a failing view as a 500 rather than aborting the run.
+        client.raise_request_exception = False
+        timings = []
+        for n in range(repeat + 1):
+            if cold:
+                cache.bump_version(*cache.TABLES)
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = client.get(path)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = (time.perf_counter() - start) * 1000
+            # Status, size and queries of the last request.
+            queries, status = len(captured), response.status_code
+            size = len(response.content) if not response.streaming else None
+            if n == 0:
+                # The first request may fill caches; report it apart.
+                first_ms, first_queries = elapsed, queries
+            else:
+                timings.append(elapsed)
+        timings.sort()
+        return {
+            'kind': kind,
+            'name': name,
+            'role': role,
+            'path': path,
+            'status': status,
+            'bytes': size,
+            'first_ms': round(first_ms, 3),
+            'first_queries': first_queries,
+            'queries': queries,
+            'p50_ms': milliseconds(percentile(timings, 50)),
+            'p95_ms': milliseconds(percentile(timings, 95)),
+            'max_ms': milliseconds(timings[-1] if timings else None),
+        }
+
+    def print_table(self, results, previous):
+        self.stdout.write(
+            f"{'path':<52}{'role':<9}{'status':>7}{'queries':>9}{'first ms':>10}{'p50 ms':>9}{'p95 ms':>9}"
+            + ('  vs prev p50' if previous else '')
+        )
+        for result in results:
+            line = (
+                f"{result['path']:<52}{result['role']:<9}{result['status']:>7}{result['first_queries']:>4}/"
+                f"{result['queries']:<4}{column(result['first_ms'], 10)}{column(result['p50_ms'], 9)}"
+                f"{column(result['p95_ms'], 9)}"
+            )
+            before = previous.get((result['role'], result['path']))
+            if before and before['p50_ms'] and result['p50_ms'] is not None:
+                line += f"  {result['p50_ms'] / before['p50_ms']:>6.2f}x"
+            self.stdout.write(line)
@@ -0,0 +1,111 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+
+from accounts.models import CustomUser
+from academics.models import Course, Timetable
+from students.models import Student
+from scoping import scope
+from .benchmark_api import percentile
+
+# The role scoping the viewsets used before scoping.py: joins across the
+# enrollments, de-duplicated with DISTINCT.
+JOIN_SCOPES = [
+    (Student, 'faculty', lambda user: Student.objects.filter(enrollment__course__faculty__user=user).distinct()),
+    (Course, 'student', lambda user: Course.objects.filter(enrollment__student__user=user).distinct()),
+    (Timetable, 'student', lambda user: Timetable.objects.filter(course__enrollment__student__user=user).distinct()),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare the DISTINCT-join role scoping against the semi-join scoping in scoping.py.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--faculty', help='Username of the faculty user to scope for (default: the busiest).')
+        parser.add_argument('--student', help='Username of the student user to scope for.')
+        parser.add_argument('--explain', action='store_true', help='Print both query plans.')
+        parser.add_argument('--analyze', action='store_true', help='EXPLAIN ANALYZE (PostgreSQL).')
+        parser.add_argument('--output', help='Write the results as JSON.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1.')
+        users = {role: self.user(role, options[role]) for role in ('faculty', 'student')}
+        results = []
+        for model, role, join_scope in JOIN_SCOPES:
+            user = users[role]
+            if user is None:
+                self.stderr.write(f'No {role} user; skipping {model.__name__}.')
+                continue
+            variants = {
+                'join': join_scope(user).order_by('pk'),
+                'semijoin': scope(model.objects.all(), user).order_by('pk'),
+            }
+            ids = {name: set(queryset.values_list('pk', flat=True)) for name, queryset in variants.items()}
+            if ids['join'] != ids['semijoin']:
+                raise CommandError(f'{model.__name__} for {role}: the scopes disagree.')
+            result = {'model': model.__name__, 'role': role, 'user': user.username, 'rows': len(ids['semijoin'])}
+            for name, queryset in variants.items():
+                result[name] = self.time(queryset, options['repeat'], options['page_size'])
+                if options['explain']:
+                    self.stdout.write(f'-- {model.__name__} / {role} / {name}\n{queryset.query}')
+                    self.stdout.write(self.explain(queryset[:options['page_size']], options['analyze']) + '\n')
+            results.append(result)
+
+        self.stdout.write(
+            f"{'model':<12}{'role':<9}{'rows':>8}{'join count':>12}{'semi count':>14}"
+            f"{'join page':>11}{'semi page':>13}{'speedup':>9}"
+        )
+        for r in results:
+            join, semi = r['join'], r['semijoin']
+            speedup = (join['count_ms'] + join['page_ms']) / max(semi['count_ms'] + semi['page_ms'], 1e-6)
+            self.stdout.write(
+                f"{r['model']:<12}{r['role']:<9}{r['rows']:>8}{join['count_ms']:>12.2f}{semi['count_ms']:>14.2f}"
+                f"{join['page_ms']:>11.2f}{semi['page_ms']:>13.2f}{speedup:>8.2f}x"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump({'database': connection.vendor, 'results': results}, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}."))
+
+    def user(self, role, username):
+        users = CustomUser.objects.filter(user_type=role)
+        if username:
+            user = users.filter(username=username).first()
+            if user is None:
+                raise CommandError(f'No {role} named {username!r}.')
+            return user
+        if role == 'faculty':
+            # The faculty member with the most enrollments across their courses.
+            user_id = (
+                Course.objects.exclude(faculty=None).values('faculty__user')
+                .annotate(n=Count('enrollment'))
+                .order_by('-n').values_list('faculty__user', flat=True).first()
+            )
+            return users.filter(pk=user_id).first()
+        return users.exclude(student=None).order_by('pk').first()
+
+    def time(self, queryset, repeat, page_size):
+        # Median of the list endpoint's two queries: the COUNT and the first page.
+        count, page = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            queryset.count()
+            count.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            list(queryset[:page_size])
+            page.append((time.perf_counter() - start) * 1000)
+        return {
+            'count_ms': round(percentile(sorted(count), 50), 3),
+            'page_ms': round(percentile(sorted(page), 50), 3),
+        }
+
+    def explain(self, queryset, analyze):
+        if analyze and connection.vendor == 'postgresql':
+            return queryset.explain(analyze=True, buffers=True)
+        return queryset.explain()
@@ -0,0 +1,202 @@
+import datetime
+import random
+import time
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import CustomUser
+from academics.models import Department, Program, Course, Timetable
+from faculty.models import Faculty
+from students.models import Student, Enrollment, Withdrawal, Grade, Attendance
+from students.attendance import rebuild_counters
+from students.gpa import recompute
+from students.seats import recount
+from analytics import cache, rollups
+
+# Row counts at --scale 1. Scale 10 gives 100k students and, with the default
+# 5 courses of 40 meetings each, 20M Attendance rows.
+PER_SCALE = {
+    'departments': 5,
+    'faculty': 70,
+    'students': 10000,
+}
+PROGRAMS_PER_DEPARTMENT = 5
+COURSES_PER_PROGRAM = 8
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+FIRST_NAMES = ['Ali', 'Sara', 'Omar', 'Ayesha', 'Hassan', 'Fatima', 'Bilal', 'Zara', 'Usman', 'Hina', 'Ahmed', 'Maryam']
+LAST_NAMES = ['Khan', 'Ahmed', 'Malik', 'Qureshi', 'Sheikh', 'Butt', 'Raza', 'Iqbal', 'Chaudhry', 'Siddiqui']
+WITHDRAWAL_REASONS = ['Schedule conflict', 'Medical leave', 'Course load', 'Transferred', 'Financial reasons']
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with a synthetic university for load and benchmark runs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0)
+        parser.add_argument('--courses-per-student', type=int, default=5)
+        parser.add_argument('--meetings', type=int, default=40, help='Attendance rows per enrollment.')
+        parser.add_argument('--graded', type=float, default=0.8, help='Share of enrollments with a grade.')
+        parser.add_argument('--withdrawn', type=float, default=0.03, help='Share of enrollments withdrawn.')
+        parser.add_argument('--term-start', type=datetime.date.fromisoformat, default=datetime.date(2025, 9, 1))
+        parser.add_argument('--prefix', default='gen', help='Prefix of generated usernames.')
+        parser.add_argument('--password', default='password')
+        parser.add_argument('--chunk-size', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.prefix = options['prefix']
+        if CustomUser.objects.filter(username__startswith=f'{self.prefix}-').exists():
+            raise CommandError(f"Users prefixed '{self.prefix}-' already exist; pick another --prefix.")
+
+        scale = options['scale']
+        counts = {name: max(1, round(count * scale)) for name, count in PER_SCALE.items()}
+        self.password = make_password(options['password'])
+        started = time.perf_counter()
+
+        departments = self.create(Department, (
+            Department(name=f'Department {n}') for n in range(counts['departments'])
+        ))
+        programs = self.create(Program, (
+            Program(name=f'{department.name} Program {n}', department=department)
+            for department in departments for n in range(PROGRAMS_PER_DEPARTMENT)
+        ))
+
+        admin = CustomUser.objects.create(
+            username=f'{self.prefix}-admin', email=f'{self.prefix}-admin@example.com', password=self.password,
+            user_type='admin', is_staff=True, is_superuser=True,
+        )
+        users = self.create_users('faculty', counts['faculty'])
+        faculty = self.create(Faculty, (
+            Faculty(user=user, department=departments[n % len(departments)]) for n, user in enumerate(users)
+        ))
+        faculty_by_department = {}
+        for member in faculty:
+            faculty_by_department.setdefault(member.department_id, []).append(member)
+
+        courses = self.create(Course, (
+            Course(
+                name=f'{program.name} Course {n}',
+                code=f'C{program.pk}-{n}'[:10],
+                program=program,
+                faculty=self.rng.choice(faculty_by_department[program.department_id]),
+            )
+            for program in programs for n in range(COURSES_PER_PROGRAM)
+        ))
+        meetings = self.create_timetables(courses, options['meetings'], options['term_start'])
+
+        users = self.create_users('student', counts['students'])
+        program_list = list(programs)
+        students = []
+        for n, user in enumerate(users):
+            program = program_list[n % len(program_list)]
+            students.append(Student(
+                user=user,
+                program=program,
+                department_id=program.department_id,
+                enrollment_date=options['term_start'] - datetime.timedelta(days=365 * self.rng.randrange(4)),
+            ))
+        students = self.create(Student, students)
+
+        courses_by_program = {}
+        for course in courses:
+            courses_by_program.setdefault(course.program_id, []).append(course.pk)
+        pairs = []
+        for student in students:
+            offered = courses_by_program[student.program_id]
+            for course_id in self.rng.sample(offered, min(options['courses_per_student'], len(offered))):
+                pairs.append((student.pk, course_id))
+        self.create(Enrollment, (Enrollment(student_id=s, course_id=c) for s, c in pairs), keep=False)
+
+        # Each student gets an ability (mean grade) and a diligence (chance of
+        # attending), so rankings and low-attendance lists have a real spread.
+        ability = {student.pk: self.rng.gauss(70, 12) for student in students}
+        diligence = {student.pk: self.rng.betavariate(9, 1.5) for student in students}
+
+        self.create(Grade, (
+            Grade(student_id=s, course_id=c, grade=min(100, max(0, round(self.rng.gauss(ability[s], 8)))))
+            for s, c in pairs if self.rng.random() < options['graded']
+        ), keep=False)
+        self.create(Withdrawal, (
+            Withdrawal(student_id=s, course_id=c, reason=self.rng.choice(WITHDRAWAL_REASONS))
+            for s, c in pairs if self.rng.random() < options['withdrawn']
+        ), keep=False)
+        self.create(Attendance, (
+            Attendance(
+                student_id=s, course_id=c, date=date,
+                status='present' if self.rng.random() < diligence[s] else 'absent',
+            )
+            for s, c in pairs for date in meetings[c]
+        ), keep=False)
+
+        # bulk_create skips the signals that keep derived tables current.
+        self.stdout.write('Rebuilding rollups, attendance counters, GPAs and seat counts...')
+        rollups.rebuild()
+        rebuild_counters()
+        recompute()
+        recount()
+        # Rows written without signals: the column store has to reload too.
+        cache.bump_version(*cache.TABLES, cache.rewrites('grade'), cache.rewrites('attendance'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated a university at scale {scale:g} in {time.perf_counter() - started:.1f}s. '
+            f'Staff user: {admin.username} (password from --password).'
+        ))
+
+    def create(self, model, objects, keep=True):
+        created = []
+        total = 0
+        started = time.perf_counter()
+        for chunk in chunks(objects, self.chunk_size):
+            chunk = model.objects.bulk_create(chunk)
+            total += len(chunk)
+            if keep:
+                created.extend(chunk)
+            if self.stdout.isatty():
+                self.stdout.write(f'{model.__name__}: {total}', ending='\r')
+        self.stdout.write(f'{model.__name__}: {total} ({time.perf_counter() - started:.1f}s)')
+        return created
+
+    def create_users(self, user_type, count):
+        return self.create(CustomUser, (
+            CustomUser(
+                username=f'{self.prefix}-{user_type}-{n}',
+                first_name=self.rng.choice(FIRST_NAMES),
+                last_name=self.rng.choice(LAST_NAMES),
+                email=f'{self.prefix}-{user_type}-{n}@example.com',
+                password=self.password,
+                user_type=user_type,
+            )
+            for n in range(count)
+        ))
+
+    def create_timetables(self, courses, meeting_count, term_start):
+        # Two weekly slots per course; returns the attendance dates of each course.
+        meetings = {}
+        timetables = []
+        first_monday = term_start + datetime.timedelta(days=-term_start.weekday() % 7)
+        for course in courses:
+            days = sorted(self.rng.sample(range(len(WEEKDAYS)), 2))
+            hour = self.rng.randrange(8, 17)
+            for day in days:
+                timetables.append(Timetable(
+                    course=course,
+                    day=WEEKDAYS[day],
+                    start_time=datetime.time(hour),
+                    end_time=datetime.time(hour + 1, 30),
+                ))
+            meetings[course.pk] = [
+                first_monday + datetime.timedelta(weeks=n // len(days), days=days[n % len(days)])
+                for n in range(meeting_count)
+            ]
+        self.create(Timetable, timetables, keep=False)
+        return meetings
@@ -0,0 +1,40 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from analytics.jobs import run_job
+from analytics.models import ReportJob
+
+
+class Command(BaseCommand):
+    help = 'Run pending analytics report jobs in this process, e.g. the ones left behind by a restart.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requeue-after', type=int, metavar='MINUTES',
+            help='Requeue jobs that have been running for longer than this.',
+        )
+        parser.add_argument(
+            '--purge-after', type=int, metavar='DAYS',
+            help='Delete finished and failed jobs older than this.',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        if options['requeue_after'] is not None:
+            requeued = ReportJob.objects.filter(
+                status='running', started_at__lt=now - datetime.timedelta(minutes=options['requeue_after'])
+            ).update(status='pending', started_at=None)
+            self.stdout.write(f'Requeued {requeued} stalled jobs.')
+        if options['purge_after'] is not None:
+            purged, _ = ReportJob.objects.filter(
+                status__in=['done', 'failed'], finished_at__lt=now - datetime.timedelta(days=options['purge_after'])
+            ).delete()
+            self.stdout.write(f'Deleted {purged} old jobs.')
+
+        count = 0
+        for job_id in ReportJob.objects.filter(status='pending').order_by('created_at').values_list('pk', flat=True):
+            run_job(job_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Ran {count} pending jobs.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from analytics import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the analytics rollup tables from the raw students/faculty tables.'
+
+    def handle(self, *args, **options):
+        counts = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            'Rebuilt rollups for {departments} departments, {programs} programs, {courses} courses.'.format(**counts)
+        ))
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('academics', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grade', models.FloatField(unique=True)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CourseRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('enrollment_count', models.IntegerField(default=0)),
+                ('withdrawal_count', models.IntegerField(default=0)),
+                ('grade_sum', models.FloatField(default=0)),
+                ('grade_count', models.IntegerField(default=0)),
+                ('present_count', models.BigIntegerField(default=0)),
+                ('absent_count', models.BigIntegerField(default=0)),
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rollup', to='academics.course')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DepartmentRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('student_count', models.IntegerField(default=0)),
+                ('faculty_count', models.IntegerField(default=0)),
+                ('department', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rollup', to='academics.department')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProgramRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('student_count', models.IntegerField(default=0)),
+                ('grade_sum', models.FloatField(default=0)),
+                ('grade_count', models.IntegerField(default=0)),
+                ('withdrawal_count', models.IntegerField(default=0)),
+                ('program', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='rollup', to='academics.program')),
+            ],
+        ),
+    ]
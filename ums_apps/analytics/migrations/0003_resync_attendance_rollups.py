@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.db.models import Sum
+
+
+def resync_attendance_rollups(apps, schema_editor):
+    # students.0004 removed duplicate attendance marks; recount the course
+    # rollups from the per-(student, course) counters.
+    AttendanceCounter = apps.get_model('students', 'AttendanceCounter')
+    CourseRollup = apps.get_model('analytics', 'CourseRollup')
+    totals = AttendanceCounter.objects.values('course_id').annotate(
+        present=Sum('present_count'), absent=Sum('absent_count'),
+    ).order_by()
+    for row in totals:
+        CourseRollup.objects.filter(course_id=row['course_id']).update(
+            present_count=row['present'], absent_count=row['absent'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_reportjob'),
+        ('students', '0004_attendance_unique_mark'),
+    ]
+
+    operations = [
+        migrations.RunPython(resync_attendance_rollups, migrations.RunPython.noop),
+    ]
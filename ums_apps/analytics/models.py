@@ -1,3 +1,81 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+# Summary tables kept up to date by analytics.signals and rebuilt from scratch
+# by `manage.py rebuild_rollups`. Each row aggregates the raw students/faculty
+# tables for one group so analytics views read O(groups) rows.
+
+class DepartmentRollup(models.Model):
+    department = models.OneToOneField('academics.Department', on_delete=models.CASCADE, related_name='rollup')
+    student_count = models.IntegerField(default=0)
+    faculty_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.department} rollup"
+
+class ProgramRollup(models.Model):
+    # Grades and withdrawals are attributed to the student's program.
+    program = models.OneToOneField('academics.Program', on_delete=models.CASCADE, related_name='rollup')
+    student_count = models.IntegerField(default=0)
+    grade_sum = models.FloatField(default=0)
+    grade_count = models.IntegerField(default=0)
+    withdrawal_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.program} rollup"
+
+class CourseRollup(models.Model):
+    course = models.OneToOneField('academics.Course', on_delete=models.CASCADE, related_name='rollup')
+    enrollment_count = models.IntegerField(default=0)
+    withdrawal_count = models.IntegerField(default=0)
+    grade_sum = models.FloatField(default=0)
+    grade_count = models.IntegerField(default=0)
+    present_count = models.BigIntegerField(default=0)
+    absent_count = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.course} rollup"
+
+class GradeRollup(models.Model):
+    grade = models.FloatField(unique=True)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.grade}: {self.count}"
+
+class ReportJob(models.Model):
+    # An analytics report computed in the background by analytics.jobs.
+    # `fingerprint` covers the report, its parameters and the data versions it
+    # was requested under, so identical requests share one job and its result.
+    STATUSES = (
+        ('pending', 'pending'),
+        ('running', 'running'),
+        ('done', 'done'),
+        ('failed', 'failed'),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=100)
+    params = models.JSONField(default=dict)
+    fingerprint = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # At most one in-flight job per fingerprint.
+            models.UniqueConstraint(
+                fields=['fingerprint'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_inflight_report_job',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} ({self.status})"
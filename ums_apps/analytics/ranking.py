@@ -0,0 +1,76 @@
+from itertools import groupby
+
+from django.db.models import Avg, F, Window
+from django.db.models.functions import RowNumber
+
+from students.models import Grade, Student
+
+MAX_N = 100
+
+# partition name -> (group id lookup, group label lookup). Department and
+# program rank the stored Student.gpa through its (group, gpa) index; course
+# ranks the per-course average of Grade.
+PARTITIONS = {
+    'department': ('department_id', 'department__name'),
+    'program': ('program_id', 'program__name'),
+    'course': ('course_id', 'course__name'),
+}
+
+STUDENT_FIELDS = ('id', 'user__id', 'user__username', 'user__first_name', 'user__last_name')
+
+
+def top_n_per_group(queryset, partition_by, order_by, n):
+    # One query: number the rows of every partition with ROW_NUMBER() and keep
+    # the first n of each, instead of one LIMIT query per group.
+    return (
+        queryset
+        .annotate(rank=Window(RowNumber(), partition_by=partition_by, order_by=order_by))
+        .filter(rank__lte=n)
+    )
+
+
+def _ranked_rows(partition, group_field, label_field, n, group_id):
+    if partition == 'course':
+        queryset = Grade.objects.values(
+            group_field, label_field, *(f'student__{field}' for field in STUDENT_FIELDS)
+        ).annotate(gpa=Avg('grade'))
+        gpa = Avg('grade')
+        prefix = 'student__'
+    else:
+        queryset = Student.objects.exclude(gpa=None).values(group_field, label_field, *STUDENT_FIELDS, 'gpa')
+        gpa = F('gpa')
+        prefix = ''
+    queryset = queryset.exclude(**{group_field: None})
+    if group_id is not None:
+        queryset = queryset.filter(**{group_field: group_id})
+    rows = top_n_per_group(
+        queryset,
+        partition_by=[F(group_field)],
+        order_by=[gpa.desc(), F(f'{prefix}id').asc()],
+        n=n,
+    ).order_by(group_field, 'rank')
+    for row in rows:
+        yield row.pop(group_field), row.pop(label_field), {
+            'student_id': row[f'{prefix}id'],
+            **{f'student__{field}': row[f'{prefix}{field}'] for field in STUDENT_FIELDS[1:]},
+            'gpa': row['gpa'],
+            'rank': row['rank'],
+        }
+
+
+def top_students(partition, n, group_id=None):
+    group_field, label_field = PARTITIONS[partition]
+    rows = _ranked_rows(partition, group_field, label_field, n, group_id)
+    return [
+        {'id': key[0], 'name': key[1], 'top_students': [student for _, _, student in students]}
+        for key, students in groupby(rows, key=lambda row: row[:2])
+    ]
+
+
+def parse_n(value, default=3):
+    # Returns None for anything that is not a positive integer.
+    if value is None:
+        return default
+    if not value.isdigit() or int(value) < 1:
+        return None
+    return min(int(value), MAX_N)
@@ -0,0 +1,236 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+
+from students.models import Student, Enrollment, Withdrawal, Attendance, Grade
+from faculty.models import Faculty
+from .cache import TABLES, bump_version
+from .models import DepartmentRollup, ProgramRollup, CourseRollup, GradeRollup
+
+
+_batch = threading.local()
+
+
+def _bump(model, lookup, **deltas):
+    # Atomically add `deltas` to the rollup row identified by `lookup`,
+    # creating the row on first use. Rows with a NULL key are not tracked;
+    # the views count those from the raw table.
+    if any(value is None for value in lookup.values()):
+        return
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    pending = getattr(_batch, 'deltas', None)
+    if pending is not None:
+        [(key_field, key)] = lookup.items()
+        for field, delta in deltas.items():
+            pending[model, key_field][key][field] += delta
+        return
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    # A missing row is only created for additions: retractions can come from
+    # a cascade that has already deleted the rollup row along with its key.
+    if all(delta < 0 for delta in deltas.values()):
+        return
+    model.objects.get_or_create(**lookup)
+    model.objects.filter(**lookup).update(**updates)
+
+
+def _bump_many(model, key_field, rows):
+    # `rows` maps key -> {field: delta}: one UPDATE adds every row's deltas.
+    rows = {key: {f: d for f, d in deltas.items() if d} for key, deltas in rows.items()}
+    rows = {key: deltas for key, deltas in rows.items() if deltas}
+    if not rows:
+        return
+    # As in _bump, only additions create missing rows.
+    model.objects.bulk_create(
+        [model(**{key_field: key}) for key, deltas in rows.items() if any(d > 0 for d in deltas.values())],
+        ignore_conflicts=True,
+    )
+    fields = {field for deltas in rows.values() for field in deltas}
+    model.objects.filter(**{f'{key_field}__in': list(rows)}).update(**{
+        field: F(field) + Case(
+            *(When(**{key_field: key}, then=Value(deltas[field])) for key, deltas in rows.items() if field in deltas),
+            default=Value(0), output_field=model._meta.get_field(field).__class__(),
+        )
+        for field in fields
+    })
+
+
+@contextmanager
+def batched(student_ids=()):
+    # Collects the deltas of many changes and writes them with one UPDATE per
+    # rollup table, for bulk writes that don't send per-row signals.
+    _batch.deltas = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+    _batch.programs = dict(Student.objects.filter(pk__in=student_ids).values_list('pk', 'program_id'))
+    try:
+        yield
+        pending = _batch.deltas
+    finally:
+        del _batch.deltas, _batch.programs
+    with transaction.atomic():
+        for (model, key_field), rows in sorted(pending.items(), key=lambda item: item[0][0].__name__):
+            _bump_many(model, key_field, rows)
+
+
+def _student_program(student_id):
+    programs = getattr(_batch, 'programs', None)
+    if programs is not None and student_id in programs:
+        return programs[student_id]
+    return Student.objects.filter(pk=student_id).values_list('program_id', flat=True).first()
+
+
+def _changed(old, new, fields):
+    return old is None or new is None or any(old[f] != new[f] for f in fields)
+
+
+def _apply(handler, old, new, fields):
+    # Shared update logic: retract the old row, count the new one.
+    if not _changed(old, new, fields):
+        return
+    # In a batch nothing is written until the batch's own transaction.
+    with transaction.atomic() if getattr(_batch, 'deltas', None) is None else nullcontext():
+        if old is not None:
+            handler(old, -1)
+        if new is not None:
+            handler(new, 1)
+
+
+def _student(values, sign):
+    _bump(DepartmentRollup, {'department_id': values['department_id']}, student_count=sign)
+    _bump(ProgramRollup, {'program_id': values['program_id']}, student_count=sign)
+
+
+def _faculty(values, sign):
+    _bump(DepartmentRollup, {'department_id': values['department_id']}, faculty_count=sign)
+
+
+def _enrollment(values, sign):
+    _bump(CourseRollup, {'course_id': values['course_id']}, enrollment_count=sign)
+
+
+def _withdrawal(values, sign):
+    _bump(ProgramRollup, {'program_id': _student_program(values['student_id'])}, withdrawal_count=sign)
+    _bump(CourseRollup, {'course_id': values['course_id']}, withdrawal_count=sign)
+
+
+def _grade(values, sign):
+    grade = values['grade']
+    _bump(ProgramRollup, {'program_id': _student_program(values['student_id'])},
+          grade_sum=sign * grade, grade_count=sign)
+    _bump(CourseRollup, {'course_id': values['course_id']}, grade_sum=sign * grade, grade_count=sign)
+    _bump(GradeRollup, {'grade': grade}, count=sign)
+
+
+def _attendance(values, sign):
+    field = 'present_count' if values['status'] == 'present' else 'absent_count'
+    _bump(CourseRollup, {'course_id': values['course_id']}, **{field: sign})
+
+
+def student_changed(old, new):
+    _apply(_student, old, new, ('department_id', 'program_id'))
+    if old is None or new is None or old['program_id'] == new['program_id']:
+        return
+    # The student's grades and withdrawals follow them to the new program.
+    totals = Grade.objects.filter(student_id=new['id']).aggregate(total=Sum('grade'), count=Count('id'))
+    withdrawals = Withdrawal.objects.filter(student_id=new['id']).count()
+    with transaction.atomic():
+        for program_id, sign in ((old['program_id'], -1), (new['program_id'], 1)):
+            _bump(ProgramRollup, {'program_id': program_id},
+                  grade_sum=sign * (totals['total'] or 0),
+                  grade_count=sign * totals['count'],
+                  withdrawal_count=sign * withdrawals)
+
+
+def faculty_changed(old, new):
+    _apply(_faculty, old, new, ('department_id',))
+
+
+def enrollment_changed(old, new):
+    _apply(_enrollment, old, new, ('course_id',))
+
+
+def withdrawal_changed(old, new):
+    _apply(_withdrawal, old, new, ('student_id', 'course_id'))
+
+
+def grade_changed(old, new):
+    _apply(_grade, old, new, ('student_id', 'course_id', 'grade'))
+
+
+def attendance_changed(old, new):
+    _apply(_attendance, old, new, ('course_id', 'status'))
+
+
+def attendance_removed(counts):
+    # As students.attendance.marks_removed, for the course rollups.
+    courses = defaultdict(lambda: defaultdict(int))
+    for (student_id, course_id), (present, absent) in counts.items():
+        courses[course_id]['present_count'] -= present
+        courses[course_id]['absent_count'] -= absent
+    _bump_many(CourseRollup, 'course_id', courses)
+
+
+@transaction.atomic
+def rebuild():
+    for model in (DepartmentRollup, ProgramRollup, CourseRollup, GradeRollup):
+        model.objects.all().delete()
+
+    departments = {}
+    for row in Student.objects.exclude(department=None).values('department_id').annotate(n=Count('id')):
+        departments.setdefault(row['department_id'], {})['student_count'] = row['n']
+    for row in Faculty.objects.exclude(department=None).values('department_id').annotate(n=Count('id')):
+        departments.setdefault(row['department_id'], {})['faculty_count'] = row['n']
+
+    programs = {}
+    for row in Student.objects.exclude(program=None).values('program_id').annotate(n=Count('id')):
+        programs.setdefault(row['program_id'], {})['student_count'] = row['n']
+    grades = (
+        Grade.objects.exclude(student__program=None)
+        .values('student__program_id')
+        .annotate(total=Sum('grade'), n=Count('id'))
+    )
+    for row in grades:
+        programs.setdefault(row['student__program_id'], {}).update(grade_sum=row['total'], grade_count=row['n'])
+    withdrawals = Withdrawal.objects.exclude(student__program=None).values('student__program_id').annotate(n=Count('id'))
+    for row in withdrawals:
+        programs.setdefault(row['student__program_id'], {})['withdrawal_count'] = row['n']
+
+    courses = {}
+    for row in Enrollment.objects.values('course_id').annotate(n=Count('id')):
+        courses.setdefault(row['course_id'], {})['enrollment_count'] = row['n']
+    for row in Withdrawal.objects.values('course_id').annotate(n=Count('id')):
+        courses.setdefault(row['course_id'], {})['withdrawal_count'] = row['n']
+    for row in Grade.objects.values('course_id').annotate(total=Sum('grade'), n=Count('id')):
+        courses.setdefault(row['course_id'], {}).update(grade_sum=row['total'], grade_count=row['n'])
+    attendance = Attendance.objects.values('course_id').annotate(
+        present=Count('id', filter=Q(status='present')),
+        absent=Count('id', filter=Q(status='absent')),
+    )
+    for row in attendance:
+        courses.setdefault(row['course_id'], {}).update(present_count=row['present'], absent_count=row['absent'])
+
+    DepartmentRollup.objects.bulk_create(
+        DepartmentRollup(department_id=key, **values) for key, values in departments.items()
+    )
+    ProgramRollup.objects.bulk_create(
+        ProgramRollup(program_id=key, **values) for key, values in programs.items()
+    )
+    CourseRollup.objects.bulk_create(
+        CourseRollup(course_id=key, **values) for key, values in courses.items()
+    )
+    GradeRollup.objects.bulk_create(
+        GradeRollup(grade=row['grade'], count=row['n'])
+        for row in Grade.objects.values('grade').annotate(n=Count('id')).order_by()
+    )
+    # Responses cached from the rollups before the repair.
+    bump_version(*TABLES)
+    return {
+        'departments': len(departments),
+        'programs': len(programs),
+        'courses': len(courses),
+    }
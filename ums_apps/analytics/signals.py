@@ -0,0 +1,153 @@
+from django.conf import settings
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from students.models import Student, Enrollment, Withdrawal, Attendance, Grade
+from students.signals import bulk_changed
+from faculty.models import Faculty
+from academics.models import Department, Program, Course
+from accounts.models import CustomUser
+from . import rollups
+from .cache import TABLES, bump_version, incr_version, rewrites
+
+HANDLERS = {
+    Student: rollups.student_changed,
+    Enrollment: rollups.enrollment_changed,
+    Withdrawal: rollups.withdrawal_changed,
+    Grade: rollups.grade_changed,
+    Attendance: rollups.attendance_changed,
+}
+
+
+def update_rollups_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    HANDLERS[sender](instance._previous, instance.current_values())
+
+
+def update_rollups_on_delete(sender, instance, **kwargs):
+    HANDLERS[sender](instance.current_values(), None)
+
+
+def update_rollups_in_bulk(sender, changes, **kwargs):
+    student_ids = {values.get('student_id') for pair in changes for values in pair if values is not None}
+    with rollups.batched(student_ids - {None}):
+        for old, new in changes:
+            HANDLERS[sender](old, new)
+
+
+for model in HANDLERS:
+    post_save.connect(update_rollups_on_save, sender=model, dispatch_uid=f'rollups_save_{model.__name__}')
+    post_delete.connect(update_rollups_on_delete, sender=model, dispatch_uid=f'rollups_delete_{model.__name__}')
+    bulk_changed.connect(update_rollups_in_bulk, sender=model, dispatch_uid=f'rollups_bulk_{model.__name__}')
+
+
+@receiver(pre_save, sender=Faculty)
+def remember_faculty_department(sender, instance, raw=False, **kwargs):
+    instance._previous_department_id = None
+    if instance.pk is not None and not raw:
+        instance._previous_department_id = (
+            Faculty.objects.filter(pk=instance.pk).values_list('department_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Faculty)
+def update_faculty_rollups(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old = None if created else {'department_id': instance._previous_department_id}
+    rollups.faculty_changed(old, {'department_id': instance.department_id})
+
+
+@receiver(post_delete, sender=Faculty)
+def retract_faculty_rollups(sender, instance, **kwargs):
+    rollups.faculty_changed({'department_id': instance.department_id}, None)
+
+
+CACHE_TABLES = {
+    Grade: 'grade',
+    Attendance: 'attendance',
+    Enrollment: 'enrollment',
+    Withdrawal: 'withdrawal',
+    Student: 'student',
+    Faculty: 'faculty',
+    Department: 'academics',
+    Program: 'academics',
+    Course: 'academics',
+    CustomUser: 'user',
+}
+
+
+def invalidate_cache_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Logins only touch last_login, which no analytics response shows.
+    if raw or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    bump_version(CACHE_TABLES[sender])
+
+
+def invalidate_cache_on_delete(sender, instance, **kwargs):
+    bump_version(CACHE_TABLES[sender])
+
+
+def invalidate_cache_in_bulk(sender, changes, **kwargs):
+    if changes:
+        bump_version(CACHE_TABLES[sender])
+
+
+for model in CACHE_TABLES:
+    post_save.connect(invalidate_cache_on_save, sender=model, dispatch_uid=f'cache_save_{model.__name__}')
+    post_delete.connect(invalidate_cache_on_delete, sender=model, dispatch_uid=f'cache_delete_{model.__name__}')
+    bulk_changed.connect(invalidate_cache_in_bulk, sender=model, dispatch_uid=f'cache_bulk_{model.__name__}')
+
+
+COLUMN_TABLES = {Grade: 'grade', Attendance: 'attendance'}
+
+
+def _column_store():
+    if getattr(settings, 'ANALYTICS_BACKEND', 'orm') != 'columnar':
+        return None
+    from .columnar import get_store
+    return get_store()
+
+
+def update_column_store_on_save(sender, instance, created, raw=False, **kwargs):
+    store = _column_store()
+    if store is None or raw:
+        return
+    if created:
+        store.append(COLUMN_TABLES[sender], [instance.pk])
+    else:
+        store.rewritten(COLUMN_TABLES[sender])
+
+
+def update_column_store_on_delete(sender, instance, **kwargs):
+    store = _column_store()
+    if store is not None:
+        store.rewritten(COLUMN_TABLES[sender])
+
+
+def update_column_store_in_bulk(sender, changes, **kwargs):
+    store = _column_store()
+    if store is None:
+        return
+    if any(old is not None for old, new in changes):
+        store.rewritten(COLUMN_TABLES[sender])
+        return
+    store.append(COLUMN_TABLES[sender], (new['id'] for old, new in changes))
+
+
+for model in COLUMN_TABLES:
+    post_save.connect(update_column_store_on_save, sender=model, dispatch_uid=f'columns_save_{model.__name__}')
+    post_delete.connect(update_column_store_on_delete, sender=model, dispatch_uid=f'columns_delete_{model.__name__}')
+    bulk_changed.connect(update_column_store_in_bulk, sender=model, dispatch_uid=f'columns_bulk_{model.__name__}')
+
+
+def invalidate_cache_after_migrate(sender, plan=None, **kwargs):
+    # Data migrations write through the historical models, which send no
+    # signals, so everything cached or loaded before a migrate is dropped.
+    # Connected in AnalyticsConfig.ready, once per migrate.
+    if not plan:
+        return
+    for table in (*TABLES, *(rewrites(table) for table in COLUMN_TABLES.values())):
+        incr_version(table)
+
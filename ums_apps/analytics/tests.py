@@ -1,3 +1,203 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import caches
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase
+
+import principal
+from accounts import throttling
+from accounts.models import CustomUser
+from academics.models import Department, Program, Course
+from faculty.models import Faculty
+from students.models import Student, Enrollment, Withdrawal, Grade, Attendance
+from analytics import columnar, dashboard, ranking, rollups
+from analytics.backends import ColumnarBackend, ORMBackend
+from analytics.columnar import Columns
+from analytics.models import DepartmentRollup, ProgramRollup, CourseRollup, GradeRollup
+
+
+def isolate(test):
+    caches['default'].clear()
+    principal.VERSIONS = principal.LocalVersions()
+    throttling.STORE = throttling.LocalStore()
+    test.addCleanup(setattr, principal, 'VERSIONS', None)
+    test.addCleanup(setattr, throttling, 'STORE', None)
+
+
+def populate():
+    # Two departments, three programs, four courses and eight students with
+    # grades and a month of Monday attendance.
+    departments = [Department.objects.create(name=f'D{n}') for n in range(2)]
+    programs = [Program.objects.create(name=f'P{n}', department=departments[n % 2]) for n in range(3)]
+    courses = [Course.objects.create(name=f'C{n}', code=f'C{n}', program=programs[n % 3]) for n in range(4)]
+    students = []
+    for n in range(8):
+        program = programs[n % 3]
+        student = Student.objects.create(
+            user=CustomUser.objects.create_user(f's{n}', user_type='student'),
+            department=program.department, program=program, enrollment_date=datetime.date(2024, 9, 1),
+        )
+        students.append(student)
+        for course in (courses[n % 4], courses[(n + 1) % 4]):
+            Enrollment.objects.create(student=student, course=course)
+            Grade.objects.create(student=student, course=course, grade=40 + (n * 7 + course.pk * 3) % 60)
+            for week in range(4):
+                Attendance.objects.create(
+                    student=student, course=course, date=datetime.date(2024, 9, 2) + datetime.timedelta(weeks=week),
+                    status='absent' if (n + week) % 3 == 0 else 'present',
+                )
+    return departments, programs, courses, students
+
+
+class ColumnsTests(SimpleTestCase):
+    def test_snapshot_survives_extend_and_sort(self):
+        columns = Columns(id=np.int64, value=np.float64)
+        columns.extend([(3, 30.0), (1, 10.0)])
+        snapshot = columns.snapshot()
+        columns.extend([(2, 20.0)] * 2000)
+        columns.sort()
+        self.assertEqual(snapshot.size, 2)
+        self.assertEqual(snapshot.id.tolist(), [3, 1])
+        self.assertEqual(snapshot.value.tolist(), [30.0, 10.0])
+        self.assertEqual(columns.id[:3].tolist(), [1, 2, 2])
+
+    def test_known_ids(self):
+        columns = Columns(id=np.int64)
+        columns.extend([(1,), (4,), (9,)])
+        columns.sorted_size = 2
+        self.assertEqual(columns.known_ids(np.array([1, 2, 4, 9, 10])).tolist(), [True, False, True, True, False])
+
+
+class DashboardTests(TestCase):
+    # The dashboard's sections match the standalone views, unassigned
+    # students, faculty and courses included.
+    def setUp(self):
+        isolate(self)
+        department = Department.objects.create(name='Science')
+        program = Program.objects.create(name='Physics', department=department)
+        lecturer = Faculty.objects.create(
+            user=CustomUser.objects.create_user('lecturer', user_type='faculty'), department=department,
+        )
+        Faculty.objects.create(user=CustomUser.objects.create_user('visitor', user_type='faculty'))
+        Course.objects.create(name='Optics', code='PHY200', program=program, faculty=lecturer)
+        Course.objects.create(name='Acoustics', code='PHY210', program=program)
+        for username, dept in (('alice', department), ('bob', None)):
+            Student.objects.create(
+                user=CustomUser.objects.create_user(username, user_type='student'),
+                department=dept, program=program, enrollment_date=datetime.date(2024, 9, 1),
+            )
+        self.client.force_login(CustomUser.objects.create_superuser('admin', 'admin@example.com', None, user_type='admin'))
+
+    def test_sections_match_views(self):
+        sections = dashboard.build(['students_per_department', 'faculty_per_department', 'faculty_teaching_load'])
+        for name, url in (
+            ('students_per_department', '/api/analytics/students-per-department/'),
+            ('faculty_per_department', '/api/analytics/faculty-per-department/'),
+            ('faculty_teaching_load', '/api/analytics/faculty-teaching-load/'),
+        ):
+            self.assertEqual(sections[name], self.client.get(url).json(), name)
+        self.assertEqual(sections['students_per_department'], [
+            {'department__name': 'Science', 'total': 1}, {'department__name': None, 'total': 1},
+        ])
+        self.assertEqual(sections['faculty_teaching_load'], [{'faculty__user__username': 'lecturer', 'total_courses': 1}])
+
+
+class TopStudentsByDepartmentTests(TestCase):
+    def setUp(self):
+        isolate(self)
+        self.program = Program.objects.create(name='Physics', department=Department.objects.create(name='Science'))
+        self.client.force_login(CustomUser.objects.create_superuser('admin', 'admin@example.com', None, user_type='admin'))
+
+    def test_department_without_grades_is_listed(self):
+        response = self.client.get(f'/api/analytics/top-students/program/{self.program.pk}/')
+        self.assertEqual(response.json(), [{'department': 'Science', 'top_students': []}])
+        program = dashboard.get_program(self.program.pk)
+        self.assertEqual(dashboard.build(['top_students_by_department'], program)['top_students_by_department'],
+                         response.json())
+
+    def test_unknown_program(self):
+        self.assertEqual(self.client.get('/api/analytics/top-students/program/999/').json(), [])
+
+
+class RollupTests(TestCase):
+    # Rollups kept from individual writes equal the ones rebuilt from scratch;
+    # grade values nobody has any more are left at a count of 0.
+    def rollups(self):
+        return [
+            sorted(queryset.values_list(*[f.attname for f in queryset.model._meta.concrete_fields if not f.primary_key]))
+            for queryset in (
+                DepartmentRollup.objects.all(), ProgramRollup.objects.all(), CourseRollup.objects.all(),
+                GradeRollup.objects.filter(count__gt=0),
+            )
+        ]
+
+    def test_incremental_matches_rebuild(self):
+        departments, programs, courses, students = populate()
+        grade = Grade.objects.first()
+        grade.grade = 99
+        grade.save()
+        Grade.objects.last().delete()
+        students[0].program = programs[2]
+        students[0].department = programs[2].department
+        students[0].save()
+        Withdrawal.objects.create(student=students[1], course=courses[1], reason='moved')
+        Enrollment.objects.filter(student=students[2]).first().delete()
+        Attendance.objects.filter(status='absent').first().delete()
+        Faculty.objects.create(user=CustomUser.objects.create_user('lecturer', user_type='faculty'),
+                               department=departments[1])
+        kept = self.rollups()
+        rollups.rebuild()
+        self.assertEqual(kept, self.rollups())
+
+
+class CacheTests(TestCase):
+    def setUp(self):
+        isolate(self)
+        populate()
+        self.client.force_login(CustomUser.objects.create_superuser('admin', 'admin@example.com', None, user_type='admin'))
+
+    def total(self):
+        return sum(row['total'] for row in self.client.get('/api/analytics/students-per-department/').json())
+
+    def test_committed_write_invalidates_cached_response(self):
+        self.assertEqual(self.total(), 8)
+        with self.captureOnCommitCallbacks(execute=True):
+            Student.objects.create(
+                user=CustomUser.objects.create_user('late', user_type='student'),
+                department=Department.objects.first(), enrollment_date=datetime.date(2024, 9, 1),
+            )
+        self.assertEqual(self.total(), 9)
+
+    def test_response_is_served_from_cache(self):
+        self.assertEqual(self.total(), 8)
+        # Behind the cache's back: the cached response is still served.
+        DepartmentRollup.objects.update(student_count=F('student_count') + 1)
+        self.assertEqual(self.total(), 8)
+
+
+class BackendTests(TestCase):
+    def test_columnar_matches_orm(self):
+        populate()
+        columnar.STORE = None
+        self.addCleanup(setattr, columnar, 'STORE', None)
+        caches['default'].clear()
+        orm, numpy_backend = ORMBackend(), ColumnarBackend()
+        self.assertEqual(orm.grades_distribution(), numpy_backend.grades_distribution())
+        self.assertEqual(orm.attendance_distribution(), numpy_backend.attendance_distribution())
+        self.assertEqual(orm.top_gpa(5), numpy_backend.top_gpa(5))
+        self.assertEqual(orm.most_absences(5), numpy_backend.most_absences(5))
+        for p, value in orm.gpa_percentiles([25, 50, 90]).items():
+            self.assertAlmostEqual(value, numpy_backend.gpa_percentiles([25, 50, 90])[p])
+
+
+class RankingTests(TestCase):
+    def test_top_students_per_department(self):
+        departments, programs, courses, students = populate()
+        groups = ranking.top_students('department', 2)
+        self.assertEqual([group['name'] for group in groups], ['D0', 'D1'])
+        for group in groups:
+            expected = list(
+                Student.objects.filter(department_id=group['id']).order_by('-gpa', 'id').values_list('gpa', flat=True)[:2]
+            )
+            self.assertEqual([entry['gpa'] for entry in group['top_students']], expected)
@@ -11,6 +11,7 @@ urlpatterns = [
     path('top-performing-students/', TopPerformingStudentsView.as_view()),
     path('low-attendance-students/', LowAttendanceStudentsView.as_view()),
     path('popular-courses/', PopularCoursesView.as_view()),
+    path('grade-percentiles/', GradePercentilesView.as_view()),
     path('top-students/program/<int:program_id>/', TopStudentsByDepartmentView.as_view(), name='top_students_by_department'),
     path('faculty-teaching-load/', FacultyTeachingLoadView.as_view()),
     path('average-grades/department/', AverageGradesByDepartmentView.as_view()),
@@ -25,6 +26,10 @@ urlpatterns = [
     path('programs/withdrawals/', WithdrawalRateByProgramView.as_view(), name='withdrawals-by-program'),
     path('programs/attendance/', AttendanceSummaryByProgramView.as_view(), name='attendance-by-program'),
     path('programs/<int:program_id>/top-students/', TopStudentsByProgramView.as_view(), name='top-students-by-program'),
+    path('top-students/', TopStudentsView.as_view(), name='top-students'),
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('reports/jobs/<uuid:job_id>/', ReportJobView.as_view(), name='report-job'),
+    path('reports/<str:kind>/', ReportJobCreateView.as_view(), name='report-create'),
 
 
 ]
@@ -1,39 +1,61 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.throttling import UserRateThrottle
-from django.db.models import Count, Avg
+from django.db.models import Count, Avg, F, Sum, FloatField, ExpressionWrapper
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 
-from students.models import Student, Enrollment, Withdrawal, Attendance, Grade
+from students.models import Student, Enrollment, Withdrawal, Attendance, Grade, AttendanceCounter
 from faculty.models import Faculty
 from academics.models import Department, Program, Course
 
 from accounts.throttling import AdminThrottle
+from .models import DepartmentRollup, ProgramRollup, CourseRollup, GradeRollup, ReportJob
+from . import cache, dashboard, jobs, ranking
+from .backends import get_backend
+
+
+def rollup_average(total, count):
+    return ExpressionWrapper(Sum(total) / Sum(count), output_field=FloatField())
+
+
+def usernames(student_ids):
+    return dict(Student.objects.filter(id__in=student_ids).values_list('id', 'user__username'))
+
 # 1. Count of Students in Each Department
 class StudentsPerDepartmentView(APIView):
     permission_classes = [IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('student', 'academics')
     def get(self, request):
-        data = Student.objects.values('department__name').annotate(total=Count('id'))
-        return Response(data)
+        data = DepartmentRollup.objects.filter(student_count__gt=0).values('department__name', total=F('student_count'))
+        return Response(dashboard.with_unassigned(data, Student.objects.filter(department=None).count()))
 
 # 2. Count of Faculty in Each Department
 class FacultyPerDepartmentView(APIView):
     permission_classes = [IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('faculty', 'academics')
     def get(self, request):
-        data = Faculty.objects.values('department__name').annotate(total=Count('id'))
-        return Response(data)
+        data = DepartmentRollup.objects.filter(faculty_count__gt=0).values('department__name', total=F('faculty_count'))
+        return Response(dashboard.with_unassigned(data, Faculty.objects.filter(department=None).count()))
 
 # 3. Enrollment Count Per Program
 class EnrollmentPerProgramView(APIView):
     permission_classes = [IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('enrollment', 'academics')
     def get(self, request):
-        data = Enrollment.objects.values('course__program__name').annotate(total=Count('id'))
+        data = (
+            CourseRollup.objects.values('course__program__name')
+            .annotate(total=Sum('enrollment_count'))
+            .filter(total__gt=0)
+        )
         return Response(data)
 
 # 4. Attendance Distribution (Absent/Present)
@@ -41,8 +63,10 @@ class AttendanceDistributionView(APIView):
     permission_classes = [IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('attendance')
     def get(self, request):
-        data = Attendance.objects.values('status').annotate(count=Count('id'))
+        totals = get_backend().attendance_distribution()
+        data = [{'status': status, 'count': count} for status, count in totals.items() if count]
         return Response(data)
 
 # 5. Grades Distribution
@@ -50,8 +74,9 @@ class GradesDistributionView(APIView):
     permission_classes = [IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('grade')
     def get(self, request):
-        data = Grade.objects.values('grade').annotate(count=Count('id')).order_by('-grade')
+        data = get_backend().grades_distribution()
         return Response(data)
 
 # 6. Withdrawals per Course
@@ -59,8 +84,14 @@ class WithdrawalsPerCourseView(APIView):
     permission_classes = [IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('withdrawal', 'academics')
     def get(self, request):
-        data = Withdrawal.objects.values('course__name').annotate(total=Count('id')).order_by('-total')
+        data = (
+            CourseRollup.objects.values('course__name')
+            .annotate(total=Sum('withdrawal_count'))
+            .filter(total__gt=0)
+            .order_by('-total')
+        )
         return Response(data)
 
 # 7. Top Performing Students (GPA)
@@ -68,8 +99,11 @@ class TopPerformingStudentsView(APIView):
     permission_classes = [IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('grade', 'user')
     def get(self, request):
-        data = Grade.objects.values('student__user__username').annotate(gpa=Avg('grade')).order_by('-gpa')[:10]
+        top = get_backend().top_gpa(10)
+        names = usernames([student_id for student_id, gpa in top])
+        data = [{'student__user__username': names.get(student_id), 'gpa': gpa} for student_id, gpa in top]
         return Response(data)
 
 # 8. Students with Low Attendance
@@ -77,13 +111,14 @@ class LowAttendanceStudentsView(APIView):
     permission_classes = [IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('attendance', 'user')
     def get(self, request):
-        data = (
-            Attendance.objects.filter(status='absent')
-            .values('student__user__username')
-            .annotate(absences=Count('id'))
-            .order_by('-absences')[:10]
-        )
+        top = get_backend().most_absences(10)
+        names = usernames([student_id for student_id, absences in top])
+        data = [
+            {'student__user__username': names.get(student_id), 'absences': absences}
+            for student_id, absences in top
+        ]
         return Response(data)
 
 # 9. Popular Courses (by enrollment)
@@ -91,55 +126,90 @@ class PopularCoursesView(APIView):
     permission_classes = [IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('enrollment', 'academics')
     def get(self, request):
-        data = Enrollment.objects.values('course__name').annotate(total=Count('id')).order_by('-total')[:10]
+        data = (
+            CourseRollup.objects.values('course__name')
+            .annotate(total=Sum('enrollment_count'))
+            .filter(total__gt=0)
+            .order_by('-total')[:10]
+        )
+        return Response(data)
+
+class GradePercentilesView(APIView):
+    # Student GPA percentiles, e.g. ?p=10,50,90.
+    permission_classes = [IsAdminUser]
+    throttle_classes = [AdminThrottle]
+
+    @cache.cache_response('grade')
+    def get(self, request):
+        try:
+            percentiles = [float(p) for p in request.query_params.get('p', '10,25,50,75,90').split(',')]
+        except ValueError:
+            return Response({'detail': 'p must be a comma-separated list of numbers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not all(0 <= p <= 100 for p in percentiles):
+            return Response({'detail': 'Percentiles must be between 0 and 100.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        values = get_backend().gpa_percentiles(percentiles)
+        data = [{'percentile': p, 'gpa': round(values[p], 2) if values[p] is not None else None} for p in percentiles]
         return Response(data)
 
 class FacultyTeachingLoadView(APIView):
     permission_classes = [IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('faculty', 'academics', 'user')
     def get(self, request):
-        data = Course.objects.values('faculty__user__username').annotate(total_courses=Count('id')).order_by('-total_courses')
+        data = (
+            Course.objects.exclude(faculty=None).values('faculty__user__username')
+            .annotate(total_courses=Count('id')).order_by('-total_courses')
+        )
         return Response(data)
 
 class TopStudentsByDepartmentView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('grade', 'student', 'academics', 'user')
     def get(self, request, program_id):
-        departments = Department.objects.filter(program__id=program_id)
-        data = []
+        n = ranking.parse_n(request.query_params.get('n'))
+        if n is None:
+            return Response({'detail': 'n must be a positive integer.'}, status=status.HTTP_400_BAD_REQUEST)
 
+        # The program's department, listed even when none of its students
+        # has a grade yet, as on the dashboard.
+        departments = list(Department.objects.filter(program__id=program_id).values('id', 'name')[:1])
+        data = []
         for department in departments:
-            top_students = (
-                Grade.objects
-                .filter(student__department=department)
-                .values('student__user__id', 'student__user__username')
-                .annotate(gpa=Avg('grade'))
-                .order_by('-gpa')[:3]  # Top 3 students
-            )
+            groups = ranking.top_students('department', n, group_id=department['id'])
             data.append({
-                'department': department.name,
-                'top_students': top_students
+                'department': department['name'],
+                'top_students': [
+                    {
+                        'student__user__id': entry['student__user__id'],
+                        'student__user__username': entry['student__user__username'],
+                        'gpa': entry['gpa'],
+                    }
+                    for entry in (groups[0]['top_students'] if groups else [])
+                ],
             })
-
-    
         return Response(data)
     
 class AverageGradesByDepartmentView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('grade', 'student', 'academics')
     def get(self, request):
        
-        data = Grade.objects.values('student__program__department__name') \
-            .annotate(average_grade=Avg('grade')) \
+        data = ProgramRollup.objects.filter(grade_count__gt=0) \
+            .values('program__department__name') \
+            .annotate(average_grade=rollup_average('grade_sum', 'grade_count')) \
             .order_by('-average_grade')
 
         response = [
             {
-                "department": entry['student__program__department__name'],
+                "department": entry['program__department__name'],
                 "average_grade": round(entry['average_grade'], 2) if entry['average_grade'] else None
             }
             for entry in data
@@ -151,14 +221,16 @@ class WithdrawalRateByDepartmentView(APIView):
     throttle_classes = [AdminThrottle]
 
 
+    @cache.cache_response('withdrawal', 'student', 'academics')
     def get(self, request):
-        data = Withdrawal.objects.values('student__program__department__name') \
-            .annotate(total_withdrawals=Count('id')) \
+        data = ProgramRollup.objects.values('program__department__name') \
+            .annotate(total_withdrawals=Sum('withdrawal_count')) \
+            .filter(total_withdrawals__gt=0) \
             .order_by('-total_withdrawals')
 
         response = [
             {
-                "department": entry['student__program__department__name'],
+                "department": entry['program__department__name'],
                 "withdrawals": entry['total_withdrawals']
             }
             for entry in data
@@ -171,20 +243,10 @@ class EnrollmentTrendsByProgramView(APIView):
     throttle_classes = [AdminThrottle]
 
 
+    # Enrollments by their course's program and the year of enrolled_on.
+    @cache.cache_response('enrollment', 'academics')
     def get(self, request):
-        data = Enrollment.objects.values('program__name', 'academic_year') \
-            .annotate(total_enrolled=Count('id')) \
-            .order_by('program__name', 'academic_year')
-
-        response = [
-            {
-                "program": entry['program__name'],
-                "academic_year": entry['academic_year'],
-                "total_enrolled": entry['total_enrolled']
-            }
-            for entry in data
-        ]
-        return Response(response)
+        return Response(dashboard.build(['enrollment_trends_by_program'])['enrollment_trends_by_program'])
 
 class AttendanceSummaryByDepartmentView(APIView):
 
@@ -192,8 +254,9 @@ class AttendanceSummaryByDepartmentView(APIView):
     throttle_classes = [AdminThrottle]
 
 
+    @cache.cache_response('attendance', 'student', 'academics')
     def get(self, request):
-        data = Attendance.objects.values('student__program__department__name') \
+        data = AttendanceCounter.objects.values('student__program__department__name') \
             .annotate(avg_attendance=Avg('attendance_percentage')) \
             .order_by('-avg_attendance')
 
@@ -210,6 +273,7 @@ class TopCoursesByProgramView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('grade', 'student', 'academics')
     def get(self, request, program_id):
         data = Grade.objects.filter(student__program__id=program_id) \
             .values('course__name') \
@@ -229,18 +293,17 @@ class LowPerformingStudentsByProgramView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('grade', 'student', 'user')
     def get(self, request, program_id):
-        data = Grade.objects.filter(student__program__id=program_id) \
-            .values('student__id', 'student__user__first_name', 'student__user__last_name') \
-            .annotate(avg_grade=Avg('grade')) \
-            .filter(avg_grade__lt=50) \
-            .order_by('avg_grade')  # Assuming <50 is low performance
+        data = Student.objects.filter(program__id=program_id, gpa__lt=50) \
+            .values('id', 'user__first_name', 'user__last_name', 'gpa') \
+            .order_by('gpa', 'id')  # Assuming <50 is low performance
 
         response = [
             {
-                "student_id": entry['student__id'],
-                "name": f"{entry['student__user__first_name']} {entry['student__user__last_name']}",
-                "average_grade": round(entry['avg_grade'], 2)
+                "student_id": entry['id'],
+                "name": f"{entry['user__first_name']} {entry['user__last_name']}",
+                "average_grade": round(entry['gpa'], 2)
             }
             for entry in data
         ]
@@ -250,29 +313,33 @@ class StudentsPerProgramView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('student', 'academics')
     def get(self, request):
-        data = Student.objects.values('program__name').annotate(total=Count('id')).order_by('-total')
+        data = ProgramRollup.objects.filter(student_count__gt=0).values('program__name', total=F('student_count')).order_by('-total')
         return Response(data)
 class FacultyPerProgramView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    # Faculty belong to a program through the courses they teach.
+    @cache.cache_response('faculty', 'academics')
     def get(self, request):
-        data = Faculty.objects.values('program__name').annotate(total=Count('id')).order_by('-total')
-        return Response(data)
+        return Response(dashboard.build(['faculty_per_program'])['faculty_per_program'])
 
 class AverageGradesByProgramView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('grade', 'student', 'academics')
     def get(self, request):
-        data = Grade.objects.values('student__program__name') \
-            .annotate(average_grade=Avg('grade')) \
+        data = ProgramRollup.objects.filter(grade_count__gt=0) \
+            .values('program__name') \
+            .annotate(average_grade=rollup_average('grade_sum', 'grade_count')) \
             .order_by('-average_grade')
 
         response = [
             {
-                "program": entry['student__program__name'],
+                "program": entry['program__name'],
                 "average_grade": round(entry['average_grade'], 2) if entry['average_grade'] else None
             }
             for entry in data
@@ -282,14 +349,16 @@ class WithdrawalRateByProgramView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('withdrawal', 'student', 'academics')
     def get(self, request):
-        data = Withdrawal.objects.values('student__program__name') \
-            .annotate(total_withdrawals=Count('id')) \
+        data = ProgramRollup.objects.values('program__name') \
+            .annotate(total_withdrawals=Sum('withdrawal_count')) \
+            .filter(total_withdrawals__gt=0) \
             .order_by('-total_withdrawals')
 
         response = [
             {
-                "program": entry['student__program__name'],
+                "program": entry['program__name'],
                 "withdrawals": entry['total_withdrawals']
             }
             for entry in data
@@ -300,8 +369,9 @@ class AttendanceSummaryByProgramView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('attendance', 'student', 'academics')
     def get(self, request):
-        data = Attendance.objects.values('student__program__name') \
+        data = AttendanceCounter.objects.values('student__program__name') \
             .annotate(avg_attendance=Avg('attendance_percentage')) \
             .order_by('-avg_attendance')
 
@@ -317,14 +387,14 @@ class TopStudentsByProgramView(APIView):
     permission_classes = [IsAuthenticated, IsAdminUser]
     throttle_classes = [AdminThrottle]
 
+    @cache.cache_response('grade', 'student', 'user')
     def get(self, request, program_id):
-        top_students = (
-            Grade.objects
-            .filter(student__program__id=program_id)
-            .values('student__user__id', 'student__user__first_name', 'student__user__last_name')
-            .annotate(gpa=Avg('grade'))
-            .order_by('-gpa')[:3]
-        )
+        n = ranking.parse_n(request.query_params.get('n'))
+        if n is None:
+            return Response({'detail': 'n must be a positive integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        groups = ranking.top_students('program', n, group_id=program_id)
+        top_students = groups[0]['top_students'] if groups else []
 
         response = [
             {
@@ -336,4 +406,122 @@ class TopStudentsByProgramView(APIView):
         ]
         return Response(response)
 
+class TopStudentsView(APIView):
+    # Top n students of every department, program or course in one query:
+    # ?by=department|program|course&n=3, optionally narrowed with &id=<group id>.
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    throttle_classes = [AdminThrottle]
+
+    @cache.cache_response('grade', 'student', 'academics', 'user')
+    def get(self, request):
+        partition = request.query_params.get('by', 'department')
+        if partition not in ranking.PARTITIONS:
+            return Response(
+                {'detail': f"by must be one of: {', '.join(ranking.PARTITIONS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        n = ranking.parse_n(request.query_params.get('n'))
+        if n is None:
+            return Response({'detail': 'n must be a positive integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        group_id = request.query_params.get('id')
+        if group_id is not None and not group_id.isdigit():
+            return Response({'detail': 'id must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        groups = ranking.top_students(partition, n, group_id=group_id)
+        response = [
+            {
+                partition: group['name'],
+                f"{partition}_id": group['id'],
+                "top_students": [
+                    {
+                        "rank": entry['rank'],
+                        "student_id": entry['student_id'],
+                        "username": entry['student__user__username'],
+                        "name": f"{entry['student__user__first_name']} {entry['student__user__last_name']}",
+                        "gpa": round(entry['gpa'], 2),
+                    }
+                    for entry in group['top_students']
+                ],
+            }
+            for group in groups
+        ]
+        return Response(response)
+
+class DashboardView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    throttle_classes = [AdminThrottle]
+
+    @cache.cache_response(*cache.TABLES)
+    def get(self, request):
+        program = None
+        program_id = request.query_params.get('program')
+        if program_id:
+            program = dashboard.get_program(program_id)
+            if program is None:
+                return Response({'detail': 'Unknown program.'}, status=status.HTTP_404_NOT_FOUND)
+
+        sections = request.query_params.get('sections')
+        if not sections:
+            return Response(dashboard.build(dashboard.default_sections(program), program))
+
+        names = [name.strip() for name in sections.split(',') if name.strip()]
+        unknown = [name for name in names if name not in dashboard.SECTIONS]
+        if unknown:
+            return Response({'detail': f"Unknown sections: {', '.join(unknown)}."}, status=status.HTTP_400_BAD_REQUEST)
+        if program is None and any(dashboard.SECTIONS[name][1] for name in names):
+            return Response({'detail': 'Program sections require ?program=<id>.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(dashboard.build(names, program))
+
+
+def report_job_data(request, job):
+    data = {
+        'id': job.pk,
+        'kind': job.kind,
+        'params': job.params,
+        'status': job.status,
+        'url': request.build_absolute_uri(reverse('report-job', args=[job.pk])),
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
+    if job.status == 'done':
+        data['result'] = job.result
+    elif job.status == 'failed':
+        data['error'] = job.error.strip().splitlines()[-1] if job.error else ''
+    return data
+
+
+class ReportJobCreateView(APIView):
+    # POST /reports/<kind>/ starts a dashboard section as a background job;
+    # poll the returned url for the result.
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    throttle_classes = [AdminThrottle]
+
+    def post(self, request, kind):
+        if kind not in dashboard.SECTIONS:
+            return Response({'detail': 'Unknown report.'}, status=status.HTTP_404_NOT_FOUND)
+
+        params = {}
+        program_id = request.data.get('program', request.query_params.get('program'))
+        if program_id is not None:
+            program = dashboard.get_program(program_id)
+            if program is None:
+                return Response({'detail': 'Unknown program.'}, status=status.HTTP_404_NOT_FOUND)
+            params['program'] = program['id']
+        elif dashboard.SECTIONS[kind][1]:
+            return Response({'detail': 'This report requires a program.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        job, created = jobs.request_report(kind, params, request.user)
+        data = report_job_data(request, job)
+        if job.status == 'done':
+            return Response(data)
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={'Location': data['url']})
+
+
+class ReportJobView(APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    throttle_classes = [AdminThrottle]
 
+    def get(self, request, job_id):
+        job = get_object_or_404(ReportJob, pk=job_id)
+        return Response(report_job_data(request, job))
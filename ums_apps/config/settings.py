@@ -48,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'metrics.MetricsMiddleware',
+    'profiling.QueryProfileMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,6 +59,35 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-request SQL counts, time and repeated statements (profiling.py): in
+# X-DB-* headers with DEBUG on, and logged as JSON to the 'profiling' logger
+# for PROFILING_SAMPLE_RATE of requests and for every request whose queries
+# took PROFILING_SLOW_QUERY_MS or more (a view's slow_query_ms overrides it).
+# Statements run PROFILING_REPEAT_THRESHOLD times or more are reported.
+PROFILING_SAMPLE_RATE = 0.01
+PROFILING_SLOW_QUERY_MS = 500
+PROFILING_REPEAT_THRESHOLD = 3
+
+# Prometheus metrics at /metrics (metrics.py), for METRICS_ALLOWED_IPS and
+# staff. Each worker adds its counts to a SQLite file in METRICS_DIR every
+# METRICS_FLUSH_INTERVAL seconds, so every worker on the host serves the
+# totals of all of them; the directory must be local and shared by them.
+# None keeps each process's metrics to itself.
+METRICS_DIR = BASE_DIR / '.metrics'
+METRICS_FLUSH_INTERVAL = 1
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'profiling': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -134,8 +165,13 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'accounts.tokens.AccessTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
-        'rest_framework.permissions.DjangoModelPermissions',
+        'principal.PrincipalModelPermissions',
     ], 
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10, 
@@ -148,5 +184,71 @@ REST_FRAMEWORK = {
         'student': '25/hour',
         'faculty': '50/minute',
         'admin': '1000/minute',
+        'login': '10/minute',
+    }
+}
+
+# Where the rate limits above are kept (accounts/throttling.py): 'local' per
+# process, 'sqlite' in a file shared by the workers on this host, or 'redis'
+# shared by every host (needs the redis package).
+THROTTLE_STORE = 'sqlite'
+THROTTLE_STORE_PATH = BASE_DIR / 'throttle.sqlite3'
+THROTTLE_REDIS_URL = 'redis://localhost:6379/1'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
-}
\ No newline at end of file
+}
+
+# Analytics responses are cached under per-table data versions (analytics/cache.py).
+# Run more than one worker process only with a shared cache that has an atomic
+# incr (Redis, Memcached), otherwise a write in one worker can't invalidate the
+# responses cached by another.
+ANALYTICS_CACHE = 'default'
+ANALYTICS_CACHE_TIMEOUT = 60 * 60
+
+# Each user's role, profile ids and permissions, resolved once and cached
+# (principal.py) under versions that every worker reads from
+# PRINCIPAL_VERSION_STORE: 'local' per process, 'sqlite' in a file shared by
+# the workers on this host, or 'cache' in PRINCIPAL_CACHE, which must then be
+# shared by every host. Authorization and access token checks follow a change
+# only as far as this store is shared.
+PRINCIPAL_CACHE = 'default'
+PRINCIPAL_CACHE_TIMEOUT = 60 * 60
+PRINCIPAL_VERSION_STORE = 'sqlite'
+PRINCIPAL_VERSION_STORE_PATH = BASE_DIR / 'principal.sqlite3'
+
+# API clients sign in at /api/accounts/token/ and send "Authorization: Bearer
+# <access>". Access tokens are signed with SECRET_KEY and checked against the
+# cached principal, so an API request reads neither the session nor the user
+# row; they expire after ACCESS_TOKEN_LIFETIME seconds and are renewed with
+# the refresh token, which is stored and works once (accounts/tokens.py).
+ACCESS_TOKEN_LIFETIME = 5 * 60
+REFRESH_TOKEN_LIFETIME = 14 * 24 * 60 * 60
+
+# 'orm' or 'columnar' (NumPy arrays of Grade/Attendance held in each process,
+# needs numpy). See analytics/backends.py.
+ANALYTICS_BACKEND = 'orm'
+
+# Worker processes for background analytics reports (analytics/jobs.py). 0 runs
+# each report in the requesting process once its transaction commits.
+ANALYTICS_REPORT_WORKERS = 2
+
+# 'rows' stores attendance as Attendance rows. 'bitmap' also keeps a packed
+# bitset per (student, course, term) current (students/bitmaps.py), which the
+# attendance history endpoint reads and which keeps a term's marks once its
+# Attendance partitions are archived. The bitmaps are stored on top of the
+# rows, so this costs space rather than saving it.
+ATTENDANCE_STORAGE = 'rows'
+
+# Processes that hash passwords during CSV student imports (students/importer.py).
+# 0 or 1 hashes in the importing process.
+IMPORT_HASH_WORKERS = 4
+
+# With REGISTRATION_QUEUE on, enrollment POSTs are queued as registration
+# requests (202) and admitted in batches of REGISTRATION_BATCH_SIZE by the
+# process_registrations command, which must be running for the window;
+# otherwise each POST enrolls at once, taking a seat (students/registration.py).
+REGISTRATION_QUEUE = False
+REGISTRATION_BATCH_SIZE = 500
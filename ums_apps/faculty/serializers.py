@@ -1,7 +1,13 @@
 from rest_framework import serializers
+from expansion import ExpandableSerializerMixin
 from .models import Faculty
 
-class FacultySerializer(serializers.ModelSerializer):
+class FacultySerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+    expandable = {
+        'user': 'accounts.serializers.CustomUserSerializer',
+        'department': 'academics.serializers.DepartmentSerializer',
+    }
+
     class Meta:
         model = Faculty
         fields = '__all__'
@@ -1,3 +1,57 @@
+from django.contrib.auth.models import Permission
+from django.core.cache import caches
 from django.test import TestCase
 
-# Create your tests here.
+import principal
+from accounts import throttling
+from accounts.models import CustomUser
+from academics.models import Department
+from analytics.models import DepartmentRollup
+from faculty.models import Faculty
+
+
+def isolate(test):
+    caches['default'].clear()
+    principal.VERSIONS = principal.LocalVersions()
+    throttling.STORE = throttling.LocalStore()
+    test.addCleanup(setattr, principal, 'VERSIONS', None)
+    test.addCleanup(setattr, throttling, 'STORE', None)
+
+
+def new_faculty(username, department):
+    return Faculty.objects.create(user=CustomUser.objects.create_user(username, user_type='faculty'), department=department)
+
+
+class FacultyTests(TestCase):
+    def setUp(self):
+        isolate(self)
+        self.science = Department.objects.create(name='Science')
+        self.arts = Department.objects.create(name='Arts')
+        self.lecturer = new_faculty('lecturer', self.science)
+        new_faculty('colleague', self.science)
+        new_faculty('stranger', self.arts)
+
+    def faculty_count(self, department):
+        return DepartmentRollup.objects.get(department=department).faculty_count
+
+    def test_faculty_sees_own_department(self):
+        self.lecturer.user.user_permissions.add(Permission.objects.get(codename='view_faculty'))
+        self.client.force_login(self.lecturer.user)
+        response = self.client.get('/api/faculty/faculty/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
+
+    def test_faculty_without_department_sees_nothing(self):
+        self.lecturer.department = None
+        self.lecturer.save()
+        self.lecturer.user.user_permissions.add(Permission.objects.get(codename='view_faculty'))
+        self.client.force_login(self.lecturer.user)
+        self.assertEqual(self.client.get('/api/faculty/faculty/').json()['count'], 0)
+
+    def test_rollup_follows_department_moves(self):
+        self.assertEqual((self.faculty_count(self.science), self.faculty_count(self.arts)), (2, 1))
+        self.lecturer.department = self.arts
+        self.lecturer.save()
+        self.assertEqual((self.faculty_count(self.science), self.faculty_count(self.arts)), (1, 2))
+        self.lecturer.delete()
+        self.assertEqual(self.faculty_count(self.arts), 1)
@@ -1,21 +1,19 @@
 from rest_framework import viewsets
-from rest_framework.permissions import DjangoModelPermissions, IsAuthenticated
+from rest_framework.permissions import IsAuthenticated
 from faculty.models import Faculty
 from faculty.serializers import FacultySerializer
 from utils import get_user_throttle
+from scoping import scope
+from principal import PrincipalModelPermissions
+from expansion import ExpandableViewSetMixin
 
-class FacultyViewSet(viewsets.ModelViewSet):
+class FacultyViewSet(ExpandableViewSetMixin, viewsets.ModelViewSet):
     queryset = Faculty.objects.all()
     serializer_class = FacultySerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'faculty':
-            return Faculty.objects.filter(department=user.faculty.department)
-        elif user.user_type == 'student':
-            return Faculty.objects.filter(department=user.student.department)
-        return Faculty.objects.all()
+        return scope(Faculty.objects.all(), self.request.user)
 
     def get_throttles(self):
         return get_user_throttle(self.request.user)
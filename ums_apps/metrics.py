@@ -0,0 +1,259 @@
+import atexit
+import contextvars
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+# Request, SQL, rate limit and cache metrics in the Prometheus text format,
+# served at /metrics by the app itself. Each process adds to its own pending
+# totals and, at most every METRICS_FLUSH_INTERVAL seconds, adds them to a
+# SQLite file in METRICS_DIR that every worker on the host shares, so any
+# worker can answer a scrape for all of them. With METRICS_DIR = None each
+# process only reports itself. Series are labelled by view: the DRF view
+# class, with the viewset action (GradeViewSet.list).
+
+FAMILIES = {
+    'http_requests_total': ('counter', 'Requests by view, method and status.'),
+    'http_request_duration_seconds': ('histogram', 'Time to respond, by view.'),
+    'db_queries_per_request': ('histogram', 'SQL queries run by a request, by view.'),
+    'db_duration_seconds': ('histogram', 'Time a request spent in SQL, by view.'),
+    'throttled_requests_total': ('counter', 'Requests rejected by a rate limit, by view and scope.'),
+    'cache_requests_total': ('counter', 'Cache lookups by cache, view and result.'),
+}
+
+BUCKETS = {
+    'http_request_duration_seconds': (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+    'db_queries_per_request': (0, 1, 2, 5, 10, 20, 50, 100, 200),
+    'db_duration_seconds': (.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5),
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_view = contextvars.ContextVar('metrics_view', default='')
+
+
+def view_label(view_class, action=None):
+    return f'{view_class.__name__}.{action}' if action else view_class.__name__
+
+
+def current_view():
+    # The view of the request being handled, for metrics recorded inside it.
+    return _view.get()
+
+
+class LocalStore:
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.lock = threading.Lock()
+
+    def add(self, deltas):
+        with self.lock:
+            for key, value in deltas.items():
+                self.totals[key] += value
+
+    def read(self):
+        with self.lock:
+            return dict(self.totals)
+
+
+class SQLiteStore:
+    # Series are keyed by the JSON of (family, labels, sample, le).
+    ADD = 'INSERT INTO metrics (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = value + excluded.value'
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.local = threading.local()
+
+    def connection(self):
+        # Per thread, and reopened in a forked worker.
+        if getattr(self.local, 'pid', None) != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute('CREATE TABLE IF NOT EXISTS metrics (key TEXT PRIMARY KEY, value REAL NOT NULL) WITHOUT ROWID')
+            self.local.connection, self.local.pid = connection, os.getpid()
+        return self.local.connection
+
+    def add(self, deltas):
+        connection = self.connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(self.ADD, [(json.dumps(key), value) for key, value in deltas.items()])
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def read(self):
+        return {
+            _key(json.loads(key)): value
+            for key, value in self.connection().execute('SELECT key, value FROM metrics')
+        }
+
+
+def _key(key):
+    family, labels, sample, le = key
+    return family, tuple(tuple(label) for label in labels), sample, le
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = defaultdict(float)
+        self.pid = os.getpid()
+        self.flushed_at = time.monotonic()
+        self.store = None
+
+    def get_store(self):
+        if self.store is None:
+            directory = getattr(settings, 'METRICS_DIR', None)
+            self.store = SQLiteStore(os.path.join(directory, 'metrics.sqlite3')) if directory else LocalStore()
+        return self.store
+
+    def add(self, key, value):
+        with self.lock:
+            if self.pid != os.getpid():
+                # A forked worker starts from nothing; its parent reports
+                # what came before.
+                self.pending.clear()
+                self.pid, self.store = os.getpid(), None
+            self.pending[key] += value
+
+    def flush(self, force=False):
+        with self.lock:
+            if not self.pending or (not force and time.monotonic() - self.flushed_at < settings.METRICS_FLUSH_INTERVAL):
+                return
+            pending, self.pending = self.pending, defaultdict(float)
+            self.flushed_at = time.monotonic()
+        try:
+            self.get_store().add(pending)
+        except sqlite3.Error:
+            # Kept for the next flush.
+            with self.lock:
+                for key, value in pending.items():
+                    self.pending[key] += value
+
+
+REGISTRY = Registry()
+# What came in since the last flush, when a worker exits.
+atexit.register(REGISTRY.flush, force=True)
+
+
+def _labels(labels):
+    return tuple(sorted(labels.items()))
+
+
+def inc(family, labels, value=1):
+    REGISTRY.add((family, _labels(labels), '', None), value)
+
+
+def observe(family, labels, value):
+    labels = _labels(labels)
+    for le in BUCKETS[family]:
+        REGISTRY.add((family, labels, 'bucket', le), 1 if value <= le else 0)
+    REGISTRY.add((family, labels, 'bucket', float('inf')), 1)
+    REGISTRY.add((family, labels, 'sum', None), value)
+    REGISTRY.add((family, labels, 'count', None), 1)
+
+
+def cache_lookup(cache, hit):
+    inc('cache_requests_total', {'cache': cache, 'view': current_view(), 'result': 'hit' if hit else 'miss'})
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def render(totals):
+    lines = []
+    series = defaultdict(list)
+    for (family, labels, sample, le), value in totals.items():
+        series[family].append((labels, sample, le, value))
+    order = {'bucket': 0, 'sum': 1, 'count': 2}
+    for family, (kind, help_text) in FAMILIES.items():
+        if not series[family]:
+            continue
+        lines.append(f'# HELP {family} {help_text}')
+        lines.append(f'# TYPE {family} {kind}')
+        for labels, sample, le, value in sorted(series[family], key=lambda s: (s[0], order.get(s[1], 0), s[2] or 0)):
+            if le is not None:
+                labels = labels + (('le', _format_value(le)),)
+            name = f'{family}_{sample}' if sample else family
+            lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+    # Ratios of the lookups so far, over every view.
+    lookups = defaultdict(lambda: [0, 0])
+    for labels, _, _, value in series['cache_requests_total']:
+        labels = dict(labels)
+        lookups[labels['cache']][labels['result'] == 'hit'] += value
+    if lookups:
+        lines.append('# HELP cache_hit_ratio Share of cache lookups that hit, since the metrics were started.')
+        lines.append('# TYPE cache_hit_ratio gauge')
+        for cache, (misses, hits) in sorted(lookups.items()):
+            lines.append(f'cache_hit_ratio{_format_labels([("cache", cache)])} {_format_value(round(hits / (hits + misses), 4))}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    # For the Prometheus server (METRICS_ALLOWED_IPS) and staff.
+    allowed = request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ())
+    if not allowed and not request.user.is_staff:
+        return HttpResponseForbidden()
+    REGISTRY.flush(force=True)
+    return HttpResponse(render(REGISTRY.get_store().read()), content_type=CONTENT_TYPE)
+
+
+class MetricsMiddleware:
+    # Outermost, so the latency covers every other middleware. Reads the SQL
+    # totals from profiling.QueryProfileMiddleware when it is installed.
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request._metrics_view = 'unmatched'
+        token = _view.set(request._metrics_view)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _view.reset(token)
+        elapsed = time.perf_counter() - started
+
+        view = request._metrics_view
+        inc('http_requests_total', {'view': view, 'method': request.method, 'status': str(response.status_code)})
+        observe('http_request_duration_seconds', {'view': view}, elapsed)
+        profile = getattr(request, '_query_profile', None)
+        if profile is not None:
+            observe('db_queries_per_request', {'view': view}, profile.count)
+            observe('db_duration_seconds', {'view': view}, profile.seconds)
+        REGISTRY.flush()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+        if view_class is not None:
+            # A viewset route maps each method to an action.
+            action = (getattr(view_func, 'actions', None) or {}).get(request.method.lower())
+            request._metrics_view = view_label(view_class, action)
+        else:
+            request._metrics_view = getattr(view_func, '__name__', type(view_func).__name__)
+        _view.set(request._metrics_view)
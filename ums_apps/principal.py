@@ -0,0 +1,223 @@
+import datetime
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.permissions import DjangoModelPermissions
+
+import metrics
+from accounts.models import RefreshToken
+from faculty.models import Faculty
+from students.models import Student
+
+# What authorization needs to know about the request's user: role, student or
+# faculty id, department and permissions. Resolved once per user and cached
+# under versions that accounts.signals bumps when the user, their profile, or
+# their groups and permissions change; changes to a group's permissions bump a
+# version every user shares. A principal built before a change is keyed under
+# the old version and is never looked up again.
+#
+# The versions are kept where every worker reads them (PRINCIPAL_VERSION_STORE),
+# so a change reaches the next request of every worker, revoked sign-ins and
+# password changes included:
+#   'local'  - this process only; for a single worker.
+#   'sqlite' - the PRINCIPAL_VERSION_STORE_PATH file, shared by the workers on one host.
+#   'cache'  - PRINCIPAL_CACHE, shared by every host if that cache is (Redis, Memcached).
+# The principals themselves can stay in a per-process PRINCIPAL_CACHE: a
+# worker only looks one up under the current versions.
+
+
+class Principal:
+    def __init__(self, user_id, role, is_active=False, is_superuser=False, student_id=None, faculty_id=None,
+                 department_id=None, permissions=frozenset(), fingerprint=None, revoked_families=frozenset()):
+        self.user_id = user_id
+        self.role = role
+        self.is_active = is_active
+        self.is_superuser = is_superuser
+        self.student_id = student_id
+        self.faculty_id = faculty_id
+        self.department_id = department_id
+        self.permissions = permissions
+        # What access tokens are checked against (accounts/tokens.py).
+        self.fingerprint = fingerprint
+        self.revoked_families = revoked_families
+
+    def has_perms(self, perms):
+        if not self.is_active:
+            return False
+        return self.is_superuser or set(perms) <= self.permissions
+
+
+def get_cache():
+    return caches[getattr(settings, 'PRINCIPAL_CACHE', 'default')]
+
+
+# Versions start from the clock, so one that was lost can't come back as a
+# value principals were cached under.
+
+class LocalVersions:
+    def __init__(self):
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def get(self, keys):
+        with self.lock:
+            return [self.versions.setdefault(key, time.time_ns()) for key in keys]
+
+    def bump(self, keys):
+        with self.lock:
+            for key in keys:
+                self.versions[key] = self.versions.get(key, time.time_ns()) + 1
+
+
+class SQLiteVersions:
+    ADD = 'INSERT INTO principal_version (key, version) VALUES (?, ?) ON CONFLICT (key) DO NOTHING'
+    BUMP = 'INSERT INTO principal_version (key, version) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET version = version + 1'
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.local = threading.local()
+
+    def connection(self):
+        # Per thread, and reopened in a forked worker.
+        if getattr(self.local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS principal_version (key TEXT PRIMARY KEY, version INTEGER NOT NULL) WITHOUT ROWID'
+            )
+            self.local.connection, self.local.pid = connection, os.getpid()
+        return self.local.connection
+
+    def read(self, connection, keys):
+        placeholders = ', '.join('?' * len(keys))
+        return dict(connection.execute(f'SELECT key, version FROM principal_version WHERE key IN ({placeholders})', keys))
+
+    def get(self, keys):
+        connection = self.connection()
+        versions = self.read(connection, keys)
+        missing = [key for key in keys if key not in versions]
+        if missing:
+            connection.executemany(self.ADD, [(key, time.time_ns()) for key in missing])
+            versions.update(self.read(connection, missing))
+        return [versions[key] for key in keys]
+
+    def bump(self, keys):
+        self.connection().executemany(self.BUMP, [(key, time.time_ns()) for key in keys])
+
+
+class CacheVersions:
+    def get(self, keys):
+        cache = get_cache()
+        versions = cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                cache.add(key, time.time_ns(), timeout=None)
+                versions[key] = cache.get(key)
+        return [versions[key] for key in keys]
+
+    def bump(self, keys):
+        cache = get_cache()
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, time.time_ns(), timeout=None)
+
+
+VERSIONS = None
+
+
+def get_versions_store():
+    global VERSIONS
+    if VERSIONS is None:
+        kind = getattr(settings, 'PRINCIPAL_VERSION_STORE', 'cache')
+        if kind == 'local':
+            VERSIONS = LocalVersions()
+        elif kind == 'sqlite':
+            VERSIONS = SQLiteVersions(settings.PRINCIPAL_VERSION_STORE_PATH)
+        elif kind == 'cache':
+            VERSIONS = CacheVersions()
+        else:
+            raise ImproperlyConfigured(f'Unknown PRINCIPAL_VERSION_STORE {kind!r}.')
+    return VERSIONS
+
+
+def _version_keys(user_id):
+    return ['principal:version', f'principal:version:{user_id}']
+
+
+def _versions(user_id):
+    return get_versions_store().get(_version_keys(user_id))
+
+
+def invalidate(user_ids=None):
+    # The given users' principals, or everyone's; once the change commits.
+    keys = [_version_keys(user_id)[1] for user_id in user_ids] if user_ids is not None else ['principal:version']
+    transaction.on_commit(lambda: get_versions_store().bump(keys))
+
+
+def build(user):
+    # A user from an access token only has its id and type loaded.
+    fields = ['user_type', 'is_active', 'is_superuser', 'password']
+    if user.get_deferred_fields() & set(fields):
+        user.refresh_from_db(fields=fields)
+    principal = Principal(
+        user.pk, user.user_type, is_active=user.is_active, is_superuser=user.is_superuser,
+        fingerprint=user.token_fingerprint(),
+    )
+    profile = {'student': Student, 'faculty': Faculty}.get(user.user_type)
+    if profile is not None:
+        ids = profile.objects.filter(user_id=user.pk).values_list('pk', 'department_id').first()
+        if ids is not None:
+            setattr(principal, f'{user.user_type}_id', ids[0])
+            principal.department_id = ids[1]
+    if user.is_active and not user.is_superuser:
+        principal.permissions = frozenset(user.get_all_permissions())
+    # Sign-ins revoked within an access token's lifetime still have live
+    # access tokens; older ones have none. Revoking one invalidates this.
+    since = timezone.now() - datetime.timedelta(seconds=settings.ACCESS_TOKEN_LIFETIME)
+    principal.revoked_families = frozenset(
+        str(family) for family in
+        RefreshToken.objects.filter(user_id=user.pk, revoked_at__gt=since).values_list('family', flat=True).distinct()
+    )
+    return principal
+
+
+def get_principal(user):
+    # Kept on the user object for the rest of the request.
+    principal = getattr(user, '_principal', None)
+    if principal is not None:
+        return principal
+    if not user.is_authenticated:
+        principal = Principal(None, None)
+    else:
+        cache = get_cache()
+        key = 'principal:{}:{}.{}'.format(user.pk, *_versions(user.pk))
+        principal = cache.get(key)
+        metrics.cache_lookup('principal', principal is not None)
+        if principal is None:
+            principal = build(user)
+            cache.set(key, principal, getattr(settings, 'PRINCIPAL_CACHE_TIMEOUT', 60 * 60))
+    user._principal = principal
+    return principal
+
+
+class PrincipalModelPermissions(DjangoModelPermissions):
+    # DjangoModelPermissions, checked against the cached permission set.
+
+    def has_permission(self, request, view):
+        if not request.user or (not request.user.is_authenticated and self.authenticated_users_only):
+            return False
+        if getattr(view, '_ignore_model_permissions', False):
+            return True
+        queryset = self._queryset(view)
+        perms = self.get_required_permissions(request.method, queryset.model)
+        return get_principal(request.user).has_perms(perms)
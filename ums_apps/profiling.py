@@ -0,0 +1,120 @@
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('profiling')
+
+# The SQL a request ran: how many queries, how long they took, and which
+# statements ran again and again with different parameters (N+1). Queries
+# are timed through each connection's execute_wrapper, so this works with
+# DEBUG off. With DEBUG on the totals go into X-DB-* response headers;
+# either way a sample of requests (PROFILING_SAMPLE_RATE), and every request
+# whose queries took longer than its view's threshold, is logged as one JSON
+# line to the 'profiling' logger. A view sets its threshold with a
+# slow_query_ms attribute; PROFILING_SLOW_QUERY_MS is the default.
+
+IN_LIST = re.compile(r'IN \(%s(?:, %s)*\)')
+
+
+def fingerprint(sql):
+    # One statement however many values its IN lists got.
+    return IN_LIST.sub('IN (...)', sql)
+
+
+def fingerprint_id(sql):
+    return hashlib.sha1(sql.encode()).hexdigest()[:8]
+
+
+def view_name(view):
+    if view is None:
+        return None
+    return f"{view.__module__}.{getattr(view, '__qualname__', type(view).__qualname__)}"
+
+
+class Profile:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0
+        self.statements = defaultdict(lambda: [0, 0])
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            statement = self.statements[sql]
+            statement[0] += 1
+            statement[1] += elapsed
+
+    def repeated(self):
+        # [(fingerprint, count, seconds)] of the statements run at least
+        # PROFILING_REPEAT_THRESHOLD times, most often first.
+        totals = defaultdict(lambda: [0, 0])
+        for sql, (count, seconds) in self.statements.items():
+            total = totals[fingerprint(sql)]
+            total[0] += count
+            total[1] += seconds
+        threshold = getattr(settings, 'PROFILING_REPEAT_THRESHOLD', 3)
+        return sorted(
+            ((sql, count, seconds) for sql, (count, seconds) in totals.items() if count >= threshold),
+            key=lambda item: -item[1],
+        )
+
+
+class QueryProfileMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = Profile()
+        request._query_profile = profile
+        request._query_profile_view = None
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        view = request._query_profile_view
+        threshold = getattr(view, 'slow_query_ms', None)
+        if threshold is None:
+            threshold = getattr(settings, 'PROFILING_SLOW_QUERY_MS', 500)
+        repeated = profile.repeated()
+        if settings.DEBUG:
+            response['X-DB-Queries'] = str(profile.count)
+            response['X-DB-Time'] = f'{profile.seconds * 1000:.1f}ms'
+            if repeated:
+                response['X-DB-Repeated'] = ', '.join(f'{fingerprint_id(sql)}={count}' for sql, count, _ in repeated)
+        slow = profile.seconds * 1000 >= threshold
+        if slow or random.random() < getattr(settings, 'PROFILING_SAMPLE_RATE', 0.01):
+            logger.info(json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'view': view_name(view),
+                'status': response.status_code,
+                'ms': round(elapsed * 1000, 1),
+                'queries': profile.count,
+                'db_ms': round(profile.seconds * 1000, 1),
+                'slow': slow,
+                'repeated': [
+                    {'id': fingerprint_id(sql), 'count': count, 'db_ms': round(seconds * 1000, 1), 'sql': sql[:500]}
+                    for sql, count, seconds in repeated[:5]
+                ],
+            }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # The class of a DRF or class-based view, else the function.
+        request._query_profile_view = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None) or view_func
@@ -0,0 +1,81 @@
+from django.db.models import Q
+
+from academics.models import Course, Timetable
+from faculty.models import Faculty
+from students.models import Student, Enrollment, Withdrawal, Grade, Attendance, RegistrationRequest
+from principal import get_principal
+
+# Row-level visibility of each model per role, given the request's principal;
+# roles without a rule (admins) see every row. The rules filter on the cached
+# student, faculty and department ids rather than joining through the user.
+# Rules that reach across enrollments are semi-joins, pk IN (SELECT ... FROM
+# enrollment ...), which the database can drive from the user's few
+# enrollments, instead of joining every enrollment and de-duplicating the
+# result with DISTINCT.
+# A user whose role has no matching profile (a faculty user without a Faculty
+# row, say) has a None id, which would filter as IS NULL and match every
+# unassigned row; such users see nothing instead.
+
+
+class _NoProfile(Exception):
+    pass
+
+
+def _id(principal, name):
+    value = getattr(principal, name)
+    if value is None:
+        raise _NoProfile(name)
+    return value
+
+
+def _teaches(principal):
+    return Q(course__faculty=_id(principal, 'faculty_id'))
+
+
+def _own(principal):
+    return Q(student=_id(principal, 'student_id'))
+
+
+def _taught_students(principal):
+    return Enrollment.objects.filter(course__faculty=_id(principal, 'faculty_id')).values('student')
+
+
+def _enrolled_courses(principal):
+    return Enrollment.objects.filter(student=_id(principal, 'student_id')).values('course')
+
+
+def _same_department(principal):
+    return Q(department=_id(principal, 'department_id'))
+
+
+RULES = {
+    Student: {
+        'student': lambda principal: Q(pk=_id(principal, 'student_id')),
+        'faculty': lambda principal: Q(pk__in=_taught_students(principal)),
+    },
+    Enrollment: {'faculty': _teaches, 'student': _own},
+    Withdrawal: {'faculty': _teaches, 'student': _own},
+    Grade: {'faculty': _teaches, 'student': _own},
+    Attendance: {'faculty': _teaches, 'student': _own},
+    RegistrationRequest: {'faculty': _teaches, 'student': _own},
+    Course: {
+        'faculty': lambda principal: Q(faculty=_id(principal, 'faculty_id')),
+        'student': lambda principal: Q(pk__in=_enrolled_courses(principal)),
+    },
+    Timetable: {
+        'faculty': _teaches,
+        'student': lambda principal: Q(course__in=_enrolled_courses(principal)),
+    },
+    Faculty: {'faculty': _same_department, 'student': _same_department},
+}
+
+
+def scope(queryset, user):
+    principal = get_principal(user)
+    rule = RULES.get(queryset.model, {}).get(principal.role)
+    if rule is None:
+        return queryset
+    try:
+        return queryset.filter(rule(principal))
+    except _NoProfile:
+        return queryset.none()
@@ -1,8 +1,11 @@
 from django.contrib import admin
-from .models import Student, Enrollment, Withdrawal, Grade, Attendance
+from .models import Student, Enrollment, Withdrawal, Grade, Attendance, AttendanceCounter, AttendanceBitmap, RegistrationRequest
 
 admin.site.register(Student)
 admin.site.register(Enrollment)
 admin.site.register(Withdrawal)
 admin.site.register(Grade)
 admin.site.register(Attendance)
+admin.site.register(AttendanceCounter)
+admin.site.register(AttendanceBitmap)
+admin.site.register(RegistrationRequest)
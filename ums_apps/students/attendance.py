@@ -0,0 +1,120 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, IntegerField, Q, Value, When
+from django.db.models.functions import NullIf
+
+from .models import Attendance, AttendanceCounter
+
+BULK_CHUNK_SIZE = 500
+
+
+def _counts(status, sign):
+    present = sign if status == 'present' else 0
+    return {'present': present, 'absent': sign - present, 'total': sign}
+
+
+def _updates(present, absent, total):
+    # The percentage is computed from the pre-update columns plus the same deltas.
+    return {
+        'present_count': F('present_count') + present,
+        'absent_count': F('absent_count') + absent,
+        'total_count': F('total_count') + total,
+        'attendance_percentage': ExpressionWrapper(
+            (F('present_count') + present) * Value(100.0) / NullIf(F('total_count') + total, Value(0)),
+            output_field=FloatField(),
+        ),
+    }
+
+
+def apply_counts(student_id, course_id, present=0, absent=0, total=0):
+    # Adds to the (student, course) counter in a single UPDATE.
+    if not (present or absent or total):
+        return
+    lookup = {'student_id': student_id, 'course_id': course_id}
+    updates = _updates(present, absent, total)
+    with transaction.atomic():
+        if AttendanceCounter.objects.filter(**lookup).update(**updates):
+            return
+        # Nothing to retract from: the counter went with a cascade delete.
+        if total < 0:
+            return
+        AttendanceCounter.objects.get_or_create(**lookup)
+        AttendanceCounter.objects.filter(**lookup).update(**updates)
+
+
+def attendance_changed(old, new):
+    if old is not None and new is not None and all(
+        old[field] == new[field] for field in ('student_id', 'course_id', 'status')
+    ):
+        return
+    with transaction.atomic():
+        if old is not None:
+            apply_counts(old['student_id'], old['course_id'], **_counts(old['status'], -1))
+        if new is not None:
+            apply_counts(new['student_id'], new['course_id'], **_counts(new['status'], 1))
+
+
+def attendances_changed(changes):
+    # Bulk form of attendance_changed for (old, new) pairs: one UPDATE per
+    # chunk of counters, each adding its own deltas through a CASE.
+    deltas = defaultdict(lambda: defaultdict(int))
+    for old, new in changes:
+        for values, sign in ((old, -1), (new, 1)):
+            if values is not None:
+                for field, delta in _counts(values['status'], sign).items():
+                    deltas[values['student_id'], values['course_id']][field] += delta
+    apply_many(deltas)
+
+
+def marks_removed(counts):
+    # Retracts {(student_id, course_id): (present, absent)} of marks that left
+    # the table without signals, such as a detached partition.
+    apply_many({
+        pair: {'present': -present, 'absent': -absent, 'total': -(present + absent)}
+        for pair, (present, absent) in counts.items()
+    })
+
+
+def apply_many(deltas):
+    # {(student_id, course_id): {'present', 'absent', 'total'}} deltas.
+    pairs = sorted(pair for pair, counts in deltas.items() if any(counts.values()))
+    with transaction.atomic():
+        AttendanceCounter.objects.bulk_create(
+            [AttendanceCounter(student_id=s, course_id=c) for s, c in pairs if deltas[s, c]['total'] > 0],
+            ignore_conflicts=True,
+        )
+        for start in range(0, len(pairs), BULK_CHUNK_SIZE):
+            chunk = pairs[start:start + BULK_CHUNK_SIZE]
+            present, absent, total = (
+                Case(
+                    *(When(student_id=s, course_id=c, then=Value(deltas[s, c][field])) for s, c in chunk),
+                    default=Value(0), output_field=IntegerField(),
+                )
+                for field in ('present', 'absent', 'total')
+            )
+            AttendanceCounter.objects.filter(
+                student_id__in={s for s, c in chunk}, course_id__in={c for s, c in chunk}
+            ).update(**_updates(present, absent, total))
+
+
+@transaction.atomic
+def rebuild_counters():
+    AttendanceCounter.objects.all().delete()
+    rows = Attendance.objects.values('student_id', 'course_id').annotate(
+        present=Count('id', filter=Q(status='present')),
+        absent=Count('id', filter=Q(status='absent')),
+        total=Count('id'),
+    ).order_by()
+    counters = (
+        AttendanceCounter(
+            student_id=row['student_id'],
+            course_id=row['course_id'],
+            present_count=row['present'],
+            absent_count=row['absent'],
+            total_count=row['total'],
+            attendance_percentage=row['present'] * 100.0 / row['total'],
+        )
+        for row in rows.iterator(chunk_size=5000)
+    )
+    return len(AttendanceCounter.objects.bulk_create(counters, batch_size=5000))
@@ -0,0 +1,262 @@
+import datetime
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from academics.models import Term, Timetable
+from . import partitioning
+from .models import Attendance, AttendanceBitmap
+
+# Packed attendance: one AttendanceBitmap per (student, course, term) with a
+# bit per scheduled session, where the sessions are the term's dates on the
+# weekdays of the course's Timetable. With ATTENDANCE_STORAGE = 'bitmap' they
+# are kept current from Attendance writes, on top of the rows rather than
+# instead of them: a term's history is one read, and a term keeps its marks
+# once its Attendance partitions are archived. Marks on dates outside every
+# term or timetable slot stay rows only.
+#
+# Marks dated before archived_before() are only in the bitmaps, so a rebuild
+# carries them over from the stored bitmaps and the rows win for every other
+# date.
+
+WEEKDAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+BULK_CHUNK_SIZE = 1000
+
+
+def enabled():
+    return getattr(settings, 'ATTENDANCE_STORAGE', 'rows') == 'bitmap'
+
+
+def to_int(bits):
+    return int.from_bytes(bits or b'', 'little')
+
+
+def to_bytes(value):
+    return value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+
+def counts(bitmap):
+    # (present, marked) by popcount.
+    return to_int(bitmap.present).bit_count(), to_int(bitmap.marked).bit_count()
+
+
+def marks(bitmap, session_count):
+    # 'P' present, 'A' absent, '-' not marked, one character per session.
+    marked, present = to_int(bitmap.marked), to_int(bitmap.present)
+    return ''.join(
+        ('P' if present >> n & 1 else 'A') if marked >> n & 1 else '-'
+        for n in range(session_count)
+    )
+
+
+def term_for(terms, date):
+    for term in terms:
+        if term.start_date <= date <= term.end_date:
+            return term
+    return None
+
+
+class Sessions:
+    # Session dates of courses per term, from one Timetable query.
+
+    def __init__(self, course_ids=None):
+        timetables = Timetable.objects.all()
+        if course_ids is not None:
+            timetables = timetables.filter(course_id__in=course_ids)
+        self.weekdays = defaultdict(set)
+        for course_id, day in timetables.values_list('course_id', 'day'):
+            key = day.strip().lower()[:3]
+            if key in WEEKDAYS:
+                self.weekdays[course_id].add(WEEKDAYS.index(key))
+        self.cache = {}
+
+    def dates(self, course_id, term):
+        key = (course_id, term.start_date, term.end_date)
+        if key not in self.cache:
+            weekdays = self.weekdays.get(course_id, set())
+            days = (term.end_date - term.start_date).days + 1
+            dates = [term.start_date + datetime.timedelta(days=n) for n in range(max(days, 0))]
+            dates = [date for date in dates if date.weekday() in weekdays]
+            self.cache[key] = {date: n for n, date in enumerate(dates)}
+        return self.cache[key]
+
+
+def _date(value):
+    return datetime.date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def marks_changed(changes):
+    # Applies Attendance (old, new) value pairs to the affected bitmaps, one
+    # read-modify-write per bitmap.
+    marks = [
+        (values, set_mark) for old, new in changes
+        for values, set_mark in ((old, False), (new, True)) if values is not None
+    ]
+    if not marks:
+        return
+    terms = list(Term.objects.order_by('start_date'))
+    sessions = Sessions({values['course_id'] for values, set_mark in marks})
+    ops = defaultdict(list)
+    for values, set_mark in marks:
+        date = _date(values['date'])
+        term = term_for(terms, date)
+        if term is None:
+            continue
+        bit = sessions.dates(values['course_id'], term).get(date)
+        if bit is None:
+            continue
+        ops[values['student_id'], values['course_id'], term.pk].append(
+            (bit, values['status'] == 'present' if set_mark else None)
+        )
+    if not ops:
+        return
+
+    with transaction.atomic():
+        AttendanceBitmap.objects.bulk_create(
+            [
+                AttendanceBitmap(student_id=s, course_id=c, term_id=t)
+                for (s, c, t), key_ops in ops.items() if any(status is not None for bit, status in key_ops)
+            ],
+            ignore_conflicts=True,
+        )
+        bitmaps = AttendanceBitmap.objects.select_for_update().filter(
+            student_id__in={s for s, c, t in ops}, course_id__in={c for s, c, t in ops}, term_id__in={t for s, c, t in ops},
+        )
+        updated = []
+        for bitmap in bitmaps:
+            key_ops = ops.get((bitmap.student_id, bitmap.course_id, bitmap.term_id))
+            if not key_ops:
+                continue
+            marked, present = to_int(bitmap.marked), to_int(bitmap.present)
+            for bit, status in key_ops:
+                mask = 1 << bit
+                if status is None:
+                    marked &= ~mask
+                    present &= ~mask
+                else:
+                    marked |= mask
+                    present = present | mask if status else present & ~mask
+            bitmap.marked, bitmap.present = to_bytes(marked), to_bytes(present)
+            updated.append(bitmap)
+        AttendanceBitmap.objects.bulk_update(updated, ['marked', 'present'], batch_size=BULK_CHUNK_SIZE)
+
+
+def archived_before():
+    # Marks dated before this were in detached Attendance partitions (the
+    # attendance_partitions command detaches the oldest months first); None
+    # when the table holds every mark.
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        if not partitioning.is_partitioned(cursor):
+            return None
+        attached = partitioning.partitions(cursor)
+    return attached[0][1] if attached else None
+
+
+def build(term, course_ids=None, sessions=None):
+    # {(student_id, course_id): (marked, present)} for the term from Attendance.
+    rows = Attendance.objects.filter(date__range=(term.start_date, term.end_date))
+    if course_ids is not None:
+        rows = rows.filter(course_id__in=course_ids)
+    sessions = sessions or Sessions(course_ids)
+    bits = defaultdict(lambda: [0, 0])
+    for student_id, course_id, date, status in rows.values_list('student_id', 'course_id', 'date', 'status') \
+            .order_by().iterator(chunk_size=10000):
+        bit = sessions.dates(course_id, term).get(date)
+        if bit is None:
+            continue
+        entry = bits[student_id, course_id]
+        entry[0] |= 1 << bit
+        if status == 'present':
+            entry[1] |= 1 << bit
+    return {key: tuple(value) for key, value in bits.items()}
+
+
+def _carry_archived(bits, stored, sessions, term, old_sessions, old_term, before):
+    # Adds the marks of the stored bitmaps dated before `before` to `bits`,
+    # moved from their old session numbers to the current ones. An archived
+    # mark on a date that is no longer a session has nowhere to go.
+    for bitmap in stored:
+        old_dates = old_sessions.dates(bitmap.course_id, old_term)
+        dates = sessions.dates(bitmap.course_id, term)
+        old_marked, old_present = to_int(bitmap.marked), to_int(bitmap.present)
+        marked, present = bits.get((bitmap.student_id, bitmap.course_id), (0, 0))
+        for date, old_bit in old_dates.items():
+            bit = dates.get(date)
+            if date >= before or bit is None or not old_marked >> old_bit & 1 or marked >> bit & 1:
+                continue
+            marked |= 1 << bit
+            present |= (old_present >> old_bit & 1) << bit
+        if marked:
+            bits[bitmap.student_id, bitmap.course_id] = (marked, present)
+
+
+@transaction.atomic
+def rebuild(terms=None, course_ids=None, old_sessions=None, old_terms=None):
+    # old_sessions and old_terms ({term_id: Term}) describe the timetables and
+    # term dates the stored bitmaps were numbered with, when a change has
+    # renumbered the sessions.
+    terms = list(Term.objects.order_by('start_date') if terms is None else terms)
+    before = archived_before()
+    sessions = Sessions(course_ids)
+    created = 0
+    for term in terms:
+        stale = AttendanceBitmap.objects.filter(term=term)
+        if course_ids is not None:
+            stale = stale.filter(course_id__in=course_ids)
+        bits = build(term, course_ids, sessions)
+        if before is not None and term.start_date < before:
+            _carry_archived(
+                bits, stale.select_for_update(), sessions, term,
+                old_sessions or sessions, (old_terms or {}).get(term.pk, term), before,
+            )
+        stale.delete()
+        bitmaps = (
+            AttendanceBitmap(
+                student_id=student_id, course_id=course_id, term=term,
+                marked=to_bytes(marked), present=to_bytes(present),
+            )
+            for (student_id, course_id), (marked, present) in bits.items()
+        )
+        created += len(AttendanceBitmap.objects.bulk_create(bitmaps, batch_size=BULK_CHUNK_SIZE))
+    return created
+
+
+def drifted(terms=None):
+    # Number of (student, course, term) bitmaps that differ from the marks in
+    # the table. Archived marks have nothing to be checked against.
+    before = archived_before()
+    sessions = Sessions()
+    count = 0
+    for term in Term.objects.order_by('start_date') if terms is None else terms:
+        masks = {}
+
+        def attached(key, value):
+            if before is None:
+                return value
+            if key[1] not in masks:
+                masks[key[1]] = sum(1 << bit for date, bit in sessions.dates(key[1], term).items() if date >= before)
+            return value[0] & masks[key[1]], value[1] & masks[key[1]]
+
+        expected = {key: attached(key, value) for key, value in build(term, sessions=sessions).items()}
+        stored = {
+            (bitmap.student_id, bitmap.course_id): attached(
+                (bitmap.student_id, bitmap.course_id), (to_int(bitmap.marked), to_int(bitmap.present)),
+            )
+            for bitmap in AttendanceBitmap.objects.filter(term=term)
+        }
+        expected = {key: value for key, value in expected.items() if value[0]}
+        stored = {key: value for key, value in stored.items() if value[0]}
+        count += sum(expected.get(key) != stored.get(key) for key in expected.keys() | stored.keys())
+    return count
+
+
+def history(course_id, term, student_ids=None):
+    # (session dates, bitmaps) of a course over a term: two queries.
+    dates = sorted(Sessions([course_id]).dates(course_id, term))
+    bitmaps = AttendanceBitmap.objects.filter(course_id=course_id, term=term).order_by('student_id')
+    if student_ids is not None:
+        bitmaps = bitmaps.filter(student_id__in=student_ids)
+    return dates, list(bitmaps)
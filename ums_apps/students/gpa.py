@@ -0,0 +1,88 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, NullIf
+
+from .models import Student
+
+# Student.grade_sum / grade_count / gpa mirror Avg('grade') over the student's
+# Grade rows so ranking and thresholds can use the (program, gpa) and
+# (department, gpa) indexes.
+
+DRIFT_TOLERANCE = 1e-6
+BULK_CHUNK_SIZE = 500
+
+
+def apply_grade(student_ids, grade_sum, grade_count):
+    Student.objects.filter(pk__in=student_ids).update(
+        grade_sum=F('grade_sum') + grade_sum,
+        grade_count=F('grade_count') + grade_count,
+        gpa=ExpressionWrapper(
+            (F('grade_sum') + grade_sum) / NullIf(F('grade_count') + grade_count, Value(0)),
+            output_field=FloatField(),
+        ),
+    )
+
+
+def grade_changed(old, new):
+    if old is not None and new is not None and all(
+        old[field] == new[field] for field in ('student_id', 'grade')
+    ):
+        return
+    with transaction.atomic():
+        if old is not None:
+            apply_grade([old['student_id']], -old['grade'], -1)
+        if new is not None:
+            apply_grade([new['student_id']], new['grade'], 1)
+
+
+def grades_changed(changes):
+    # Bulk form of grade_changed for (old, new) pairs: one UPDATE per chunk of
+    # students, each adding its own delta through a CASE.
+    deltas = defaultdict(lambda: [0.0, 0])
+    for old, new in changes:
+        for values, sign in ((old, -1), (new, 1)):
+            if values is not None:
+                deltas[values['student_id']][0] += sign * values['grade']
+                deltas[values['student_id']][1] += sign
+    student_ids = sorted(student_id for student_id, (total, count) in deltas.items() if total or count)
+    with transaction.atomic():
+        for start in range(0, len(student_ids), BULK_CHUNK_SIZE):
+            chunk = student_ids[start:start + BULK_CHUNK_SIZE]
+            grade_sum = Case(
+                *(When(pk=student_id, then=Value(deltas[student_id][0])) for student_id in chunk),
+                default=Value(0.0), output_field=FloatField(),
+            )
+            grade_count = Case(
+                *(When(pk=student_id, then=Value(deltas[student_id][1])) for student_id in chunk),
+                default=Value(0), output_field=IntegerField(),
+            )
+            apply_grade(chunk, grade_sum, grade_count)
+
+
+def with_actual_gpa(queryset):
+    return queryset.annotate(
+        actual_sum=Coalesce(Sum('grade__grade'), Value(0.0)),
+        actual_count=Count('grade'),
+    )
+
+
+def drifted(queryset=None):
+    queryset = with_actual_gpa(queryset if queryset is not None else Student.objects.all())
+    return queryset.filter(
+        ~Q(grade_count=F('actual_count'))
+        | Q(grade_sum__gt=F('actual_sum') + DRIFT_TOLERANCE)
+        | Q(grade_sum__lt=F('actual_sum') - DRIFT_TOLERANCE)
+    )
+
+
+@transaction.atomic
+def recompute(queryset=None):
+    students = list(with_actual_gpa(queryset if queryset is not None else Student.objects.all()))
+    for student in students:
+        student.grade_sum = student.actual_sum
+        student.grade_count = student.actual_count
+        student.gpa = student.actual_sum / student.actual_count if student.actual_count else None
+    Student.objects.bulk_update(students, Student.GPA_FIELDS, batch_size=1000)
+    return len(students)
@@ -0,0 +1,53 @@
+from django.db import transaction
+
+from academics.models import Course
+from .models import Grade
+from .signals import bulk_changed
+
+
+def lock_courses(course_ids):
+    # Every grade write takes its courses' row locks, in id order, before
+    # reading what is stored: concurrent writes of one student's grade in a
+    # course then update it in turn instead of both inserting it.
+    list(Course.objects.select_for_update().filter(pk__in=course_ids).order_by('pk').values_list('pk'))
+
+
+@transaction.atomic
+def upsert_grades(grades):
+    # Creates or updates {(student_id, course_id): grade}; returns the number
+    # of grades created and updated.
+    lock_courses({course_id for student_id, course_id in grades})
+    grades_qs = Grade.objects.filter(
+        student_id__in={student_id for student_id, course_id in grades},
+        course_id__in={course_id for student_id, course_id in grades},
+    )
+    existing = {(grade.student_id, grade.course_id): grade for grade in grades_qs}
+
+    created, updated, changes = [], [], []
+    for (student_id, course_id), value in grades.items():
+        grade = existing.get((student_id, course_id))
+        if grade is None:
+            created.append(Grade(student_id=student_id, course_id=course_id, grade=value))
+        elif grade.grade != value:
+            old = grade.current_values()
+            grade.grade = value
+            updated.append(grade)
+            changes.append((old, grade.current_values()))
+
+    Grade.objects.bulk_create(created, batch_size=1000)
+    Grade.objects.bulk_update(updated, ['grade'], batch_size=1000)
+    changes.extend((None, grade.current_values()) for grade in created)
+    bulk_changed.send(sender=Grade, changes=changes)
+    return len(created), len(updated)
+
+
+@transaction.atomic
+def save_grades(course_id, grades):
+    # Upserts {student_id: grade} into one course's grades.
+    created, updated = upsert_grades({(student_id, course_id): grade for student_id, grade in grades.items()})
+    return {
+        'course': course_id,
+        'created': created,
+        'updated': updated,
+        'unchanged': len(grades) - created - updated,
+    }
@@ -0,0 +1,499 @@
+import csv
+import datetime
+import io
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from academics.models import Department, Program, Course
+from .models import Student, Enrollment, Grade
+from .gradebook import lock_courses, upsert_grades
+from .signals import bulk_changed
+
+# CSV imports for a new intake: students (with their user accounts),
+# enrollments and grades. The file is read and validated a chunk at a time
+# against id maps loaded up front. On PostgreSQL each chunk is COPY'd into a
+# temporary staging table and merged with INSERT ... SELECT; other databases
+# get bulk_create. Each chunk commits on its own, and rows that already exist
+# are skipped, so an interrupted import can simply be run again.
+
+CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportFileError(Exception):
+    pass
+
+
+class RowError(Exception):
+    pass
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _id_map(pairs):
+    # name (case-insensitive) or id -> set of ids; a name can be ambiguous.
+    ids = {}
+    for pk, name in pairs:
+        ids.setdefault(name.strip().lower(), set()).add(pk)
+        ids.setdefault(str(pk), set()).add(pk)
+    return ids
+
+
+def _resolve(ids, value, label):
+    matches = ids.get(value.lower(), set())
+    if not matches:
+        raise RowError(f'Unknown {label} "{value}".')
+    if len(matches) > 1:
+        raise RowError(f'{label.capitalize()} "{value}" is ambiguous; use its id.')
+    return next(iter(matches))
+
+
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _copy_field(value):
+    # COPY's text format, as psycopg 3 writes it: None is \N, so an empty
+    # string stays an empty string as it does through bulk_create.
+    if value is None:
+        return '\\N'
+    return str(value).translate(COPY_ESCAPES)
+
+
+def _copy(cursor, table, columns, rows):
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    raw = cursor.cursor
+    if hasattr(raw, 'copy'):
+        # psycopg 3
+        with raw.copy(sql) as copy:
+            for row in rows:
+                copy.write_row(row)
+    else:
+        # psycopg2
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join(_copy_field(value) for value in row) + '\n')
+        buffer.seek(0)
+        raw.copy_expert(sql, buffer)
+
+
+def _stage(cursor, name, fields, rows):
+    # fields: [(column, model field giving its type)]
+    columns = ', '.join(f'{column} {field.db_type(connection)}' for column, field in fields)
+    cursor.execute(f'CREATE TEMPORARY TABLE {name} ({columns}) ON COMMIT DROP')
+    _copy(cursor, name, [column for column, field in fields], rows)
+
+
+def _insert_columns(model, sources, **values):
+    # (columns, SELECT list, params) for an INSERT ... SELECT of every column
+    # of the model but the primary key. `sources` maps columns to SQL; the
+    # others take what a new instance would save, so a column added to the
+    # model is never left out.
+    instance = model(**values)
+    columns, select, params = [], [], []
+    for field in model._meta.concrete_fields:
+        if field.primary_key:
+            continue
+        columns.append(field.column)
+        if field.column in sources:
+            select.append(sources[field.column])
+        else:
+            select.append('%s')
+            params.append(field.get_db_prep_save(field.pre_save(instance, True), connection))
+    return ', '.join(columns), ', '.join(select), params
+
+
+def _returning(model):
+    return ', '.join(field.column for field in model._meta.concrete_fields)
+
+
+def _fetch_dicts(cursor):
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+class Import:
+    kind = None
+    columns = ()
+    required = ()
+    hashes_passwords = False
+
+    def __init__(self, dry_run=False, chunk_size=CHUNK_SIZE, hash_workers=None, progress=None):
+        self.dry_run = dry_run
+        self.chunk_size = chunk_size
+        self.hash_workers = settings.IMPORT_HASH_WORKERS if hash_workers is None else hash_workers
+        self.progress = progress
+        self.pool = None
+        self.report = {
+            'kind': self.kind,
+            'dry_run': dry_run,
+            'rows': 0,
+            'valid': 0,
+            'invalid': 0,
+            'created': 0,
+            'updated': 0,
+            'skipped': 0,
+            'errors': [],
+            'seconds': 0,
+        }
+
+    def run(self, fileobj):
+        started = time.perf_counter()
+        reader = csv.DictReader(fileobj)
+        missing = [column for column in self.required if column not in (reader.fieldnames or ())]
+        if missing:
+            raise ImportFileError(f"Missing columns: {', '.join(missing)}.")
+        self.load_maps()
+        if self.hashes_passwords and not self.dry_run and self.hash_workers > 1:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.hash_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+        try:
+            # Line 1 is the header.
+            for chunk in chunks(enumerate(reader, start=2), self.chunk_size):
+                self.report['rows'] += len(chunk)
+                rows = []
+                for line, row in chunk:
+                    try:
+                        rows.append((line, self.clean({
+                            key: (value or '').strip() for key, value in row.items() if key is not None
+                        })))
+                    except RowError as exc:
+                        self.error(line, str(exc))
+                rows = self.check(rows)
+                self.report['errors'].sort(key=lambda error: error['line'])
+                self.report['valid'] += len(rows)
+                if rows and not self.dry_run:
+                    with transaction.atomic():
+                        if connection.vendor == 'postgresql':
+                            self.merge(rows)
+                        else:
+                            self.bulk(rows)
+                self.report['seconds'] = round(time.perf_counter() - started, 2)
+                if self.progress:
+                    self.progress(self.report)
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+        return self.report
+
+    def error(self, line, message):
+        self.report['invalid'] += 1
+        if len(self.report['errors']) < MAX_REPORTED_ERRORS:
+            self.report['errors'].append({'line': line, 'error': message})
+
+    def skip(self, count=1):
+        self.report['skipped'] += count
+
+    def students_by_username(self, rows):
+        return dict(
+            Student.objects.filter(user__username__in={values['username'] for line, values in rows})
+            .values_list('user__username', 'pk')
+        )
+
+    def hash_passwords(self, passwords):
+        # Blank passwords get an unusable one; the rest go to the process pool,
+        # since each hash deliberately takes a noticeable fraction of a second.
+        hashed = [make_password(None) for _ in passwords]
+        todo = [index for index, password in enumerate(passwords) if password]
+        if self.pool is None:
+            results = [make_password(passwords[index]) for index in todo]
+        else:
+            chunksize = max(1, len(todo) // (self.hash_workers * 4))
+            results = self.pool.map(make_password, [passwords[index] for index in todo], chunksize=chunksize)
+        for index, password in zip(todo, results):
+            hashed[index] = password
+        return hashed
+
+    # Subclasses: load_maps(), clean(values) -> values, check([(line, values)]) -> [values],
+    # merge(rows) for PostgreSQL and bulk(rows) for everything else.
+
+    def load_maps(self):
+        pass
+
+    def check(self, rows):
+        return [values for line, values in rows]
+
+
+class StudentImport(Import):
+    kind = 'students'
+    columns = ('username', 'email', 'first_name', 'last_name', 'password', 'department', 'program', 'enrollment_date')
+    required = ('username', 'program')
+    hashes_passwords = True
+
+    def load_maps(self):
+        self.departments = _id_map(Department.objects.values_list('pk', 'name'))
+        self.programs = _id_map(Program.objects.values_list('pk', 'name'))
+        self.program_departments = dict(Program.objects.values_list('pk', 'department_id'))
+        self.seen = set()
+
+    def clean(self, values):
+        username = values.get('username', '')
+        if not username:
+            raise RowError('username is required.')
+        if len(username) > CustomUser._meta.get_field('username').max_length:
+            raise RowError('username is too long.')
+        if username in self.seen:
+            raise RowError(f'Duplicate username "{username}" in this file.')
+        self.seen.add(username)
+
+        candidates = self.programs.get(values['program'].lower(), set())
+        if values.get('department'):
+            department_id = _resolve(self.departments, values['department'], 'department')
+            candidates = {pk for pk in candidates if self.program_departments[pk] == department_id}
+            if not candidates:
+                raise RowError(f'Department "{values["department"]}" has no program "{values["program"]}".')
+        program_id = _resolve({values['program'].lower(): candidates}, values['program'], 'program')
+
+        try:
+            enrollment_date = datetime.date.fromisoformat(values['enrollment_date']) \
+                if values.get('enrollment_date') else timezone.localdate()
+        except ValueError:
+            raise RowError('enrollment_date must be YYYY-MM-DD.')
+        return {
+            'username': username,
+            'email': values.get('email', ''),
+            'first_name': values.get('first_name', ''),
+            'last_name': values.get('last_name', ''),
+            'password': values.get('password', ''),
+            'department_id': self.program_departments[program_id],
+            'program_id': program_id,
+            'enrollment_date': enrollment_date,
+        }
+
+    def check(self, rows):
+        existing = set(
+            CustomUser.objects.filter(username__in=[values['username'] for line, values in rows])
+            .values_list('username', flat=True)
+        )
+        self.skip(sum(values['username'] in existing for line, values in rows))
+        return [values for line, values in rows if values['username'] not in existing]
+
+    def merge(self, rows):
+        passwords = self.hash_passwords([values['password'] for values in rows])
+        user, student = CustomUser._meta, Student._meta
+        user_fields = ('username', 'email', 'first_name', 'last_name', 'password')
+        fields = [(name, user.get_field(name)) for name in user_fields]
+        fields += [(f'{name}_id', student.get_field(name)) for name in ('department', 'program')]
+        fields += [('enrollment_date', student.get_field('enrollment_date'))]
+        staged = (
+            (v['username'], v['email'], v['first_name'], v['last_name'], password,
+             v['department_id'], v['program_id'], v['enrollment_date'])
+            for v, password in zip(rows, passwords)
+        )
+        user_columns, user_select, user_params = _insert_columns(
+            CustomUser, {name: name for name in user_fields}, user_type='student',
+        )
+        student_columns, student_select, student_params = _insert_columns(Student, {
+            'user_id': 'new_users.id', 'department_id': 's.department_id', 'program_id': 's.program_id',
+            'enrollment_date': 's.enrollment_date',
+        })
+        with connection.cursor() as cursor:
+            _stage(cursor, 'import_students', fields, staged)
+            cursor.execute(f"""
+                WITH new_users AS (
+                    INSERT INTO {user.db_table} ({user_columns})
+                    SELECT {user_select} FROM import_students
+                    ON CONFLICT (username) DO NOTHING
+                    RETURNING id, username
+                )
+                INSERT INTO {student.db_table} ({student_columns})
+                SELECT {student_select}
+                FROM new_users JOIN import_students s ON s.username = new_users.username
+                RETURNING {_returning(Student)}
+            """, user_params + student_params)
+            created = _fetch_dicts(cursor)
+        self.created(created, len(rows))
+
+    def bulk(self, rows):
+        passwords = self.hash_passwords([values['password'] for values in rows])
+        users = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=values['username'], email=values['email'], password=password,
+                first_name=values['first_name'], last_name=values['last_name'], user_type='student',
+            )
+            for values, password in zip(rows, passwords)
+        ])
+        students = Student.objects.bulk_create([
+            Student(
+                user=user, department_id=values['department_id'], program_id=values['program_id'],
+                enrollment_date=values['enrollment_date'],
+            )
+            for user, values in zip(users, rows)
+        ])
+        self.created([student.current_values() for student in students], len(rows))
+
+    def created(self, students, attempted):
+        self.report['created'] += len(students)
+        self.skip(attempted - len(students))
+        bulk_changed.send(sender=CustomUser, changes=[(None, {'id': s['user_id']}) for s in students])
+        bulk_changed.send(sender=Student, changes=[(None, s) for s in students])
+
+
+class EnrollmentImport(Import):
+    kind = 'enrollments'
+    columns = ('username', 'course')
+    required = columns
+
+    def load_maps(self):
+        self.courses = _id_map(Course.objects.values_list('pk', 'code'))
+
+    def clean(self, values):
+        if not values.get('username'):
+            raise RowError('username is required.')
+        return {'username': values['username'], 'course_id': _resolve(self.courses, values['course'], 'course')}
+
+    def check(self, rows):
+        students = self.students_by_username(rows)
+        pairs = set()
+        for line, values in rows:
+            if values['username'] not in students:
+                self.error(line, f'Unknown student "{values["username"]}".')
+                continue
+            pairs.add((students[values['username']], values['course_id']))
+        existing = set(
+            Enrollment.objects.filter(
+                student_id__in={s for s, c in pairs}, course_id__in={c for s, c in pairs},
+            ).values_list('student_id', 'course_id')
+        )
+        new = [{'student_id': s, 'course_id': c} for s, c in sorted(pairs - existing)]
+        known = sum(values['username'] in students for line, values in rows)
+        self.skip(known - len(new))
+        return new
+
+    def merge(self, rows):
+        fields = [('student_id', Enrollment._meta.get_field('student')), ('course_id', Enrollment._meta.get_field('course'))]
+        table = Enrollment._meta.db_table
+        columns, select, params = _insert_columns(Enrollment, {'student_id': 's.student_id', 'course_id': 's.course_id'})
+        with connection.cursor() as cursor:
+            _stage(cursor, 'import_enrollments', fields, ((v['student_id'], v['course_id']) for v in rows))
+            cursor.execute(f"""
+                INSERT INTO {table} ({columns})
+                SELECT {select} FROM import_enrollments s
+                ON CONFLICT (student_id, course_id) DO NOTHING
+                RETURNING {_returning(Enrollment)}
+            """, params)
+            self.created(_fetch_dicts(cursor), len(rows))
+
+    def bulk(self, rows):
+        enrollments = Enrollment.objects.bulk_create([Enrollment(**values) for values in rows])
+        self.created([enrollment.current_values() for enrollment in enrollments], len(rows))
+
+    def created(self, enrollments, attempted):
+        self.report['created'] += len(enrollments)
+        self.skip(attempted - len(enrollments))
+        bulk_changed.send(sender=Enrollment, changes=[(None, e) for e in enrollments])
+
+
+class GradeImport(Import):
+    kind = 'grades'
+    columns = ('username', 'course', 'grade')
+    required = columns
+
+    def load_maps(self):
+        self.courses = _id_map(Course.objects.values_list('pk', 'code'))
+
+    def clean(self, values):
+        if not values.get('username'):
+            raise RowError('username is required.')
+        try:
+            grade = float(values['grade'])
+        except ValueError:
+            raise RowError('grade must be a number.')
+        if not 0 <= grade <= 100:
+            raise RowError('grade must be between 0 and 100.')
+        return {
+            'username': values['username'],
+            'course_id': _resolve(self.courses, values['course'], 'course'),
+            'grade': grade,
+        }
+
+    def check(self, rows):
+        students = self.students_by_username(rows)
+        student_ids = set(students.values())
+        enrolled = set(
+            Enrollment.objects.filter(
+                student_id__in=student_ids, course_id__in={values['course_id'] for line, values in rows},
+            ).values_list('student_id', 'course_id')
+        )
+        grades = {}
+        for line, values in rows:
+            student_id = students.get(values['username'])
+            if student_id is None:
+                self.error(line, f'Unknown student "{values["username"]}".')
+            elif (student_id, values['course_id']) not in enrolled:
+                self.error(line, 'Student is not enrolled in this course.')
+            elif (student_id, values['course_id']) in grades:
+                self.error(line, 'Duplicate grade for this student and course.')
+            else:
+                grades[student_id, values['course_id']] = values['grade']
+        return [{'student_id': s, 'course_id': c, 'grade': grade} for (s, c), grade in grades.items()]
+
+    def merge(self, rows):
+        table = Grade._meta.db_table
+        fields = [
+            ('student_id', Grade._meta.get_field('student')),
+            ('course_id', Grade._meta.get_field('course')),
+            ('grade', Grade._meta.get_field('grade')),
+        ]
+        # Under the same course locks as the gradebook's upsert_grades.
+        lock_courses({v['course_id'] for v in rows})
+        with connection.cursor() as cursor:
+            _stage(cursor, 'import_grades', fields, ((v['student_id'], v['course_id'], v['grade']) for v in rows))
+            cursor.execute(f"""
+                WITH current AS (
+                    SELECT g.id, g.grade
+                    FROM {table} g JOIN import_grades s USING (student_id, course_id)
+                )
+                UPDATE {table} g SET grade = s.grade
+                FROM current, import_grades s
+                WHERE g.id = current.id AND s.student_id = g.student_id AND s.course_id = g.course_id
+                    AND g.grade <> s.grade
+                RETURNING g.id, g.student_id, g.course_id, current.grade AS old_grade, g.grade
+            """)
+            updated = _fetch_dicts(cursor)
+            columns, select, params = _insert_columns(
+                Grade, {column: f's.{column}' for column, field in fields},
+            )
+            cursor.execute(f"""
+                INSERT INTO {table} ({columns})
+                SELECT {select} FROM import_grades s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM {table} g WHERE g.student_id = s.student_id AND g.course_id = s.course_id
+                )
+                RETURNING {_returning(Grade)}
+            """, params)
+            created = _fetch_dicts(cursor)
+        changes = []
+        for row in updated:
+            old_grade = row.pop('old_grade')
+            changes.append(({**row, 'grade': old_grade}, row))
+        changes += [(None, row) for row in created]
+        bulk_changed.send(sender=Grade, changes=changes)
+        self.counted(len(created), len(updated), len(rows))
+
+    def bulk(self, rows):
+        created, updated = upsert_grades({(v['student_id'], v['course_id']): v['grade'] for v in rows})
+        self.counted(created, updated, len(rows))
+
+    def counted(self, created, updated, attempted):
+        self.report['created'] += created
+        self.report['updated'] += updated
+        self.skip(attempted - created - updated)
+
+
+KINDS = {importer.kind: importer for importer in (StudentImport, EnrollmentImport, GradeImport)}
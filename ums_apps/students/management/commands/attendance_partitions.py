@@ -0,0 +1,88 @@
+import datetime
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from students import partitioning
+from students.attendance import marks_removed
+from analytics import cache, rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Create monthly Attendance partitions ahead of time, and detach or archive closed months. '
+        'PostgreSQL only. Detached months leave the attendance counters and course rollups.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=3, help='Months ahead of this one to have partitions for.')
+        parser.add_argument(
+            '--detach-before', type=datetime.date.fromisoformat, metavar='YYYY-MM-DD',
+            help='Detach the partitions of months that end on or before this date.',
+        )
+        parser.add_argument(
+            '--archive-dir',
+            help='Write every detached partition to <dir>/<partition>.csv, then drop it.',
+        )
+        parser.add_argument('--list', action='store_true', help='Only list the partitions.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Attendance partitioning needs PostgreSQL.')
+        with connection.cursor() as cursor:
+            if not partitioning.is_partitioned(cursor):
+                raise CommandError('students_attendance is not partitioned; run migrate first.')
+            if options['list']:
+                self.list(cursor)
+                return
+
+            with transaction.atomic():
+                existing = {start for name, start, end in partitioning.partitions(cursor)}
+                month = partitioning.month_start(datetime.date.today())
+                for _ in range(options['ahead'] + 1):
+                    if month not in existing:
+                        self.stdout.write(f'Created {partitioning.create_partition(cursor, month)}.')
+                    month = partitioning.next_month(month)
+
+            detached = 0
+            if options['detach_before']:
+                with transaction.atomic():
+                    for name, start, end in partitioning.partitions(cursor):
+                        if end <= options['detach_before']:
+                            counts = partitioning.mark_counts(cursor, name)
+                            partitioning.detach_partition(cursor, name)
+                            marks_removed(counts)
+                            rollups.attendance_removed(counts)
+                            self.stdout.write(f'Detached {name} ({start} to {end}).')
+                            detached += 1
+
+            if options['archive_dir']:
+                os.makedirs(options['archive_dir'], exist_ok=True)
+                for name in partitioning.detached_partitions(cursor):
+                    path = os.path.join(options['archive_dir'], f'{name}.csv')
+                    # Written out before the drop commits, so a failed write keeps the table.
+                    with transaction.atomic(), open(path, 'wb') as fh:
+                        partitioning.copy_out(cursor, name, fh)
+                        cursor.execute(f'DROP TABLE {name}')
+                    self.stdout.write(f'Archived {name} to {path}.')
+
+        if detached:
+            cache.bump_version('attendance')
+            if getattr(settings, 'ANALYTICS_BACKEND', 'orm') == 'columnar':
+                from analytics.columnar import get_store
+                get_store().rewritten('attendance')
+        self.stdout.write(self.style.SUCCESS('Attendance partitions are up to date.'))
+
+    def list(self, cursor):
+        cursor.execute("""
+            SELECT c.relname, c.reltuples::bigint FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+        """, [partitioning.TABLE])
+        estimates = dict(cursor.fetchall())
+        for name, start, end in partitioning.partitions(cursor):
+            self.stdout.write(f'{name:<36}{start} to {end}  ~{max(estimates.get(name, 0), 0)} rows')
+        self.stdout.write(f'{partitioning.DEFAULT_PARTITION:<36}default  ~{max(estimates.get(partitioning.DEFAULT_PARTITION, 0), 0)} rows')
+        for name in partitioning.detached_partitions(cursor):
+            self.stdout.write(f'{name:<36}detached')
@@ -0,0 +1,51 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from students.importer import CHUNK_SIZE, KINDS, ImportFileError
+
+
+class Command(BaseCommand):
+    help = 'Import students, enrollments or grades from a CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(KINDS))
+        parser.add_argument('path', help="CSV file with a header row, or '-' for stdin.")
+        parser.add_argument('--dry-run', action='store_true', help='Validate every row without writing anything.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--hash-workers', type=int, help='Password hashing processes (students only).')
+
+    def handle(self, *args, **options):
+        importer = KINDS[options['kind']](
+            dry_run=options['dry_run'],
+            chunk_size=options['chunk_size'],
+            hash_workers=options['hash_workers'],
+            progress=self.progress,
+        )
+        try:
+            if options['path'] == '-':
+                report = importer.run(sys.stdin)
+            else:
+                with open(options['path'], newline='', encoding='utf-8-sig') as fh:
+                    report = importer.run(fh)
+        except (OSError, ImportFileError) as exc:
+            raise CommandError(exc)
+
+        for error in report['errors']:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        if report['invalid'] > len(report['errors']):
+            self.stderr.write(f"... and {report['invalid'] - len(report['errors'])} more invalid rows.")
+        summary = {key: value for key, value in report.items() if key != 'errors'}
+        self.stdout.write(json.dumps(summary))
+        if report['invalid']:
+            self.stdout.write(self.style.WARNING(f"{report['invalid']} rows were not imported."))
+        else:
+            self.stdout.write(self.style.SUCCESS('Imported every row.' if not report['dry_run'] else 'Every row is valid.'))
+
+    def progress(self, report):
+        self.stdout.write(
+            f"{report['rows']} rows read, {report['created']} created, {report['updated']} updated, "
+            f"{report['skipped']} skipped, {report['invalid']} invalid ({report['seconds']}s)",
+            ending='\r' if self.stdout.isatty() else '\n',
+        )
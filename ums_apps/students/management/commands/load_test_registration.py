@@ -0,0 +1,147 @@
+import datetime
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test import override_settings
+from django.test.utils import setup_test_environment
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from accounts.models import CustomUser
+from academics.models import Department, Program, Course
+from analytics.management.commands.benchmark_api import percentile
+from students import registration
+from students.models import Student, Enrollment
+
+
+class Command(BaseCommand):
+    help = (
+        'Open a throwaway course with a few seats, have N parallel clients POST enrollments for it '
+        'at once (each more than once), and check that it is neither overbooked nor double-booked. '
+        'Run it against PostgreSQL: SQLite serialises every write.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=100)
+        parser.add_argument('--capacity', type=int, default=25)
+        parser.add_argument('--repeats', type=int, default=2, help='POSTs per client.')
+        parser.add_argument('--queue', action='store_true', help='Go through the registration queue.')
+        parser.add_argument('--workers', type=int, default=2, help='Queue workers, with --queue.')
+        parser.add_argument('--keep', action='store_true', help='Keep the course, students and enrollments.')
+
+    def handle(self, *args, **options):
+        if options['clients'] < 1 or options['repeats'] < 1:
+            raise CommandError('--clients and --repeats must be at least 1.')
+        setup_test_environment()
+        tag = uuid.uuid4().hex[:8]
+        admin = CustomUser.objects.create_superuser(f'loadtest-{tag}-admin', password=None, user_type='admin')
+        department = Department.objects.create(name=f'Load test {tag}')
+        program = Program.objects.create(name=f'Load test {tag}', department=department)
+        course = Course.objects.create(name=f'Load test {tag}', code=tag, program=program, capacity=options['capacity'])
+        students = []
+        for n in range(options['clients']):
+            user = CustomUser.objects.create_user(f'loadtest-{tag}-{n}', password=None, user_type='student')
+            students.append(Student.objects.create(
+                user=user, department=department, program=program, enrollment_date=datetime.date.today(),
+            ))
+
+        # The per-user rate limits would reject the burst; measure registration.
+        check_throttles = APIView.check_throttles
+        APIView.check_throttles = lambda self, request: None
+        try:
+            with override_settings(REGISTRATION_QUEUE=options['queue']):
+                statuses, timings, elapsed, processed = self.run(admin, course, students, options)
+        finally:
+            APIView.check_throttles = check_throttles
+
+        course.refresh_from_db()
+        enrolled = Enrollment.objects.filter(course=course)
+        count = enrolled.count()
+        problems = []
+        if count > options['capacity']:
+            problems.append(f'overbooked: {count} enrollments for {options["capacity"]} seats')
+        if enrolled.values('student').distinct().count() != count:
+            problems.append('a student is enrolled twice')
+        if course.enrolled_count != count:
+            problems.append(f'enrolled_count is {course.enrolled_count} for {count} enrollments')
+        if count < min(options['capacity'], options['clients']):
+            problems.append(f'only {count} of the seats were filled')
+
+        timings.sort()
+        requests = options['clients'] * options['repeats']
+        self.stdout.write(f"{requests} POSTs from {options['clients']} clients in {elapsed:.2f}s "
+                          f"({requests / elapsed:.0f}/s) on {connection.vendor}"
+                          + (f", {options['workers']} queue workers" if options['queue'] else ''))
+        self.stdout.write('Responses: ' + ', '.join(f'{code}: {n}' for code, n in sorted(statuses.items())))
+        self.stdout.write(f'Latency ms: p50 {percentile(timings, 50):.1f}, p95 {percentile(timings, 95):.1f}, '
+                          f'max {timings[-1]:.1f}')
+        if options['queue']:
+            self.stdout.write(f"Queue: admitted {processed['admitted']}, rejected {processed['rejected']}, "
+                              f"batches retried {processed['retried']}")
+        self.stdout.write(f"Seats: {count} of {options['capacity']} taken")
+
+        if not options['keep']:
+            # Cascades to the students, enrollments and registration requests.
+            CustomUser.objects.filter(username__startswith=f'loadtest-{tag}-').delete()
+            department.delete()
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('No overbooking.'))
+
+    def run(self, admin, course, students, options):
+        start = threading.Barrier(len(students))
+        done = threading.Event()
+        timings = []
+        statuses = Counter()
+        processed = Counter()
+        lock = threading.Lock()
+
+        def client(student):
+            api = APIClient()
+            api.force_authenticate(admin)
+            api.raise_request_exception = False
+            try:
+                start.wait()
+                for _ in range(options['repeats']):
+                    started = time.perf_counter()
+                    response = api.post('/api/students/enrollments/', {'student': student.pk, 'course': course.pk}, format='json')
+                    with lock:
+                        timings.append((time.perf_counter() - started) * 1000)
+                        statuses[response.status_code] += 1
+            finally:
+                connection.close()
+
+        def worker():
+            try:
+                while True:
+                    finished = done.is_set()
+                    try:
+                        counts = registration.process()
+                    except OperationalError:
+                        # A lock timeout rolls the whole batch back; take it again.
+                        counts = {'retried': 1}
+                    with lock:
+                        processed.update(counts)
+                    if not counts.get('admitted') and not counts.get('rejected') and not counts.get('retried'):
+                        if finished:
+                            return
+                        time.sleep(0.01)
+            finally:
+                connection.close()
+
+        workers = options['workers'] if options['queue'] else 0
+        with ThreadPoolExecutor(max_workers=len(students) + workers) as pool:
+            queue = [pool.submit(worker) for _ in range(workers)]
+            started = time.perf_counter()
+            for future in [pool.submit(client, student) for student in students]:
+                future.result()
+            done.set()
+            for future in queue:
+                future.result()
+            elapsed = time.perf_counter() - started
+        return statuses, timings, elapsed, processed
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections
+
+from students import registration
+
+
+class Command(BaseCommand):
+    help = (
+        'Admit or reject queued registration requests in batches, first come first served. '
+        'Run it through the registration window when REGISTRATION_QUEUE is on; several can run at once on PostgreSQL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Requests per batch. Default: REGISTRATION_BATCH_SIZE.')
+        parser.add_argument(
+            '--interval', type=float, metavar='SECONDS',
+            help='Keep polling the queue this often once it is empty, until interrupted.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                totals = registration.drain(options['batch_size'])
+            except OperationalError as exc:
+                # A lock timeout rolls the batch back; it is retried next poll.
+                if options['interval'] is None:
+                    raise
+                self.stderr.write(f'Batch failed, retrying: {exc}')
+                totals = {}
+            if any(totals.values()):
+                self.stdout.write(f"Admitted {totals['admitted']}, rejected {totals['rejected']}.")
+            if options['interval'] is None:
+                break
+            close_old_connections()
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                break
+        self.stdout.write(self.style.SUCCESS('The registration queue is empty.'))
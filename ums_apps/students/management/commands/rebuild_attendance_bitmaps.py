@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from academics.models import Term
+from students import bitmaps
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the attendance bitmaps from the Attendance table. Marks of archived '
+        'partitions are kept from the stored bitmaps, and --verify checks only the attached ones.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', type=int, action='append', help='Term id; repeat for several. Default: all.')
+        parser.add_argument('--verify', action='store_true', help='Only count the bitmaps that differ from the marks.')
+
+    def handle(self, *args, **options):
+        terms = Term.objects.order_by('start_date')
+        if options['term']:
+            terms = terms.filter(pk__in=options['term'])
+            missing = set(options['term']) - set(terms.values_list('pk', flat=True))
+            if missing:
+                raise CommandError(f"Unknown terms: {', '.join(map(str, sorted(missing)))}.")
+        if options['verify']:
+            drifted = bitmaps.drifted(terms)
+            style = self.style.SUCCESS if not drifted else self.style.WARNING
+            self.stdout.write(style(f'{drifted} attendance bitmaps differ from the marks.'))
+            return
+        count = bitmaps.rebuild(terms)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} attendance bitmaps.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from students.attendance import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-(student, course) attendance counters from the Attendance table.'
+
+    def handle(self, *args, **options):
+        count = rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} attendance counters.'))
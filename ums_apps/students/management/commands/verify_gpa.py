@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from students.gpa import drifted, recompute
+
+
+class Command(BaseCommand):
+    help = 'Check the stored Student GPA columns against the Grade table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Recompute the students that drifted.')
+        parser.add_argument('--all', action='store_true', help='With --fix, recompute every student.')
+
+    def handle(self, *args, **options):
+        if options['fix'] and options['all']:
+            count = recompute()
+            self.stdout.write(self.style.SUCCESS(f'Recomputed GPA for {count} students.'))
+            return
+
+        drift = list(drifted().values('id', 'grade_sum', 'grade_count', 'actual_sum', 'actual_count'))
+        for row in drift[:20]:
+            self.stdout.write(
+                f"student {row['id']}: stored {row['grade_sum']}/{row['grade_count']}, "
+                f"actual {row['actual_sum']}/{row['actual_count']}"
+            )
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('No GPA drift.'))
+            return
+        if options['fix']:
+            count = recompute(drifted())
+            self.stdout.write(self.style.SUCCESS(f'Recomputed GPA for {count} students.'))
+            return
+        raise CommandError(f'{len(drift)} students have drifted GPA columns; rerun with --fix.')
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def count_existing_attendance(apps, schema_editor):
+    Attendance = apps.get_model('students', 'Attendance')
+    AttendanceCounter = apps.get_model('students', 'AttendanceCounter')
+    rows = Attendance.objects.values('student_id', 'course_id').annotate(
+        present=Count('id', filter=Q(status='present')),
+        absent=Count('id', filter=Q(status='absent')),
+        total=Count('id'),
+    ).order_by()
+    AttendanceCounter.objects.bulk_create(
+        (
+            AttendanceCounter(
+                student_id=row['student_id'],
+                course_id=row['course_id'],
+                present_count=row['present'],
+                absent_count=row['absent'],
+                total_count=row['total'],
+                attendance_percentage=row['present'] * 100.0 / row['total'],
+            )
+            for row in rows.iterator(chunk_size=5000)
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0002_initial'),
+        ('students', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('present_count', models.IntegerField(default=0)),
+                ('absent_count', models.IntegerField(default=0)),
+                ('total_count', models.IntegerField(default=0)),
+                ('attendance_percentage', models.FloatField(null=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='academics.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='students.student')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('student', 'course'), name='unique_attendance_counter')],
+            },
+        ),
+        migrations.RunPython(count_existing_attendance, migrations.RunPython.noop),
+    ]
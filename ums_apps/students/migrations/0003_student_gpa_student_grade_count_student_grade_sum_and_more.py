@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:31
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_gpa(apps, schema_editor):
+    Student = apps.get_model('students', 'Student')
+    Grade = apps.get_model('students', 'Grade')
+    rows = Grade.objects.values('student_id').annotate(total=Sum('grade'), count=Count('id')).order_by()
+    students = [
+        Student(id=row['student_id'], grade_sum=row['total'], grade_count=row['count'], gpa=row['total'] / row['count'])
+        for row in rows.iterator(chunk_size=5000)
+    ]
+    Student.objects.bulk_update(students, ['grade_sum', 'grade_count', 'gpa'], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0002_initial'),
+        ('students', '0002_attendancecounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='gpa',
+            field=models.FloatField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='grade_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='grade_sum',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['program', 'gpa'], name='student_program_gpa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['department', 'gpa'], name='student_department_gpa_idx'),
+        ),
+        migrations.RunPython(fill_gpa, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:44
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def remove_duplicate_marks(apps, schema_editor):
+    # Keeps the latest mark of each (student, course, date) and recounts the
+    # counters of the pairs that had duplicates.
+    Attendance = apps.get_model('students', 'Attendance')
+    AttendanceCounter = apps.get_model('students', 'AttendanceCounter')
+    duplicates = (
+        Attendance.objects.values('student_id', 'course_id', 'date')
+        .annotate(marks=Count('id'), keep=Max('id'))
+        .filter(marks__gt=1)
+        .order_by()
+    )
+    pairs = set()
+    for row in list(duplicates):
+        Attendance.objects.filter(
+            student_id=row['student_id'], course_id=row['course_id'], date=row['date']
+        ).exclude(pk=row['keep']).delete()
+        pairs.add((row['student_id'], row['course_id']))
+    for student_id, course_id in pairs:
+        counts = Attendance.objects.filter(student_id=student_id, course_id=course_id).aggregate(
+            present=Count('id', filter=Q(status='present')), total=Count('id'),
+        )
+        AttendanceCounter.objects.filter(student_id=student_id, course_id=course_id).update(
+            present_count=counts['present'],
+            absent_count=counts['total'] - counts['present'],
+            total_count=counts['total'],
+            attendance_percentage=counts['present'] * 100.0 / counts['total'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0002_initial'),
+        ('students', '0003_student_gpa_student_grade_count_student_grade_sum_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_marks, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.UniqueConstraint(fields=('student', 'course', 'date'), name='unique_attendance_mark'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+from students.partitioning import partition_table, unpartition_table
+
+
+def partition_attendance(apps, schema_editor):
+    # PostgreSQL only; other databases keep a plain table. Copies every row,
+    # so on a large table run it in a maintenance window.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        partition_table(cursor)
+
+
+def unpartition_attendance(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        unpartition_table(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0005_attendance_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_attendance, unpartition_attendance),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0003_term'),
+        ('students', '0006_partition_attendance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceBitmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('marked', models.BinaryField(default=b'')),
+                ('present', models.BinaryField(default=b'')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='academics.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='students.student')),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='academics.term')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('student', 'course', 'term'), name='unique_attendance_bitmap')],
+            },
+        ),
+    ]
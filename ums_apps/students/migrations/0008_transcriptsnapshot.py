@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0007_attendancebitmap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptSnapshot',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='transcript_snapshot', serialize=False, to='students.student')),
+                ('data', models.JSONField(null=True)),
+                ('version', models.IntegerField(default=0)),
+                ('built_version', models.IntegerField(null=True)),
+                ('built_at', models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Min, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_enrollments(apps, schema_editor):
+    # Keeps the first enrollment of each (student, course). The deletes send
+    # no signals, so what is derived from enrollments is brought up to date
+    # here: the course rollups' enrollment counts and the transcript snapshots
+    # of the students concerned. Cached analytics are dropped after the migrate
+    # (analytics.signals.invalidate_cache_after_migrate). Grades, and so GPAs,
+    # don't depend on enrollments.
+    Enrollment = apps.get_model('students', 'Enrollment')
+    TranscriptSnapshot = apps.get_model('students', 'TranscriptSnapshot')
+    CourseRollup = apps.get_model('analytics', 'CourseRollup')
+    duplicates = (
+        Enrollment.objects.values('student_id', 'course_id')
+        .annotate(enrollments=Count('id'), keep=Min('id'))
+        .filter(enrollments__gt=1)
+        .order_by()
+    )
+    students, courses = set(), set()
+    for row in list(duplicates):
+        Enrollment.objects.filter(
+            student_id=row['student_id'], course_id=row['course_id']
+        ).exclude(pk=row['keep']).delete()
+        students.add(row['student_id'])
+        courses.add(row['course_id'])
+    if not courses:
+        return
+
+    TranscriptSnapshot.objects.filter(student_id__in=students).update(version=F('version') + 1)
+    counts = Enrollment.objects.filter(course=OuterRef('course')).order_by().values('course') \
+        .annotate(n=Count('pk')).values('n')
+    CourseRollup.objects.filter(course_id__in=courses).update(enrollment_count=Coalesce(Subquery(counts), Value(0)))
+
+
+def count_seats(apps, schema_editor):
+    Course = apps.get_model('academics', 'Course')
+    Enrollment = apps.get_model('students', 'Enrollment')
+    counts = Enrollment.objects.filter(course=OuterRef('pk')).order_by().values('course') \
+        .annotate(n=Count('pk')).values('n')
+    Course.objects.update(enrolled_count=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_course_capacity'),
+        ('analytics', '0003_resync_attendance_rollups'),
+        ('students', '0008_transcriptsnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_enrollments, migrations.RunPython.noop),
+        migrations.RunPython(count_seats, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='RegistrationRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('admitted', 'admitted'), ('rejected', 'rejected')], default='pending', max_length=10)),
+                ('reason', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='enrollment',
+            constraint=models.UniqueConstraint(fields=('student', 'course'), name='unique_enrollment'),
+        ),
+        migrations.AddField(
+            model_name='registrationrequest',
+            name='course',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='academics.course'),
+        ),
+        migrations.AddField(
+            model_name='registrationrequest',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='students.student'),
+        ),
+        migrations.AddIndex(
+            model_name='registrationrequest',
+            index=models.Index(fields=['status', 'id'], name='registration_queue_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='registrationrequest',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('student', 'course'), name='unique_pending_registration'),
+        ),
+    ]
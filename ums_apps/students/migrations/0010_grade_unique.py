@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:16
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_grades(apps, schema_editor):
+    # Keeps the latest grade of each (student, course), the one the gradebook
+    # and the importer updated. The deletes send no signals, so the students'
+    # GPAs, their transcript snapshots and the program, course and grade
+    # rollups are brought up to date here; cached analytics are dropped after
+    # the migrate (analytics.signals.invalidate_cache_after_migrate).
+    Grade = apps.get_model('students', 'Grade')
+    Student = apps.get_model('students', 'Student')
+    TranscriptSnapshot = apps.get_model('students', 'TranscriptSnapshot')
+    ProgramRollup = apps.get_model('analytics', 'ProgramRollup')
+    CourseRollup = apps.get_model('analytics', 'CourseRollup')
+    GradeRollup = apps.get_model('analytics', 'GradeRollup')
+    duplicates = (
+        Grade.objects.values('student_id', 'course_id')
+        .annotate(grades=Count('id'), keep=Max('id'))
+        .filter(grades__gt=1)
+        .order_by()
+    )
+    students, courses, removed = set(), set(), Counter()
+    for row in list(duplicates):
+        extra = Grade.objects.filter(student_id=row['student_id'], course_id=row['course_id']).exclude(pk=row['keep'])
+        removed.update(extra.values_list('grade', flat=True))
+        extra.delete()
+        students.add(row['student_id'])
+        courses.add(row['course_id'])
+    if not students:
+        return
+
+    totals = Grade.objects.filter(student=OuterRef('pk')).order_by().values('student').annotate(
+        total=Sum('grade'), n=Count('pk'),
+    )
+    Student.objects.filter(pk__in=students).update(
+        grade_sum=Coalesce(Subquery(totals.values('total')), Value(0.0)),
+        grade_count=Coalesce(Subquery(totals.values('n')), Value(0)),
+    )
+    Student.objects.filter(pk__in=students).update(gpa=F('grade_sum') / F('grade_count'))
+    TranscriptSnapshot.objects.filter(student_id__in=students).update(version=F('version') + 1)
+
+    programs = set(Student.objects.filter(pk__in=students).exclude(program=None).values_list('program_id', flat=True))
+    by_program = Grade.objects.filter(student__program=OuterRef('program')).order_by().values('student__program') \
+        .annotate(total=Sum('grade'), n=Count('pk'))
+    ProgramRollup.objects.filter(program_id__in=programs).update(
+        grade_sum=Coalesce(Subquery(by_program.values('total')), Value(0.0)),
+        grade_count=Coalesce(Subquery(by_program.values('n')), Value(0)),
+    )
+    by_course = Grade.objects.filter(course=OuterRef('course')).order_by().values('course') \
+        .annotate(total=Sum('grade'), n=Count('pk'))
+    CourseRollup.objects.filter(course_id__in=courses).update(
+        grade_sum=Coalesce(Subquery(by_course.values('total')), Value(0.0)),
+        grade_count=Coalesce(Subquery(by_course.values('n')), Value(0)),
+    )
+    for grade, count in removed.items():
+        GradeRollup.objects.filter(grade=grade).update(count=F('count') - count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_course_capacity'),
+        ('analytics', '0003_resync_attendance_rollups'),
+        ('students', '0009_registration'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_grades, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='grade',
+            constraint=models.UniqueConstraint(fields=('student', 'course'), name='unique_grade'),
+        ),
+    ]
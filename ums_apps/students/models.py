@@ -1,35 +1,205 @@
-from django.db import models
+from django.db import models, router, transaction
+
+class TrackedModel(models.Model):
+    # Gives signal handlers the row as it was stored before a save, so they
+    # can compute deltas on update. The row is re-read under a row lock in the
+    # save's transaction: two concurrent updates of one row then each see what
+    # the other wrote, instead of both retracting the same old values.
+    class Meta:
+        abstract = True
+
+    def _stored_values(self, using):
+        if self.pk is None:
+            return None
+        attnames = [f.attname for f in self._meta.concrete_fields]
+        return type(self)._base_manager.using(using).select_for_update().filter(pk=self.pk).values(*attnames).first()
+
+    def save(self, *args, **kwargs):
+        # The write and everything its signal handlers derive from it
+        # (counters, rollups) commit or roll back together.
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            # `_previous` is None for inserts, otherwise the row as it was before this save.
+            self._previous = self._stored_values(using)
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            # The delete handlers retract what is stored, not what this
+            # instance was loaded with.
+            stored = self._stored_values(using)
+            if stored is not None:
+                for attname, value in stored.items():
+                    setattr(self, attname, value)
+            return super().delete(*args, **kwargs)
+
+    def current_values(self):
+        return {f.attname: getattr(self, f.attname) for f in self._meta.concrete_fields}
+
+class Student(TrackedModel):
+    # Maintained from Grade writes by students.gpa; never written through save().
+    GPA_FIELDS = ('grade_sum', 'grade_count', 'gpa')
 
-class Student(models.Model):
     user = models.OneToOneField('accounts.CustomUser', on_delete=models.CASCADE)
     department = models.ForeignKey('academics.Department', on_delete=models.SET_NULL, null=True)
     program = models.ForeignKey('academics.Program', on_delete=models.SET_NULL, null=True)
     enrollment_date = models.DateField()
+    grade_sum = models.FloatField(default=0, editable=False)
+    grade_count = models.IntegerField(default=0, editable=False)
+    gpa = models.FloatField(null=True, editable=False, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['program', 'gpa'], name='student_program_gpa_idx'),
+            models.Index(fields=['department', 'gpa'], name='student_department_gpa_idx'),
+        ]
 
     def __str__(self):
         return self.user.username
 
-class Enrollment(models.Model):
+    def save(self, *args, **kwargs):
+        # An instance loaded before a grade changed holds stale GPA columns;
+        # updating it must not write them back.
+        if self.pk is not None and not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.GPA_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+class Enrollment(TrackedModel):
     student = models.ForeignKey('students.Student', on_delete=models.CASCADE)
     course = models.ForeignKey('academics.Course', on_delete=models.CASCADE)
     enrolled_on = models.DateField(auto_now_add=True)
 
-class Withdrawal(models.Model):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'course'], name='unique_enrollment'),
+        ]
+
+class Withdrawal(TrackedModel):
     student = models.ForeignKey('students.Student', on_delete=models.CASCADE)
     course = models.ForeignKey('academics.Course', on_delete=models.CASCADE)
     reason = models.TextField()
     date = models.DateField(auto_now_add=True)
 
-class Grade(models.Model):
+class Grade(TrackedModel):
     student = models.ForeignKey('students.Student', on_delete=models.CASCADE)
     course = models.ForeignKey('academics.Course', on_delete=models.CASCADE)
     grade = models.FloatField()
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'course'], name='unique_grade'),
+        ]
+
     def __str__(self):
         return f"{self.student} - {self.course} - {self.grade}"
 
-class Attendance(models.Model):
+class Attendance(TrackedModel):
     student = models.ForeignKey('students.Student', on_delete=models.CASCADE)
     course = models.ForeignKey('academics.Course', on_delete=models.CASCADE)
     date = models.DateField()
     status = models.CharField(max_length=10, choices=[('present', 'Present'), ('absent', 'Absent')])
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'course', 'date'], name='unique_attendance_mark'),
+        ]
+        indexes = [
+            # The keyset ordering of the attendance list.
+            models.Index(fields=['date', 'id'], name='attendance_date_id_idx'),
+        ]
+
+    def _lock_course(self, using):
+        # Roll-calls (students/rollcall.py) read a session's marks under the
+        # course row's lock; single writes take it too, so a roll-call never
+        # misses a mark being written beside it and counts it a second time.
+        course = self._meta.get_field('course').related_model
+        list(course._base_manager.using(using).select_for_update().filter(pk=self.course_id).values_list('pk'))
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            self._lock_course(using)
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            self._lock_course(using)
+            return super().delete(*args, **kwargs)
+
+class AttendanceCounter(models.Model):
+    # Running present/absent totals per (student, course), maintained from
+    # Attendance writes by students.signals.
+    student = models.ForeignKey('students.Student', on_delete=models.CASCADE)
+    course = models.ForeignKey('academics.Course', on_delete=models.CASCADE)
+    present_count = models.IntegerField(default=0)
+    absent_count = models.IntegerField(default=0)
+    total_count = models.IntegerField(default=0)
+    attendance_percentage = models.FloatField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'course'], name='unique_attendance_counter'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.course} - {self.present_count}/{self.total_count}"
+
+class AttendanceBitmap(models.Model):
+    # The marks of one student in one course over a term, one bit per
+    # scheduled session: bit n of `marked` and `present` is the n-th session
+    # date of the course's timetable in the term (students/bitmaps.py).
+    student = models.ForeignKey('students.Student', on_delete=models.CASCADE)
+    course = models.ForeignKey('academics.Course', on_delete=models.CASCADE)
+    term = models.ForeignKey('academics.Term', on_delete=models.CASCADE)
+    marked = models.BinaryField(default=b'')
+    present = models.BinaryField(default=b'')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'course', 'term'], name='unique_attendance_bitmap'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.course} - {self.term}"
+
+class TranscriptSnapshot(models.Model):
+    # Built transcript of a student, maintained by students.transcripts:
+    # writes bump `version`, and the data is current while `built_version`
+    # matches it.
+    student = models.OneToOneField('students.Student', on_delete=models.CASCADE, primary_key=True, related_name='transcript_snapshot')
+    data = models.JSONField(null=True)
+    version = models.IntegerField(default=0)
+    built_version = models.IntegerField(null=True)
+    built_at = models.DateTimeField(null=True)
+
+class RegistrationRequest(models.Model):
+    # A queued enrollment, admitted or rejected in batches by
+    # students.registration when REGISTRATION_QUEUE is on.
+    STATUSES = (
+        ('pending', 'pending'),
+        ('admitted', 'admitted'),
+        ('rejected', 'rejected'),
+    )
+    student = models.ForeignKey('students.Student', on_delete=models.CASCADE)
+    course = models.ForeignKey('academics.Course', on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending')
+    reason = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # One request per student and course waits at a time.
+            models.UniqueConstraint(
+                fields=['student', 'course'], condition=models.Q(status='pending'),
+                name='unique_pending_registration',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'id'], name='registration_queue_idx'),
+        ]
@@ -0,0 +1,194 @@
+import datetime
+import re
+
+# PostgreSQL range partitioning of students_attendance by month of `date`.
+# The migration rebuilds the table as a partitioned one with a partition per
+# month holding data, a few months ahead, and a default partition that catches
+# anything else. The attendance_partitions command keeps partitions created
+# ahead of time and detaches or archives closed months. A query filtered on
+# date only scans the months it covers.
+#
+# A detached month is archived: its marks leave the attendance counters and
+# the course rollups as it is detached, so they match a rebuild from the
+# attached rows. It also loses its foreign keys, so a student or course it
+# mentions can still be deleted. GPAs don't read attendance.
+#
+# PostgreSQL requires every unique constraint of a partitioned table to
+# include the partition key, so the primary key is (id, date); ids still come
+# from one sequence.
+
+TABLE = 'students_attendance'
+DEFAULT_PARTITION = f'{TABLE}_default'
+PARTITION_NAME = re.compile(rf'^{TABLE}_p(\d{{4}})_(\d{{2}})$')
+BOUND = re.compile(r"FROM \('([\d-]+)'\) TO \('([\d-]+)'\)")
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+
+
+def partition_name(start):
+    return f'{TABLE}_p{start:%Y_%m}'
+
+
+def is_partitioned(cursor):
+    cursor.execute('SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass', [TABLE])
+    return cursor.fetchone() is not None
+
+
+def partitions(cursor):
+    # [(name, start, end)] of the attached monthly partitions, oldest first.
+    cursor.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+    """, [TABLE])
+    attached = []
+    for name, bound in cursor.fetchall():
+        match = BOUND.search(bound)
+        if match:
+            attached.append((name, *map(datetime.date.fromisoformat, match.groups())))
+    return sorted(attached, key=lambda partition: partition[1])
+
+
+def detached_partitions(cursor):
+    attached = {name for name, start, end in partitions(cursor)}
+    cursor.execute(
+        "SELECT relname FROM pg_class WHERE relkind = 'r' AND relname LIKE %s",
+        [f'{TABLE}\\_p%'],
+    )
+    return sorted(name for name, in cursor.fetchall() if PARTITION_NAME.match(name) and name not in attached)
+
+
+def create_partition(cursor, start):
+    # Rows for the month that landed in the default partition move into the
+    # new one, since PostgreSQL refuses to attach a range the default holds.
+    start, end, name = month_start(start), next_month(start), partition_name(start)
+    cursor.execute(f'CREATE TABLE {name} (LIKE {TABLE} INCLUDING CONSTRAINTS)')
+    cursor.execute(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE date >= %s AND date < %s RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """, [start, end])
+    cursor.execute(
+        f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{start}') TO ('{end}')"
+    )
+    return name
+
+
+def detach_partition(cursor, name):
+    cursor.execute(f'ALTER TABLE {TABLE} DETACH PARTITION {name}')
+    # The partition keeps copies of the parent's foreign keys once detached.
+    cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'", [name])
+    for constraint, in cursor.fetchall():
+        cursor.execute(f'ALTER TABLE {name} DROP CONSTRAINT "{constraint}"')
+
+
+def mark_counts(cursor, name):
+    # {(student_id, course_id): (present, absent)} of a partition's marks.
+    cursor.execute(f"""
+        SELECT student_id, course_id, count(*) FILTER (WHERE status = 'present'),
+            count(*) FILTER (WHERE status <> 'present')
+        FROM {name} GROUP BY student_id, course_id
+    """)
+    return {(student_id, course_id): (present, absent) for student_id, course_id, present, absent in cursor.fetchall()}
+
+
+def copy_out(cursor, table, fh):
+    sql = f'COPY {table} TO STDOUT WITH (FORMAT csv, HEADER)'
+    raw = cursor.cursor
+    if hasattr(raw, 'copy'):
+        # psycopg 3
+        with raw.copy(sql) as copy:
+            for data in copy:
+                fh.write(data)
+    else:
+        raw.copy_expert(sql, fh)
+
+
+def _definitions(cursor):
+    # The primary key, unique and foreign key constraints and the other
+    # indexes of the table, as SQL that recreates them on a table of that name.
+    cursor.execute("""
+        SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f')
+    """, [TABLE])
+    constraints = cursor.fetchall()
+    cursor.execute("""
+        SELECT c.relname, pg_get_indexdef(x.indexrelid)
+        FROM pg_index x JOIN pg_class c ON c.oid = x.indexrelid
+        WHERE x.indrelid = %s::regclass AND NOT EXISTS (
+            SELECT 1 FROM pg_constraint k WHERE k.conindid = x.indexrelid AND k.conrelid = x.indrelid
+        )
+    """, [TABLE])
+    # A partitioned table's own indexes are defined ON ONLY the parent.
+    indexes = [(name, sql.replace(' ON ONLY ', ' ON ')) for name, sql in cursor.fetchall()]
+    return constraints, indexes
+
+
+def _rebuild(cursor, partitioned, ahead=3):
+    constraints, indexes = _definitions(cursor)
+    old = f'{TABLE}_old'
+    cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {old}')
+    # Free the constraint and index names for the new table.
+    for name, kind, definition in constraints:
+        cursor.execute(f'ALTER TABLE {old} DROP CONSTRAINT {name}')
+    for name, definition in indexes:
+        cursor.execute(f'DROP INDEX {name}')
+
+    cursor.execute(
+        f'CREATE TABLE {TABLE} (LIKE {old} INCLUDING CONSTRAINTS)'
+        + (' PARTITION BY RANGE (date)' if partitioned else '')
+    )
+    if partitioned:
+        cursor.execute(f'SELECT min(date), max(date) FROM {old}')
+        first, last = cursor.fetchone()
+        today = datetime.date.today()
+        month = month_start(first or today)
+        last = max(last or today, today)
+        for _ in range(ahead):
+            last = next_month(last)
+        while month < last:
+            cursor.execute(
+                f"CREATE TABLE {partition_name(month)} PARTITION OF {TABLE} "
+                f"FOR VALUES FROM ('{month}') TO ('{next_month(month)}')"
+            )
+            month = next_month(month)
+        cursor.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT')
+    cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {old}')
+
+    for name, kind, definition in constraints:
+        if kind == 'p':
+            definition = 'PRIMARY KEY (id, date)' if partitioned else 'PRIMARY KEY (id)'
+        cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+    for name, definition in indexes:
+        cursor.execute(definition)
+    # Dropping the old table drops its id sequence (and its partitions) too.
+    cursor.execute(f'DROP TABLE {old}')
+
+    # Partitioned tables only take identity columns from PostgreSQL 17, so
+    # they get a plain sequence.
+    if partitioned:
+        cursor.execute(f'CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id')
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+    else:
+        cursor.execute(f'ALTER TABLE {TABLE} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY')
+    cursor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), coalesce(max(id), 0) + 1, false) FROM {TABLE}"
+    )
+
+
+def partition_table(cursor):
+    if not is_partitioned(cursor):
+        _rebuild(cursor, partitioned=True)
+
+
+def unpartition_table(cursor):
+    # Detached partitions are left as they are.
+    if is_partitioned(cursor):
+        _rebuild(cursor, partitioned=False)
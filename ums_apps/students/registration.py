@@ -0,0 +1,98 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from academics.models import Course
+from .models import Enrollment, RegistrationRequest
+from .signals import bulk_changed
+
+# Registration: a direct enrollment takes its seat as it is written (see
+# students.seats); with REGISTRATION_QUEUE on, requests are queued instead
+# and a worker (the process_registrations command) admits them in batches,
+# first come first served: one lock per course and one bulk insert per batch
+# however many students are waiting for it.
+
+
+class AlreadyEnrolled(Exception):
+    pass
+
+
+def queue_enabled():
+    return getattr(settings, 'REGISTRATION_QUEUE', False)
+
+
+def enroll(student_id, course_id):
+    # Raises CourseFull or AlreadyEnrolled.
+    try:
+        with transaction.atomic():
+            return Enrollment.objects.create(student_id=student_id, course_id=course_id)
+    except IntegrityError:
+        raise AlreadyEnrolled('The student is already enrolled in this course.')
+
+
+def request(student_id, course_id):
+    # Queues a registration; returns (request, created). While the student
+    # has one pending for the course, that one (or, once a worker got to it,
+    # its outcome) is returned instead.
+    try:
+        with transaction.atomic():
+            return RegistrationRequest.objects.create(student_id=student_id, course_id=course_id), True
+    except IntegrityError:
+        existing = RegistrationRequest.objects.filter(student_id=student_id, course_id=course_id).order_by('-id')
+        return existing.first(), False
+
+
+def process(batch_size=None):
+    # Admits or rejects the oldest pending requests; returns
+    # {'admitted': n, 'rejected': n}. Concurrent workers take disjoint batches
+    # where the database can skip locked rows.
+    batch_size = batch_size or settings.REGISTRATION_BATCH_SIZE
+    with transaction.atomic():
+        requests = list(
+            RegistrationRequest.objects.select_for_update(skip_locked=True)
+            .filter(status='pending').order_by('id')[:batch_size]
+        )
+        if not requests:
+            return {'admitted': 0, 'rejected': 0}
+        course_ids = sorted({r.course_id for r in requests})
+        free = {
+            pk: None if capacity is None else capacity - taken
+            for pk, capacity, taken in Course.objects.select_for_update().filter(pk__in=course_ids)
+            .order_by('pk').values_list('pk', 'capacity', 'enrolled_count')
+        }
+        enrolled = set(
+            Enrollment.objects.filter(student_id__in={r.student_id for r in requests}, course_id__in=course_ids)
+            .values_list('student_id', 'course_id')
+        )
+
+        admitted = []
+        now = timezone.now()
+        for registration in requests:
+            key = (registration.student_id, registration.course_id)
+            registration.processed_at = now
+            if key in enrolled:
+                registration.status, registration.reason = 'rejected', 'Already enrolled.'
+            elif free[registration.course_id] is not None and free[registration.course_id] <= 0:
+                registration.status, registration.reason = 'rejected', 'The course is full.'
+            else:
+                registration.status = 'admitted'
+                enrolled.add(key)
+                if free[registration.course_id] is not None:
+                    free[registration.course_id] -= 1
+                admitted.append(Enrollment(student_id=registration.student_id, course_id=registration.course_id))
+
+        enrollments = Enrollment.objects.bulk_create(admitted)
+        bulk_changed.send(sender=Enrollment, changes=[(None, e.current_values()) for e in enrollments])
+        RegistrationRequest.objects.bulk_update(requests, ['status', 'reason', 'processed_at'])
+    return {'admitted': len(admitted), 'rejected': len(requests) - len(admitted)}
+
+
+def drain(batch_size=None):
+    # Processes batches until the queue is empty; returns the totals.
+    totals = {'admitted': 0, 'rejected': 0}
+    while True:
+        counts = process(batch_size)
+        if not any(counts.values()):
+            return totals
+        for key, value in counts.items():
+            totals[key] += value
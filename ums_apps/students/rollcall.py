@@ -0,0 +1,47 @@
+from django.db import transaction
+
+from academics.models import Course
+from .models import Attendance
+from .signals import bulk_changed
+
+
+@transaction.atomic
+def save_roll_call(course_id, date, marks):
+    # Writes {student_id: status} for one class session in a single upsert on
+    # (student, course, date), so a session can be marked again. Roll-calls of
+    # the same course, and single Attendance writes (Attendance.save and
+    # delete), are serialised on the course row, so the marks read here are
+    # exactly the ones the upsert finds.
+    list(Course.objects.select_for_update().filter(pk=course_id).values_list('pk'))
+    existing = {
+        mark.student_id: mark for mark in Attendance.objects.filter(course_id=course_id, date=date)
+    }
+
+    created, changed, changes = [], [], []
+    for student_id, status in marks.items():
+        mark = existing.get(student_id)
+        if mark is None:
+            created.append(Attendance(student_id=student_id, course_id=course_id, date=date, status=status))
+        elif mark.status != status:
+            changed.append(Attendance(student_id=student_id, course_id=course_id, date=date, status=status))
+            changes.append((mark.current_values(), {**mark.current_values(), 'status': status}))
+
+    Attendance.objects.bulk_create(
+        created + changed,
+        update_conflicts=True,
+        unique_fields=['student', 'course', 'date'],
+        update_fields=['status'],
+        batch_size=1000,
+    )
+    changes.extend((None, mark.current_values()) for mark in created)
+    bulk_changed.send(sender=Attendance, changes=changes)
+    statuses = list(marks.values())
+    return {
+        'course': course_id,
+        'date': date,
+        'created': len(created),
+        'updated': len(changed),
+        'unchanged': len(marks) - len(created) - len(changed),
+        'present': statuses.count('present'),
+        'absent': statuses.count('absent'),
+    }
@@ -0,0 +1,71 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from academics.models import Course
+from .models import Enrollment
+
+# Course.enrolled_count counts the course's enrollments, kept from Enrollment
+# writes. A single enrollment takes its seat with one conditional UPDATE, so
+# concurrent registrations cannot fill a course past its capacity, and they
+# only hold the course row for that statement. Bulk writes only count: the
+# admission queue checks seats itself under the course lock, and imports are
+# an administrative override.
+
+
+class CourseFull(Exception):
+    pass
+
+
+def take_seat(course_id):
+    taken = Course.objects.filter(pk=course_id).filter(
+        Q(capacity__isnull=True) | Q(enrolled_count__lt=F('capacity'))
+    ).update(enrolled_count=F('enrolled_count') + 1)
+    if not taken:
+        raise CourseFull('The course is full.')
+
+
+def add_seats(deltas):
+    # {course_id: delta}, applied in course order so concurrent writers lock
+    # the rows in the same order.
+    for course_id, delta in sorted(deltas.items()):
+        if delta:
+            Course.objects.filter(pk=course_id).update(enrolled_count=F('enrolled_count') + delta)
+
+
+def enrollment_changed(old, new):
+    if old is not None and new is not None and old['course_id'] == new['course_id']:
+        return
+    with transaction.atomic():
+        if old is not None:
+            add_seats({old['course_id']: -1})
+        if new is not None:
+            take_seat(new['course_id'])
+
+
+def enrollments_changed(changes):
+    deltas = Counter()
+    for old, new in changes:
+        if old is not None:
+            deltas[old['course_id']] -= 1
+        if new is not None:
+            deltas[new['course_id']] += 1
+    with transaction.atomic():
+        add_seats(deltas)
+
+
+def recount(course_ids=None):
+    # Sets enrolled_count from the enrollments, for writes that skipped the
+    # signals. Returns the number of courses whose count was off.
+    courses = Course.objects.all()
+    if course_ids is not None:
+        courses = courses.filter(pk__in=course_ids)
+    counts = Enrollment.objects.filter(course=OuterRef('pk')).order_by().values('course') \
+        .annotate(n=Count('pk')).values('n')
+    expected = Coalesce(Subquery(counts), Value(0))
+    with transaction.atomic():
+        off = courses.annotate(expected=expected).exclude(enrolled_count=F('expected')).count()
+        courses.update(enrolled_count=expected)
+    return off
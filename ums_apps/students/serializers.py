@@ -1,27 +1,161 @@
+from django.db.models import Exists, OuterRef
 from rest_framework import serializers
-from .models import Student, Enrollment, Withdrawal, Grade, Attendance
+from expansion import ExpandableSerializerMixin
+from principal import get_principal
+from academics.models import Course
+from .models import Student, Enrollment, Withdrawal, Grade, Attendance, RegistrationRequest
+
+MAX_GRADEBOOK_ROWS = 5000
+
+
+def taught_courses(user, course_id):
+    courses = Course.objects.filter(pk=course_id)
+    principal = get_principal(user)
+    if principal.role == 'faculty' and principal.faculty_id is not None:
+        return courses.filter(faculty=principal.faculty_id)
+    elif principal.role in ('faculty', 'student'):
+        return courses.none()
+    return courses
+
+class StudentSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+    expandable = {
+        'user': 'accounts.serializers.CustomUserSerializer',
+        'department': 'academics.serializers.DepartmentSerializer',
+        'program': 'academics.serializers.ProgramSerializer',
+    }
 
-class StudentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Student
         fields = '__all__'
 
-class EnrollmentSerializer(serializers.ModelSerializer):
+class EnrollmentSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+    expandable = {
+        'student': 'students.serializers.StudentSerializer',
+        'course': 'academics.serializers.CourseSerializer',
+    }
+
     class Meta:
         model = Enrollment
         fields = '__all__'
 
-class WithdrawalSerializer(serializers.ModelSerializer):
+class RegistrationRequestSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+    expandable = {
+        'student': 'students.serializers.StudentSerializer',
+        'course': 'academics.serializers.CourseSerializer',
+    }
+
+    class Meta:
+        model = RegistrationRequest
+        fields = '__all__'
+        read_only_fields = ['status', 'reason', 'processed_at']
+
+class WithdrawalSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+    expandable = {
+        'student': 'students.serializers.StudentSerializer',
+        'course': 'academics.serializers.CourseSerializer',
+    }
+
     class Meta:
         model = Withdrawal
         fields = '__all__'
 
-class GradeSerializer(serializers.ModelSerializer):
+class GradeSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+    expandable = {
+        'student': 'students.serializers.StudentSerializer',
+        'course': 'academics.serializers.CourseSerializer',
+    }
+
     class Meta:
         model = Grade
         fields = '__all__'
 
-class AttendanceSerializer(serializers.ModelSerializer):
+class AttendanceSerializer(ExpandableSerializerMixin, serializers.ModelSerializer):
+    expandable = {
+        'student': 'students.serializers.StudentSerializer',
+        'course': 'academics.serializers.CourseSerializer',
+    }
+
     class Meta:
         model = Attendance
         fields = '__all__'
+
+class GradebookEntrySerializer(serializers.Serializer):
+    student = serializers.IntegerField()
+    grade = serializers.FloatField(min_value=0, max_value=100)
+
+class GradebookSerializer(serializers.Serializer):
+    # A course's whole gradebook. References are checked with one query for
+    # the course and one for all of the students; errors are reported per row.
+    course = serializers.IntegerField()
+    grades = GradebookEntrySerializer(many=True, allow_empty=False, max_length=MAX_GRADEBOOK_ROWS)
+
+    def validate_course(self, value):
+        if not taught_courses(self.context['request'].user, value).exists():
+            raise serializers.ValidationError('Unknown course.')
+        return value
+
+    def validate(self, attrs):
+        rows = attrs['grades']
+        enrolled = dict(
+            Student.objects.filter(pk__in={row['student'] for row in rows})
+            .annotate(enrolled=Exists(Enrollment.objects.filter(student=OuterRef('pk'), course_id=attrs['course'])))
+            .values_list('pk', 'enrolled')
+        )
+        # Keyed by row index, as DRF reports the rows' field errors.
+        errors = {}
+        seen = set()
+        for index, row in enumerate(rows):
+            student = row['student']
+            if student not in enrolled:
+                errors[index] = {'student': ['Unknown student.']}
+            elif not enrolled[student]:
+                errors[index] = {'student': ['Student is not enrolled in this course.']}
+            elif student in seen:
+                errors[index] = {'student': ['Student appears more than once.']}
+            seen.add(student)
+        if errors:
+            raise serializers.ValidationError({'grades': errors})
+        return attrs
+
+class RollCallSerializer(serializers.Serializer):
+    # One class session: either the absentees, or a status per student.
+    # Students on the roll who aren't listed are marked present.
+    course = serializers.IntegerField()
+    date = serializers.DateField()
+    absentees = serializers.ListField(child=serializers.IntegerField(), required=False)
+    statuses = serializers.DictField(
+        child=serializers.ChoiceField(choices=Attendance._meta.get_field('status').choices), required=False,
+    )
+
+    def validate_course(self, value):
+        if not taught_courses(self.context['request'].user, value).exists():
+            raise serializers.ValidationError('Unknown course.')
+        return value
+
+    def validate(self, attrs):
+        if ('absentees' in attrs) == ('statuses' in attrs):
+            raise serializers.ValidationError('Send either absentees or statuses.')
+        # The roll: students enrolled in the course who hadn't withdrawn by the session.
+        withdrawn = Withdrawal.objects.filter(
+            student=OuterRef('student_id'), course_id=attrs['course'], date__lte=attrs['date'],
+        )
+        roll = set(
+            Enrollment.objects.filter(course_id=attrs['course'])
+            .filter(~Exists(withdrawn))
+            .values_list('student_id', flat=True)
+        )
+
+        field = 'absentees' if 'absentees' in attrs else 'statuses'
+        if field == 'absentees':
+            listed = {student: 'absent' for student in attrs['absentees']}
+        else:
+            listed = {}
+            for key, status in attrs['statuses'].items():
+                listed[int(key) if str(key).isdigit() else key] = status
+        errors = {
+            student: ['Student is not on this course\'s roll.'] for student in listed if student not in roll
+        }
+        if errors:
+            raise serializers.ValidationError({field: errors})
+        attrs['marks'] = {**dict.fromkeys(roll, 'present'), **listed}
+        return attrs
@@ -0,0 +1,165 @@
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from academics.models import Department, Program, Course, Term, Timetable
+from accounts.models import CustomUser
+from .models import Student, Enrollment, Withdrawal, Attendance, Grade
+from . import attendance, bitmaps, gpa, seats, transcripts
+
+# Sent after bulk_create/bulk_update writes, which send no per-row signals,
+# with changes=[(old values or None, new values or None), ...].
+bulk_changed = Signal()
+
+
+@receiver(post_save, sender=Attendance)
+def count_attendance_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        attendance.attendance_changed(instance._previous, instance.current_values())
+
+
+@receiver(post_delete, sender=Attendance)
+def count_attendance_on_delete(sender, instance, **kwargs):
+    attendance.attendance_changed(instance.current_values(), None)
+
+
+@receiver(post_save, sender=Grade)
+def update_gpa_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        gpa.grade_changed(instance._previous, instance.current_values())
+
+
+@receiver(post_delete, sender=Grade)
+def update_gpa_on_delete(sender, instance, **kwargs):
+    gpa.grade_changed(instance.current_values(), None)
+
+
+@receiver(bulk_changed, sender=Grade)
+def update_gpa_in_bulk(sender, changes, **kwargs):
+    gpa.grades_changed(changes)
+
+
+@receiver(bulk_changed, sender=Attendance)
+def count_attendance_in_bulk(sender, changes, **kwargs):
+    attendance.attendances_changed(changes)
+
+
+@receiver(post_save, sender=Enrollment)
+def take_seat_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        seats.enrollment_changed(instance._previous, instance.current_values())
+
+
+@receiver(post_delete, sender=Enrollment)
+def free_seat_on_delete(sender, instance, **kwargs):
+    seats.enrollment_changed(instance.current_values(), None)
+
+
+@receiver(bulk_changed, sender=Enrollment)
+def count_seats_in_bulk(sender, changes, **kwargs):
+    seats.enrollments_changed(changes)
+
+
+@receiver(post_save, sender=Attendance)
+def update_bitmap_on_save(sender, instance, raw=False, **kwargs):
+    if not raw and bitmaps.enabled():
+        bitmaps.marks_changed([(instance._previous, instance.current_values())])
+
+
+@receiver(post_delete, sender=Attendance)
+def update_bitmap_on_delete(sender, instance, **kwargs):
+    if bitmaps.enabled():
+        bitmaps.marks_changed([(instance.current_values(), None)])
+
+
+@receiver(bulk_changed, sender=Attendance)
+def update_bitmaps_in_bulk(sender, changes, **kwargs):
+    if bitmaps.enabled():
+        bitmaps.marks_changed(changes)
+
+
+# Session numbers come from the timetable and the term dates; changing
+# either renumbers the sessions, so the affected bitmaps are rebuilt. The
+# numbering from before the change moves the archived marks across.
+@receiver(pre_save, sender=Timetable)
+@receiver(pre_delete, sender=Timetable)
+def remember_course_sessions(sender, instance, raw=False, **kwargs):
+    if not raw and bitmaps.enabled():
+        instance._old_sessions = bitmaps.Sessions([instance.course_id])
+
+
+@receiver(post_save, sender=Timetable)
+@receiver(post_delete, sender=Timetable)
+def rebuild_course_bitmaps(sender, instance, raw=False, **kwargs):
+    if not raw and bitmaps.enabled():
+        bitmaps.rebuild(course_ids=[instance.course_id], old_sessions=getattr(instance, '_old_sessions', None))
+
+
+@receiver(pre_save, sender=Term)
+def remember_term_dates(sender, instance, raw=False, **kwargs):
+    if not raw and bitmaps.enabled() and instance.pk is not None:
+        instance._old_term = Term.objects.filter(pk=instance.pk).first()
+
+
+@receiver(post_save, sender=Term)
+def rebuild_term_bitmaps(sender, instance, raw=False, **kwargs):
+    if not raw and bitmaps.enabled():
+        old_term = getattr(instance, '_old_term', None)
+        bitmaps.rebuild(terms=[instance], old_terms={instance.pk: old_term} if old_term else None)
+
+
+# Transcript snapshots go stale with the rows they are built from, and with
+# the names they show.
+def _student_ids(changes):
+    return {values.get('student_id') for pair in changes for values in pair if values is not None}
+
+
+def stale_transcript_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transcripts.invalidate(_student_ids([(instance._previous, instance.current_values())]))
+
+
+def stale_transcript_on_delete(sender, instance, **kwargs):
+    # The student may be going too, with a cascade delete.
+    transcripts.invalidate([instance.student_id], create=False)
+
+
+def stale_transcripts_in_bulk(sender, changes, **kwargs):
+    transcripts.invalidate(_student_ids(changes))
+
+
+for model in (Enrollment, Withdrawal, Grade):
+    post_save.connect(stale_transcript_on_save, sender=model, dispatch_uid=f'transcript_save_{model.__name__}')
+    post_delete.connect(stale_transcript_on_delete, sender=model, dispatch_uid=f'transcript_delete_{model.__name__}')
+    bulk_changed.connect(stale_transcripts_in_bulk, sender=model, dispatch_uid=f'transcript_bulk_{model.__name__}')
+
+
+@receiver(post_save, sender=Student)
+def stale_student_transcript(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        transcripts.invalidate([instance.pk])
+
+
+@receiver(post_save, sender=CustomUser)
+def stale_user_transcript(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Logins only write last_login.
+    if not raw and not created and set(update_fields or ()) != {'last_login'}:
+        transcripts.invalidate_where(Q(user=instance))
+
+
+@receiver(post_save, sender=Course)
+def stale_course_transcripts(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        transcripts.invalidate_course(instance.pk)
+
+
+@receiver(post_save, sender=Program)
+def stale_program_transcripts(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        transcripts.invalidate_where(Q(program=instance))
+
+
+@receiver(post_save, sender=Department)
+def stale_department_transcripts(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        transcripts.invalidate_where(Q(department=instance))
@@ -1,3 +1,265 @@
-from django.test import TestCase
+import datetime
+import io
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase
+
+import principal
+from accounts import throttling
+from accounts.models import CustomUser
+from academics.models import Department, Program, Course, Timetable
+from faculty.models import Faculty
+from scoping import RULES, scope
+from students.gradebook import upsert_grades
+from students.importer import KINDS, _copy
+from students import registration
+from students.models import Student, Enrollment, Grade, Attendance, AttendanceCounter, RegistrationRequest
+
+
+def isolate(test):
+    # Each test starts from empty caches, with principal versions and rate
+    # limits kept in this process rather than in the files the server uses.
+    caches['default'].clear()
+    principal.VERSIONS = principal.LocalVersions()
+    throttling.STORE = throttling.LocalStore()
+    test.addCleanup(setattr, principal, 'VERSIONS', None)
+    test.addCleanup(setattr, throttling, 'STORE', None)
+
+
+def new_student(username, program):
+    return Student.objects.create(
+        user=CustomUser.objects.create_user(username, user_type='student'),
+        department=program.department, program=program, enrollment_date=datetime.date(2024, 9, 1),
+    )
+
+
+def new_admin():
+    return CustomUser.objects.create_superuser('admin', 'admin@example.com', None, user_type='admin')
+
+
+class ScopingTests(TestCase):
+    # A course nobody teaches, with a student, enrollment, grade, attendance
+    # mark and timetable slot; and a faculty member without a department.
+    def setUp(self):
+        isolate(self)
+        department = Department.objects.create(name='Science')
+        program = Program.objects.create(name='Physics', department=department)
+        course = Course.objects.create(name='Optics', code='PHY200', program=program)
+        student = new_student('student', program)
+        Enrollment.objects.create(student=student, course=course)
+        Grade.objects.create(student=student, course=course, grade=70)
+        Attendance.objects.create(student=student, course=course, date=datetime.date(2024, 9, 2), status='present')
+        Timetable.objects.create(course=course, day='Monday', start_time='09:00', end_time='10:00')
+        Faculty.objects.create(user=CustomUser.objects.create_user('lecturer', user_type='faculty'))
+
+    def assertSeesNothing(self, user):
+        for model in RULES:
+            self.assertFalse(scope(model.objects.all(), user).exists(), model.__name__)
+
+    def test_faculty_without_profile_sees_nothing(self):
+        self.assertSeesNothing(CustomUser.objects.create_user('nobody', user_type='faculty'))
+
+    def test_student_without_profile_sees_nothing(self):
+        self.assertSeesNothing(CustomUser.objects.create_user('nobody', user_type='student'))
+
+    def test_faculty_does_not_see_unassigned_courses(self):
+        lecturer = CustomUser.objects.get(username='lecturer')
+        for model in RULES:
+            if model is not Faculty:
+                self.assertFalse(scope(model.objects.all(), lecturer).exists(), model.__name__)
+
+    def test_admin_sees_everything(self):
+        admin = new_admin()
+        self.assertEqual(scope(Course.objects.all(), admin).count(), 1)
+
+
+class GradeTests(TestCase):
+    def setUp(self):
+        isolate(self)
+        department = Department.objects.create(name='Science')
+        program = Program.objects.create(name='Physics', department=department)
+        self.course = Course.objects.create(name='Optics', code='PHY200', program=program)
+        self.student = new_student('student', program)
+        Enrollment.objects.create(student=self.student, course=self.course)
+        self.client.force_login(new_admin())
+
+    def test_grade_is_unique_per_student_and_course(self):
+        Grade.objects.create(student=self.student, course=self.course, grade=70)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Grade.objects.create(student=self.student, course=self.course, grade=80)
+
+    def test_create_then_upsert_keeps_one_grade(self):
+        response = self.client.post('/api/students/grades/', {
+            'student': self.student.pk, 'course': self.course.pk, 'grade': 70,
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(upsert_grades({(self.student.pk, self.course.pk): 85}), (0, 1))
+        self.assertEqual(list(Grade.objects.values_list('grade', flat=True)), [85])
+        self.student.refresh_from_db()
+        self.assertEqual((self.student.grade_count, self.student.gpa), (1, 85))
+
+    def test_posting_an_existing_grade_is_rejected(self):
+        Grade.objects.create(student=self.student, course=self.course, grade=70)
+        response = self.client.post('/api/students/grades/', {
+            'student': self.student.pk, 'course': self.course.pk, 'grade': 90,
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Grade.objects.get().grade, 70)
+
+    def test_import_updates_the_existing_grade(self):
+        Grade.objects.create(student=self.student, course=self.course, grade=70)
+        report = KINDS['grades']().run(io.StringIO('username,course,grade\nstudent,PHY200,95\n'))
+        self.assertEqual((report['created'], report['updated']), (0, 1))
+        self.assertEqual(list(Grade.objects.values_list('grade', flat=True)), [95])
+
+
+class CopyTests(SimpleTestCase):
+    # The psycopg2 COPY path writes what bulk_create would store.
+    def test_text_format_keeps_empty_strings_apart_from_nulls(self):
+        class Raw:
+            def copy_expert(self, sql, buffer):
+                self.sql, self.data = sql, buffer.read()
+
+        cursor = SimpleNamespace(cursor=Raw())
+        _copy(cursor, 'staging', ['a', 'b', 'c'], [('', None, 'tab\there'), ('back\\slash', 'line\nbreak', 1.5)])
+        self.assertEqual(cursor.cursor.sql, 'COPY staging (a, b, c) FROM STDIN')
+        self.assertEqual(cursor.cursor.data, '\t\\N\ttab\\there\nback\\\\slash\tline\\nbreak\t1.5\n')
+
+
+class SeatTests(TestCase):
+    def setUp(self):
+        isolate(self)
+        program = Program.objects.create(name='Physics', department=Department.objects.create(name='Science'))
+        self.course = Course.objects.create(name='Optics', code='PHY200', program=program, capacity=1)
+        self.students = [new_student(f'student{n}', program) for n in range(2)]
+        self.client.force_login(new_admin())
+
+    def enroll(self, student):
+        return self.client.post('/api/students/enrollments/', {'student': student.pk, 'course': self.course.pk})
+
+    def test_full_course_rejects_enrollment(self):
+        self.assertEqual(self.enroll(self.students[0]).status_code, 201)
+        response = self.enroll(self.students[1])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'course': ['The course is full.']})
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.enrolled_count, Enrollment.objects.count()), (1, 1))
+
+    def test_leaving_frees_the_seat(self):
+        self.enroll(self.students[0])
+        Enrollment.objects.get().delete()
+        self.assertEqual(self.enroll(self.students[1]).status_code, 201)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrolled_count, 1)
+
+    def test_duplicate_enrollment_is_rejected(self):
+        self.course.capacity = None
+        self.course.save()
+        self.enroll(self.students[0])
+        self.assertEqual(self.enroll(self.students[0]).status_code, 400)
+        self.assertEqual(Enrollment.objects.count(), 1)
+
+    def test_queue_admits_up_to_capacity(self):
+        with self.settings(REGISTRATION_QUEUE=True):
+            self.assertEqual([self.enroll(student).status_code for student in self.students], [202, 202])
+        self.assertEqual(registration.process(), {'admitted': 1, 'rejected': 1})
+        self.assertEqual(
+            list(RegistrationRequest.objects.order_by('id').values_list('status', flat=True)), ['admitted', 'rejected'],
+        )
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.enrolled_count, 1)
+
+
+class RollCallTests(TestCase):
+    def setUp(self):
+        isolate(self)
+        program = Program.objects.create(name='Physics', department=Department.objects.create(name='Science'))
+        self.course = Course.objects.create(name='Optics', code='PHY200', program=program)
+        self.students = [new_student(f'student{n}', program) for n in range(3)]
+        for student in self.students:
+            Enrollment.objects.create(student=student, course=self.course)
+        self.client.force_login(new_admin())
+
+    def roll_call(self, date, **data):
+        return self.client.post('/api/students/attendance/roll-call/', {
+            'course': self.course.pk, 'date': date, **data,
+        }, content_type='application/json')
+
+    def counts(self):
+        return dict(AttendanceCounter.objects.values_list('student_id', 'present_count'))
+
+    def test_absentees_and_the_rest_present(self):
+        response = self.roll_call('2024-09-02', absentees=[self.students[0].pk])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            dict(Attendance.objects.values_list('student_id', 'status')),
+            {self.students[0].pk: 'absent', self.students[1].pk: 'present', self.students[2].pk: 'present'},
+        )
+        self.assertEqual(self.counts(), {self.students[0].pk: 0, self.students[1].pk: 1, self.students[2].pk: 1})
+
+    def test_marking_a_session_again_updates_it(self):
+        self.roll_call('2024-09-02', absentees=[self.students[0].pk])
+        self.roll_call('2024-09-02', statuses={str(self.students[0].pk): 'present'})
+        self.assertEqual(Attendance.objects.filter(status='present').count(), 3)
+        counter = AttendanceCounter.objects.get(student=self.students[0])
+        self.assertEqual((counter.present_count, counter.absent_count, counter.attendance_percentage), (1, 0, 100))
+
+    def test_student_not_on_the_roll(self):
+        outsider = new_student('outsider', self.course.program)
+        response = self.roll_call('2024-09-02', absentees=[outsider.pk])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Attendance.objects.exists())
+
+
+class GpaTests(TestCase):
+    def setUp(self):
+        isolate(self)
+        program = Program.objects.create(name='Physics', department=Department.objects.create(name='Science'))
+        self.courses = [Course.objects.create(name=f'C{n}', code=f'C{n}', program=program) for n in range(2)]
+        self.student = new_student('student', program)
+
+    def gpa(self):
+        self.student.refresh_from_db()
+        return self.student.grade_count, self.student.gpa
+
+    def test_gpa_follows_grade_writes(self):
+        first = Grade.objects.create(student=self.student, course=self.courses[0], grade=60)
+        Grade.objects.create(student=self.student, course=self.courses[1], grade=80)
+        self.assertEqual(self.gpa(), (2, 70))
+        first.grade = 90
+        first.save()
+        self.assertEqual(self.gpa(), (2, 85))
+        Grade.objects.all().delete()
+        self.assertEqual(self.gpa(), (0, None))
+
+    def test_transcript(self):
+        self.client.force_login(new_admin())
+        Grade.objects.create(student=self.student, course=self.courses[0], grade=60)
+        url = f'/api/students/students/{self.student.pk}/transcript/'
+        self.assertEqual(self.client.get(url).json()['gpa'], 60)
+        Grade.objects.update_or_create(student=self.student, course=self.courses[0], defaults={'grade': 75})
+        transcript = self.client.get(url).json()
+        self.assertEqual((transcript['gpa'], transcript['courses'][0]['grade']), (75, 75))
+
+
+class KeysetPaginationTests(TestCase):
+    def test_pages_cover_every_row_once(self):
+        isolate(self)
+        program = Program.objects.create(name='Physics', department=Department.objects.create(name='Science'))
+        course = Course.objects.create(name='Optics', code='PHY200', program=program)
+        students = [new_student(f'student{n}', program) for n in range(5)]
+        for day in range(5):
+            for student in students:
+                Attendance.objects.create(
+                    student=student, course=course, date=datetime.date(2024, 9, 2 + day), status='present',
+                )
+        self.client.force_login(new_admin())
+        seen, url = [], '/api/students/attendance/?page_size=10'
+        while url:
+            page = self.client.get(url).json()
+            seen += [(row['date'], row['id']) for row in page['results']]
+            url = page['next']
+        expected = Attendance.objects.order_by('date', 'id').values_list('date', 'id')
+        self.assertEqual(seen, [(date.isoformat(), pk) for date, pk in expected])
@@ -0,0 +1,136 @@
+from django.db.models import F, Q
+from django.utils import timezone
+
+import metrics
+from .models import Student, Enrollment, Withdrawal, Grade, AttendanceCounter, TranscriptSnapshot
+
+# A student's transcript is built from their enrollments, grades and
+# withdrawals, and kept as a TranscriptSnapshot until one of those rows (or
+# a course, program or name it shows) changes. Writes only bump the
+# snapshot's version; the next read rebuilds it. A snapshot is saved with the
+# version it was built at, and only if no write bumped it meanwhile, so a
+# rebuild racing a write cannot store the older data. Attendance changes on
+# every roll call, so it is read live from AttendanceCounter instead.
+
+# Bump to have every stored snapshot rebuilt on its next read.
+FORMAT = 1
+
+
+def invalidate(student_ids, create=True):
+    student_ids = {pk for pk in student_ids if pk is not None}
+    if not student_ids:
+        return
+    # The rows are created first so the write holds their lock until it
+    # commits, and a rebuild that starts meanwhile waits for it.
+    if create:
+        TranscriptSnapshot.objects.bulk_create(
+            [TranscriptSnapshot(student_id=pk) for pk in student_ids], ignore_conflicts=True,
+        )
+    TranscriptSnapshot.objects.filter(student_id__in=student_ids).update(version=F('version') + 1)
+
+
+def invalidate_where(condition):
+    # Every built snapshot of the students matching `condition`.
+    TranscriptSnapshot.objects.filter(built_version__isnull=False) \
+        .filter(student__in=Student.objects.filter(condition).values('pk')) \
+        .update(version=F('version') + 1)
+
+
+def invalidate_course(course_id):
+    invalidate_where(
+        Q(pk__in=Enrollment.objects.filter(course_id=course_id).values('student'))
+        | Q(pk__in=Grade.objects.filter(course_id=course_id).values('student'))
+        | Q(pk__in=Withdrawal.objects.filter(course_id=course_id).values('student'))
+    )
+
+
+def _course(course):
+    return {'id': course.pk, 'code': course.code, 'name': course.name}
+
+
+def build(student):
+    courses = {}
+
+    def entry(course):
+        if course.pk not in courses:
+            courses[course.pk] = {
+                'course': _course(course), 'enrolled_on': None, 'grade': None, 'withdrawn': False,
+            }
+        return courses[course.pk]
+
+    for enrollment in Enrollment.objects.filter(student=student).select_related('course').order_by('enrolled_on', 'id'):
+        entry(enrollment.course)['enrolled_on'] = enrollment.enrolled_on.isoformat()
+    # The latest grade of a course stands.
+    for grade in Grade.objects.filter(student=student).select_related('course').order_by('id'):
+        entry(grade.course)['grade'] = grade.grade
+    withdrawals = []
+    for withdrawal in Withdrawal.objects.filter(student=student).select_related('course').order_by('date', 'id'):
+        entry(withdrawal.course)['withdrawn'] = True
+        withdrawals.append({
+            'course': _course(withdrawal.course),
+            'date': withdrawal.date.isoformat(),
+            'reason': withdrawal.reason,
+        })
+
+    user, program, department = student.user, student.program, student.department
+    return {
+        'format': FORMAT,
+        'student': {
+            'id': student.pk,
+            'username': user.username,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'enrollment_date': student.enrollment_date.isoformat(),
+            'program': program and {'id': program.pk, 'name': program.name},
+            'department': department and {'id': department.pk, 'name': department.name},
+        },
+        'gpa': student.gpa,
+        'graded_courses': student.grade_count,
+        'courses': sorted(courses.values(), key=lambda row: row['course']['code']),
+        'withdrawals': withdrawals,
+    }
+
+
+def snapshot(student_id):
+    # The stored transcript data, rebuilt first if it is missing or stale.
+    current, created = TranscriptSnapshot.objects.get_or_create(student_id=student_id)
+    fresh = current.built_version == current.version and (current.data or {}).get('format') == FORMAT
+    metrics.cache_lookup('transcript', fresh)
+    if fresh:
+        return current.data
+
+    student = Student.objects.select_related('user', 'program', 'department').get(pk=student_id)
+    data = build(student)
+    TranscriptSnapshot.objects.filter(student_id=student_id, version=current.version).update(
+        data=data, built_version=current.version, built_at=timezone.now(),
+    )
+    return data
+
+
+def attendance(student_id):
+    # {course_id: (present, total)} from the live counters.
+    return {
+        course_id: (present, total)
+        for course_id, present, total in AttendanceCounter.objects.filter(student_id=student_id)
+        .values_list('course_id', 'present_count', 'total_count')
+    }
+
+
+def _rate(present, total):
+    return round(present * 100 / total, 2) if total else None
+
+
+def transcript(student_id):
+    data = {key: value for key, value in snapshot(student_id).items() if key != 'format'}
+    counts = attendance(student_id)
+    courses = []
+    for row in data['courses']:
+        present, total = counts.get(row['course']['id'], (0, 0))
+        courses.append({**row, 'attendance_percentage': _rate(present, total)})
+    present = sum(present for present, total in counts.values())
+    total = sum(total for present, total in counts.values())
+    return {
+        **data,
+        'courses': courses,
+        'attendance': {'present': present, 'total': total, 'attendance_percentage': _rate(present, total)},
+    }
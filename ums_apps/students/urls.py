@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import StudentViewSet, EnrollmentViewSet, WithdrawalViewSet, GradeViewSet, AttendanceViewSet
+from .views import StudentViewSet, EnrollmentViewSet, WithdrawalViewSet, GradeViewSet, AttendanceViewSet, RegistrationRequestViewSet, CSVImportView
 
 router = DefaultRouter()
 router.register(r'students', StudentViewSet)
@@ -8,7 +8,9 @@ router.register(r'enrollments', EnrollmentViewSet)
 router.register(r'withdrawals', WithdrawalViewSet)
 router.register(r'grades', GradeViewSet)
 router.register(r'attendance', AttendanceViewSet)
+router.register(r'registrations', RegistrationRequestViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('import/<str:kind>/', CSVImportView.as_view(), name='csv-import'),
 ]
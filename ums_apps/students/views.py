@@ -1,88 +1,241 @@
 from rest_framework import viewsets
-from rest_framework.permissions import DjangoModelPermissions, IsAuthenticated
-from students.models import Student, Enrollment, Withdrawal, Grade, Attendance
-from students.serializers import StudentSerializer, EnrollmentSerializer, WithdrawalSerializer, GradeSerializer, AttendanceSerializer
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.parsers import MultiPartParser
+from rest_framework.exceptions import ValidationError
+from rest_framework import status
+from students.models import Student, Enrollment, Withdrawal, Grade, Attendance, RegistrationRequest
+from students.serializers import StudentSerializer, EnrollmentSerializer, WithdrawalSerializer, GradeSerializer, AttendanceSerializer, GradebookSerializer, RollCallSerializer, RegistrationRequestSerializer
+from students.gradebook import save_grades, upsert_grades
+from students.rollcall import save_roll_call
+from students.importer import KINDS, ImportFileError
+from students.pagination import KeysetPagination
+from students import bitmaps, registration, transcripts
+from students.seats import CourseFull
+from academics.models import Course, Term
+from academics.serializers import TermSerializer
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.db import transaction
 from django.db.models import Avg, Count
 from utils import get_user_throttle
+from scoping import scope
+from principal import PrincipalModelPermissions, get_principal
+from expansion import ExpandableViewSetMixin
+from accounts.throttling import AdminThrottle
+import datetime
+import io
 
-class StudentViewSet(viewsets.ModelViewSet):
+class StudentViewSet(ExpandableViewSetMixin, viewsets.ModelViewSet):
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'student':
-            return Student.objects.filter(user=user)
-        elif user.user_type == 'faculty':
-            return Student.objects.filter(enrollment__course__faculty__user=user).distinct()
-        return Student.objects.all()
+        return scope(Student.objects.all(), self.request.user)
 
     def get_throttles(self):
         return get_user_throttle(self.request.user)
 
-class EnrollmentViewSet(viewsets.ModelViewSet):
+    # GET the student's courses, grades, withdrawals, GPA and attendance in
+    # one response, from the cached transcript snapshot.
+    @action(detail=True, methods=['get'])
+    def transcript(self, request, pk=None):
+        student = self.get_object()
+        return Response(transcripts.transcript(student.pk))
+
+class EnrollmentViewSet(ExpandableViewSetMixin, viewsets.ModelViewSet):
     queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'faculty':
-            return Enrollment.objects.filter(course__faculty__user=user)
-        elif user.user_type == 'student':
-            return Enrollment.objects.filter(student__user=user)
-        return Enrollment.objects.all()
+        return scope(Enrollment.objects.all(), self.request.user)
 
     def get_throttles(self):
         return get_user_throttle(self.request.user)
 
-class WithdrawalViewSet(viewsets.ModelViewSet):
+    # Enrolling takes a seat, so a full course or a concurrent duplicate is a
+    # 400. With REGISTRATION_QUEUE on, the request is queued instead and the
+    # client polls the registration it gets back.
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        student, course = serializer.validated_data['student'], serializer.validated_data['course']
+        if registration.queue_enabled():
+            queued, _ = registration.request(student.pk, course.pk)
+            return Response(RegistrationRequestSerializer(queued).data, status=status.HTTP_202_ACCEPTED)
+        try:
+            serializer.instance = registration.enroll(student.pk, course.pk)
+        except (CourseFull, registration.AlreadyEnrolled) as exc:
+            raise ValidationError({'course': [str(exc)]})
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=self.get_success_headers(serializer.data))
+
+    def perform_update(self, serializer):
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except CourseFull as exc:
+            raise ValidationError({'course': [str(exc)]})
+
+class WithdrawalViewSet(ExpandableViewSetMixin, viewsets.ModelViewSet):
     queryset = Withdrawal.objects.all()
     serializer_class = WithdrawalSerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'faculty':
-            return Withdrawal.objects.filter(course__faculty__user=user)
-        elif user.user_type == 'student':
-            return Withdrawal.objects.filter(student__user=user)
-        return Withdrawal.objects.all()
+        return scope(Withdrawal.objects.all(), self.request.user)
 
     def get_throttles(self):
         return get_user_throttle(self.request.user)
 
-class GradeViewSet(viewsets.ModelViewSet):
+class GradeViewSet(ExpandableViewSetMixin, viewsets.ModelViewSet):
     queryset = Grade.objects.all()
     serializer_class = GradeSerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('id',)
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'faculty':
-            return Grade.objects.filter(course__faculty__user=user)
-        elif user.user_type == 'student':
-            return Grade.objects.filter(student__user=user)
-        return Grade.objects.all()
+        return scope(Grade.objects.all(), self.request.user)
 
     def get_throttles(self):
         return get_user_throttle(self.request.user)
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+    # Goes through the gradebook's upsert, so a grade posted while the same
+    # one is being posted, saved in a gradebook or imported is updated rather
+    # than inserted twice.
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        student, course = serializer.validated_data['student'], serializer.validated_data['course']
+        with transaction.atomic():
+            created, updated = upsert_grades({(student.pk, course.pk): serializer.validated_data['grade']})
+            serializer.instance = Grade.objects.get(student=student, course=course)
+        code = status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        return Response(serializer.data, status=code, headers=self.get_success_headers(serializer.data))
+
+    # POST {"course": id, "grades": [{"student": id, "grade": 87.5}, ...]}
+    # creates or updates the course's grades in one transaction.
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        serializer = GradebookSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        grades = {row['student']: row['grade'] for row in serializer.validated_data['grades']}
+        return Response(save_grades(serializer.validated_data['course'], grades))
+
+
+class AttendanceViewSet(ExpandableViewSetMixin, viewsets.ModelViewSet):
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('date', 'id')
+
+    def get_queryset(self):
+        queryset = scope(Attendance.objects.all(), self.request.user)
+        # ?date_from= and ?date_to= (inclusive) keep the query to the
+        # partitions holding those months.
+        for param, lookup in (('date_from', 'date__gte'), ('date_to', 'date__lte')):
+            value = self.request.query_params.get(param)
+            if value:
+                try:
+                    queryset = queryset.filter(**{lookup: datetime.date.fromisoformat(value)})
+                except ValueError:
+                    raise ValidationError({param: ['Use YYYY-MM-DD.']})
+        return queryset
+
+    def get_throttles(self):
+        return get_user_throttle(self.request.user)
+
+    # POST {"course": id, "date": "2025-09-01", "absentees": [id, ...]} or
+    # {..., "statuses": {"<student id>": "present" | "absent"}} marks the
+    # whole roll of one session.
+    @action(detail=False, methods=['post'], url_path='roll-call')
+    def roll_call(self, request):
+        serializer = RollCallSerializer(data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        return Response(save_roll_call(data['course'], data['date'], data['marks']))
+
+    # GET ?course=<id>&term=<id> returns a course's marks over a term from the
+    # attendance bitmaps: the session dates and one 'P'/'A'/'-' string per
+    # student. Without a term, the latest one that has started.
+    @action(detail=False, methods=['get'])
+    def history(self, request):
+        if not bitmaps.enabled():
+            return Response({'detail': 'Attendance bitmaps are not enabled.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            course_id = int(request.query_params['course'])
+            term_id = int(request.query_params['term']) if request.query_params.get('term') else None
+        except (KeyError, ValueError):
+            raise ValidationError({'course': ['Pass a course id, and optionally a term id.']})
+        if not scope(Course.objects.filter(pk=course_id), request.user).exists():
+            return Response({'detail': 'Unknown course.'}, status=status.HTTP_404_NOT_FOUND)
+        terms = Term.objects.order_by('-start_date')
+        if term_id is not None:
+            term = terms.filter(pk=term_id).first()
+        else:
+            term = terms.filter(start_date__lte=datetime.date.today()).first()
+        if term is None:
+            return Response({'detail': 'Unknown term.'}, status=status.HTTP_404_NOT_FOUND)
+
+        student_ids = None
+        principal = get_principal(request.user)
+        if principal.role == 'student':
+            student_ids = [principal.student_id]
+        dates, rows = bitmaps.history(course_id, term, student_ids)
+        students = []
+        for bitmap in rows:
+            present, marked = bitmaps.counts(bitmap)
+            students.append({
+                'student': bitmap.student_id,
+                'marks': bitmaps.marks(bitmap, len(dates)),
+                'present': present,
+                'marked': marked,
+                'attendance_percentage': round(present * 100 / marked, 2) if marked else None,
+            })
+        return Response({
+            'course': course_id,
+            'term': TermSerializer(term).data,
+            'sessions': dates,
+            'students': students,
+        })
+
+class RegistrationRequestViewSet(ExpandableViewSetMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = RegistrationRequest.objects.all()
+    serializer_class = RegistrationRequestSerializer
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'faculty':
-            return Attendance.objects.filter(course__faculty__user=user)
-        elif user.user_type == 'student':
-            return Attendance.objects.filter(student__user=user)
-        return Attendance.objects.all()
+        return scope(RegistrationRequest.objects.all(), self.request.user)
 
     def get_throttles(self):
-        return get_user_throttle(self.request.user)
\ No newline at end of file
+        return get_user_throttle(self.request.user)
+
+class CSVImportView(APIView):
+    # POST a multipart "file" to /import/<students|enrollments|grades>/, with
+    # dry_run=true to only validate it. Large files are better run through
+    # the import_csv command.
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    throttle_classes = [AdminThrottle]
+    parser_classes = [MultiPartParser]
+    # A whole file in one request.
+    slow_query_ms = 10000
+
+    def post(self, request, kind):
+        if kind not in KINDS:
+            return Response({'detail': 'Unknown import.'}, status=status.HTTP_404_NOT_FOUND)
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': 'Upload a CSV file as "file".'}, status=status.HTTP_400_BAD_REQUEST)
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        try:
+            # Passwords are hashed in this process: a pool per request would
+            # start and set up IMPORT_HASH_WORKERS interpreters each time.
+            report = KINDS[kind](dry_run=dry_run, hash_workers=0).run(
+                io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+            )
+        except (ImportFileError, UnicodeDecodeError) as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
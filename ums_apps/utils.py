@@ -1,11 +1,11 @@
 from accounts.throttling import StudentThrottle, FacultyThrottle, AdminThrottle
+from principal import get_principal
+
+THROTTLES = {'student': StudentThrottle, 'faculty': FacultyThrottle, 'admin': AdminThrottle}
 
 def get_user_throttle(user):
     if user.is_authenticated:
-        if user.user_type == 'student':
-            return [StudentThrottle()]
-        elif user.user_type == 'faculty':
-            return [FacultyThrottle()]
-        elif user.user_type == 'admin':
-            return [AdminThrottle()]
-    return []
\ No newline at end of file
+        throttle = THROTTLES.get(get_principal(user).role)
+        if throttle is not None:
+            return [throttle()]
+    return []
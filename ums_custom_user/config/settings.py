@@ -130,7 +130,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
-        'rest_framework.permissions.DjangoModelPermissions',
+        'university.principal.PrincipalModelPermissions',
     ], 
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10, 
@@ -144,4 +144,9 @@ REST_FRAMEWORK = {
         'faculty': '50/minute',
         'admin': '100/minute',
     }
-}
\ No newline at end of file
+}
+
+# Each user's role, profile ids and permissions are cached per user
+# (university/principal.py). Run more than one worker only with a shared cache.
+PRINCIPAL_CACHE = 'default'
+PRINCIPAL_CACHE_TIMEOUT = 60 * 60
@@ -0,0 +1,112 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.permissions import DjangoModelPermissions
+
+from .models import Student, Faculty
+
+# What authorization needs to know about the request's user: role, student or
+# faculty id, department and permissions. Resolved once per user and cached
+# under versions that university.signals bumps when the user, their profile,
+# or their groups and permissions change; changes to a group's permissions
+# bump a version every user shares. Several workers need a shared
+# PRINCIPAL_CACHE.
+
+
+class Principal:
+    def __init__(self, user_id, role, is_active=False, is_superuser=False, student_id=None, faculty_id=None,
+                 department_id=None, permissions=frozenset()):
+        self.user_id = user_id
+        self.role = role
+        self.is_active = is_active
+        self.is_superuser = is_superuser
+        self.student_id = student_id
+        self.faculty_id = faculty_id
+        self.department_id = department_id
+        self.permissions = permissions
+
+    def has_perms(self, perms):
+        if not self.is_active:
+            return False
+        return self.is_superuser or set(perms) <= self.permissions
+
+
+def get_cache():
+    return caches[getattr(settings, 'PRINCIPAL_CACHE', 'default')]
+
+
+def _version_keys(user_id):
+    return ['principal:version', f'principal:version:{user_id}']
+
+
+def _versions(user_id):
+    cache = get_cache()
+    keys = _version_keys(user_id)
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def invalidate(user_ids=None):
+    # The given users' principals, or everyone's; once the change commits.
+    keys = [_version_keys(user_id)[1] for user_id in user_ids] if user_ids is not None else ['principal:version']
+
+    def bump():
+        cache = get_cache()
+        for key in keys:
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, time.time_ns(), timeout=None)
+    transaction.on_commit(bump)
+
+
+def build(user):
+    principal = Principal(
+        user.pk, user.user_type, is_active=user.is_active, is_superuser=user.is_superuser,
+    )
+    profile = {'student': Student, 'faculty': Faculty}.get(user.user_type)
+    if profile is not None:
+        ids = profile.objects.filter(user_id=user.pk).values_list('pk', 'department_id').first()
+        if ids is not None:
+            setattr(principal, f'{user.user_type}_id', ids[0])
+            principal.department_id = ids[1]
+    if user.is_active and not user.is_superuser:
+        principal.permissions = frozenset(user.get_all_permissions())
+    return principal
+
+
+def get_principal(user):
+    # Kept on the user object for the rest of the request.
+    principal = getattr(user, '_principal', None)
+    if principal is not None:
+        return principal
+    if not user.is_authenticated:
+        principal = Principal(None, None)
+    else:
+        cache = get_cache()
+        key = 'principal:{}:{}.{}'.format(user.pk, *_versions(user.pk))
+        principal = cache.get(key)
+        if principal is None:
+            principal = build(user)
+            cache.set(key, principal, getattr(settings, 'PRINCIPAL_CACHE_TIMEOUT', 60 * 60))
+    user._principal = principal
+    return principal
+
+
+class PrincipalModelPermissions(DjangoModelPermissions):
+    # DjangoModelPermissions, checked against the cached permission set.
+
+    def has_permission(self, request, view):
+        if not request.user or (not request.user.is_authenticated and self.authenticated_users_only):
+            return False
+        if getattr(view, '_ignore_model_permissions', False):
+            return True
+        queryset = self._queryset(view)
+        perms = self.get_required_permissions(request.method, queryset.model)
+        return get_principal(request.user).has_perms(perms)
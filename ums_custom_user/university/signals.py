@@ -0,0 +1,52 @@
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from . import principal
+from .models import CustomUser, Student, Faculty
+
+# Cached principals (principal.py) go stale with the user row, the user's
+# student or faculty profile, and the groups and permissions they get.
+
+
+def _changed_users(instance, reverse, pk_set):
+    # m2m_changed from either side: the user, or the groups/permissions
+    # whose pk_set are users.
+    if not reverse:
+        return [instance.pk]
+    return list(pk_set) if pk_set is not None else None
+
+
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+@receiver(m2m_changed, sender=CustomUser.user_permissions.through)
+def stale_principal_on_grant(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        principal.invalidate(_changed_users(instance, reverse, pk_set))
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def stale_principals_on_group_permissions(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        principal.invalidate()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def stale_principals_on_delete(sender, **kwargs):
+    principal.invalidate()
+
+
+@receiver(post_save, sender=CustomUser)
+def stale_principal_on_user_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Logins only write last_login.
+    if not raw and not created and set(update_fields or ()) != {'last_login'}:
+        principal.invalidate([instance.pk])
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=Faculty)
+@receiver(post_delete, sender=Faculty)
+def stale_principal_on_profile(sender, instance, raw=False, **kwargs):
+    if not raw:
+        principal.invalidate([instance.user_id])
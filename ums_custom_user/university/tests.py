@@ -1,3 +1,74 @@
+import datetime
+import json
+
+from django.contrib.auth.models import Permission
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .models import CustomUser, Department, Program, Course, Student, Faculty, Enrollment, Grade
+
+
+class ScopingTests(TestCase):
+    # Rows outside every faculty's and student's scope: a course nobody
+    # teaches, with its enrollment and grade.
+    def setUp(self):
+        department = Department.objects.create(name='Science')
+        program = Program.objects.create(name='Physics', department=department)
+        course = Course.objects.create(name='Optics', code='PHY200', program=program)
+        student = Student.objects.create(
+            user=CustomUser.objects.create(username='student', user_type='student'),
+            department=department, program=program, enrollment_date=datetime.date(2024, 9, 1),
+        )
+        Enrollment.objects.create(student=student, course=course)
+        Grade.objects.create(student=student, course=course, grade=3.5)
+
+    def login(self, user):
+        user.user_permissions.set(Permission.objects.filter(codename__startswith='view_'))
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def assertSeesNothing(self, client, urls):
+        for url in urls:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(response.json()['count'], 0, url)
+
+    def test_faculty_without_profile_sees_nothing(self):
+        client = self.login(CustomUser.objects.create(username='nobody', user_type='faculty'))
+        self.assertSeesNothing(client, ['/courses/', '/students/', '/enrollments/', '/grades/', '/faculty/'])
+
+    def test_student_without_profile_sees_nothing(self):
+        client = self.login(CustomUser.objects.create(username='nobody', user_type='student'))
+        self.assertSeesNothing(client, ['/courses/', '/students/', '/enrollments/', '/grades/', '/faculty/'])
+
+    def test_faculty_does_not_see_unassigned_courses(self):
+        user = CustomUser.objects.create(username='lecturer', user_type='faculty')
+        Faculty.objects.create(user=user, department=Department.objects.get())
+        self.assertSeesNothing(self.login(user), ['/courses/', '/students/', '/enrollments/', '/grades/'])
+
+    def test_streamed_list_is_scoped(self):
+        client = self.login(CustomUser.objects.create(username='nobody', user_type='faculty'))
+        response = client.get('/grades/?format=ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+
+class StreamingTests(TestCase):
+    def setUp(self):
+        program = Program.objects.create(name='Physics', department=Department.objects.create(name='Science'))
+        course = Course.objects.create(name='Mechanics', code='PHY101', program=program)
+        for n, grade in enumerate([3.0, 4.0]):
+            student = Student.objects.create(
+                user=CustomUser.objects.create(username=f's{n}', user_type='student'),
+                program=program, enrollment_date=datetime.date(2024, 9, 1),
+            )
+            Grade.objects.create(student=student, course=course, grade=grade)
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create(username='admin', user_type='admin', is_staff=True, is_superuser=True))
 
-# Create your tests here.
+    def test_stats_as_ndjson(self):
+        response = self.client.get('/stats/student-gpa/?format=ndjson')
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['student__user__username'] for row in rows], ['s1', 's0'])
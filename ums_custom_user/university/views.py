@@ -5,140 +5,149 @@ from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from django.db.models import Avg, Count
 from .models import Department, Program, Course, Student, Faculty, Enrollment, Withdrawal, Grade, Attendance, Timetable
 from .serializers import DepartmentSerializer, ProgramSerializer, CourseSerializer, StudentSerializer, FacultySerializer, EnrollmentSerializer, WithdrawalSerializer, GradeSerializer, AttendanceSerializer, TimetableSerializer
-from rest_framework.permissions import DjangoModelPermissions
+from .principal import PrincipalModelPermissions, get_principal
+from .streaming import StreamingExportMixin
 
 
-class DepartmentViewSet(viewsets.ModelViewSet):
+def scoped(model, **lookups):
+    # A user without the profile their role implies has None ids, which would
+    # filter as IS NULL and match every unassigned row; they see nothing.
+    if any(value is None for value in lookups.values()):
+        return model.objects.none()
+    return model.objects.filter(**lookups)
+
+
+class DepartmentViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Department.objects.all()
     serializer_class = DepartmentSerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
-class ProgramViewSet(viewsets.ModelViewSet):
+class ProgramViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Program.objects.all()
     serializer_class = ProgramSerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'faculty':
-            return Course.objects.filter(faculty__user=user)
-        elif user.user_type == 'student':
-            return Course.objects.filter(enrollment__student__user=user).distinct()
+        principal = get_principal(self.request.user)
+        if principal.role == 'faculty':
+            return scoped(Course, faculty=principal.faculty_id)
+        elif principal.role == 'student':
+            return scoped(Course, enrollment__student=principal.student_id).distinct()
         # elif user.is_superuser:
         #     return Course.objects.all()
         return Course.objects.all()
 
-class StudentViewSet(viewsets.ModelViewSet):
+class StudentViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'student':
-            return Student.objects.filter(user=user)
-        elif user.user_type == 'faculty':
-            return Student.objects.filter(enrollment__course__faculty__user=user).distinct()
+        principal = get_principal(self.request.user)
+        if principal.role == 'student':
+            return scoped(Student, pk=principal.student_id)
+        elif principal.role == 'faculty':
+            return scoped(Student, enrollment__course__faculty=principal.faculty_id).distinct()
         # elif user.is_superuser:
         #     return Student.objects.all()
         return Student.objects.all()
 
-class FacultyViewSet(viewsets.ModelViewSet):
+class FacultyViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Faculty.objects.all()
     serializer_class = FacultySerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'faculty':
-            return Faculty.objects.filter(department=user.faculty.department)
-        elif user.user_type == 'student':
-            return Faculty.objects.filter(department=user.student.department)
+        principal = get_principal(self.request.user)
+        if principal.role == 'faculty':
+            return scoped(Faculty, department=principal.department_id)
+        elif principal.role == 'student':
+            return scoped(Faculty, department=principal.department_id)
         # elif user.is_superuser:
         #     return Faculty.objects.all()
         return Faculty.objects.all()
 
-class EnrollmentViewSet(viewsets.ModelViewSet):
+class EnrollmentViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Enrollment.objects.all()
     serializer_class = EnrollmentSerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'faculty':
-            return Enrollment.objects.filter(course__faculty__user=user)
-        elif user.user_type == 'student':
-            return Enrollment.objects.filter(student__user=user)
+        principal = get_principal(self.request.user)
+        if principal.role == 'faculty':
+            return scoped(Enrollment, course__faculty=principal.faculty_id)
+        elif principal.role == 'student':
+            return scoped(Enrollment, student=principal.student_id)
         # elif user.is_superuser:
         #     return Enrollment.objects.all()
         return Enrollment.objects.all()
 
-class WithdrawalViewSet(viewsets.ModelViewSet):
+class WithdrawalViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Withdrawal.objects.all()
     serializer_class = WithdrawalSerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'faculty':
-            return Withdrawal.objects.filter(course__faculty__user=user)
-        elif user.user_type == 'student':
-            return Withdrawal.objects.filter(student__user=user)
+        principal = get_principal(self.request.user)
+        if principal.role == 'faculty':
+            return scoped(Withdrawal, course__faculty=principal.faculty_id)
+        elif principal.role == 'student':
+            return scoped(Withdrawal, student=principal.student_id)
         # elif user.is_superuser:
         #     return Withdrawal.objects.all()
         return Withdrawal.objects.all()
 
-class GradeViewSet(viewsets.ModelViewSet):
+class GradeViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Grade.objects.all()
     serializer_class = GradeSerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'faculty':
-            return Grade.objects.filter(course__faculty__user=user)
-        elif user.user_type == 'student':
-            return Grade.objects.filter(student__user=user)
+        principal = get_principal(self.request.user)
+        if principal.role == 'faculty':
+            return scoped(Grade, course__faculty=principal.faculty_id)
+        elif principal.role == 'student':
+            return scoped(Grade, student=principal.student_id)
         # elif user.is_superuser:
         #     return Grade.objects.all()
         return Grade.objects.all()
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'faculty':
-            return Attendance.objects.filter(course__faculty__user=user)
-        elif user.user_type == 'student':
-            return Attendance.objects.filter(student__user=user)
+        principal = get_principal(self.request.user)
+        if principal.role == 'faculty':
+            return scoped(Attendance, course__faculty=principal.faculty_id)
+        elif principal.role == 'student':
+            return scoped(Attendance, student=principal.student_id)
         # elif user.is_superuser:
         #     return Attendance.objects.all()
         return Attendance.objects.all()
 
-class TimetableViewSet(viewsets.ModelViewSet):
+class TimetableViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = Timetable.objects.all()
     serializer_class = TimetableSerializer
-    permission_classes = [DjangoModelPermissions, IsAuthenticated]
+    permission_classes = [PrincipalModelPermissions, IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        if user.user_type == 'faculty':
-            return Timetable.objects.filter(course__faculty__user=user)
-        elif user.user_type == 'student':
-            return Timetable.objects.filter(course__enrollment__student__user=user).distinct()
+        principal = get_principal(self.request.user)
+        if principal.role == 'faculty':
+            return scoped(Timetable, course__faculty=principal.faculty_id)
+        elif principal.role == 'student':
+            return scoped(Timetable, course__enrollment__student=principal.student_id).distinct()
         # elif user.is_superuser:
         #     return Timetable.objects.all()
         return Timetable.objects.all()
 
-class StudentGPAView(APIView):
+class StudentGPAView(StreamingExportMixin, APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
@@ -147,9 +156,11 @@ class StudentGPAView(APIView):
             .annotate(gpa=Avg('grade'))
             .order_by('-gpa')
         )
+        if self.is_streaming(request):
+            return self.stream_queryset(request, gpa_data)
         return Response(gpa_data)
 
-class CourseWithdrawalsView(APIView):
+class CourseWithdrawalsView(StreamingExportMixin, APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
@@ -158,9 +169,11 @@ class CourseWithdrawalsView(APIView):
             .annotate(total_withdrawals=Count('id'))
             .order_by('-total_withdrawals')
         )
+        if self.is_streaming(request):
+            return self.stream_queryset(request, data)
         return Response(data)
 
-class AttendanceSummaryView(APIView):
+class AttendanceSummaryView(StreamingExportMixin, APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
@@ -170,4 +183,6 @@ class AttendanceSummaryView(APIView):
             .annotate(absences=Count('id'))
             .order_by('-absences')
         )
+        if self.is_streaming(request):
+            return self.stream_queryset(request, data)
         return Response(data)
\ No newline at end of file